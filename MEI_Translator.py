@@ -4,34 +4,44 @@ Translate a CMN-MEI document to a Mensural-MEI document.
 
 Functions:
 separate_staves_per_voice -- Return a list of lists, each sublist contains all the <staff> elements for a particular voice.
-merge_ties -- Merge tied-notes into one and return the lists of <note> elements that shouldn't be included in the Mensural MEI file based on this.
-remove_non_mensural_attributes -- Remove/Replace attributes from <note> and <rest> that are not part of the Mensural-MEI schema.
+resolve_tie_chains -- Return the chains of tied notes of the document, and the problems (dangling or cyclic references) found in its ties.
+merge_ties -- Merge tied-notes into one and return the set of ids of the <note> elements that shouldn't be included in the Mensural MEI file based on this.
+classification_arguments -- Return the arguments that give the mensuration of a voice to the classification of its notes and rests.
+translate -- Translate a copy of a CMN-MEI document, leaving the document unchanged, and return the MensuralTranslation.
+translate_text -- Translate the text of a CMN-MEI document and return the text of the Mensural-MEI document.
+parse_piece -- Parse the CMN-MEI file of a piece once, and return the ParsedPiece that translates it any number of times.
 
 Classes:
 MensuralTranslation -- Create the translated Mensural-MEI document.
+ParsedPiece -- CMN-MEI document read once, which gives any number of independent translations.
 """
 import argparse
+import sys
 
-from pymei import documentFromFile, documentToFile, MeiDocument, MeiElement
+from pymei import documentFromText, documentToText, MeiDocument, MeiElement
 
+import archives
+from document_index import DocumentIndex
+from element_records import VoiceRecords
 import white_notation
 import arsnova
 import arsantiqua
+import vectorized
+from voice_classification import classify_voices
 
 
-def separate_staves_per_voice(doc):
+def separate_staves_per_voice(doc_index):
     """Return a list of lists, each of which contains all the <staff> elements of a voice in the pymei.MeiDocument object.
 
     Arguments:
-    doc -- the pymei.MeiDocument object to be translated to Mensural-MEI
+    doc_index -- the DocumentIndex of the pymei.MeiDocument object to be translated to Mensural-MEI
     """
-    num_voices = len(doc.getElementsByName('staffDef'))
+    num_voices = len(doc_index.getElementsByName('staffDef'))
     all_voices = []
-    measures = doc.getElementsByName('measure')
     for i in range(0, num_voices):
         ind_voice = []
-        for measure in measures:
-            staves_in_measure = measure.getChildrenByName('staff')
+        for measure_number in range(0, len(doc_index.getMeasures())):
+            staves_in_measure = doc_index.getStaves(measure_number)
             staff_i = staves_in_measure[i]
             ind_voice.append(staff_i)
         all_voices.append(ind_voice)
@@ -39,91 +49,112 @@ def separate_staves_per_voice(doc):
     return all_voices
 
 
-def merge_ties(doc):
-    """Join into one the notes that are tied together in the pymei.MeiDocument object.
+def resolve_tie_chains(doc_index):
+    """Build, in a single pass over the <tie> elements, all the chains of tied notes (A -> B -> C ...) in the pymei.MeiDocument object.
 
-    Set the @dur of the first note of the tied notes to the value 'TiedNote!'.
-    And set its @dur.ges (perform3ed duration) to the sum of the performed duration of the individual notes that make up the tie.
-    Return a list of the other notes that make up the tie (the ones after the first), which shouldn't be included in the output file.
+    Ties whose @startid/@endid don't point to a <note> of the document (dangling references),
+    ties that would give a note two continuations (or two predecessors), and ties that close a loop (cyclic references) are not included in any chain.
+    Each of these problems is reported with a diagnostic message instead.
 
     Arguments:
-    doc -- the pymei.MeiDocument object to be translated to Mensural-MEI
-    """
-    ids_removeList = []
-    ties_list = doc.getElementsByName('tie')
-    for i in range(len(ties_list)-1, -1, -1):
-        tie = ties_list[i]
-
-        # Start note
-        startid = tie.getAttribute('startid').value
-        note_startid = startid[1:]  # Removing the '#' character from the startid value, to have the id of the note
-        start_note = doc.getElementById(note_startid)
-        start_dur = start_note.getAttribute('dur').value    # Value of the form: 'long', 'breve', '1' or '2'
-        start_durGes_number = int(start_note.getAttribute('dur.ges').value[:-1])    # Value of the form: 1024
-
-        # End note
-        endid = tie.getAttribute('endid').value
-        note_endid = endid[1:]
-        end_note = doc.getElementById(note_endid)
-        end_dur = end_note.getAttribute('dur').value
-        end_durGes_number = int(end_note.getAttribute('dur.ges').value[:-1])
-
-        # Calculation of the @dur.ges
-        durGes_number = start_durGes_number + end_durGes_number
-        durGes = str(durGes_number) + "p"
-        start_note.getAttribute('dur.ges').setValue(durGes)
-        ids_removeList.append(end_note.id)
-
-        # Sets @dur = 'TiedNote!'
-        start_note.getAttribute('dur').setValue('TiedNote!')
-
-    return ids_removeList
+    doc_index -- the DocumentIndex of the pymei.MeiDocument object to be translated to Mensural-MEI
 
+    Return value:
+    Tuple of two lists: the chains (each chain is the list of its <note> elements, in order, starting with the first note of the tie) and the diagnostic messages.
+    """
+    diagnostics = []
+    next_note = {}      # id of a note -> id of the note it is tied to
+    previous_note = {}  # id of a note -> id of the note tied to it
+    starts = []         # ids of the notes that start a tie (in document order)
+
+    for tie in doc_index.getElementsByName('tie'):
+        ids = []
+        for reference in ['startid', 'endid']:
+            if tie.hasAttribute(reference):
+                # Removing the '#' character from the startid/endid value, to have the id of the note
+                note_id = tie.getAttribute(reference).value.lstrip('#')
+                note = doc_index.getElementById(note_id)
+                if note is None or note.name != 'note':
+                    diagnostics.append("Dangling reference: the @" + reference + " of the <tie> with id " + tie.id + " points to '" + note_id + "', which is not a <note> of the document.")
+                else:
+                    ids.append(note_id)
+            else:
+                diagnostics.append("Dangling reference: the <tie> with id " + tie.id + " has no @" + reference + ".")
+        if len(ids) < 2:
+            continue
+        start_id, end_id = ids
+
+        if start_id == end_id:
+            diagnostics.append("Cyclic reference: the <tie> with id " + tie.id + " ties the note " + start_id + " to itself.")
+        elif start_id in next_note:
+            diagnostics.append("The note " + start_id + " is tied to more than one note; the <tie> with id " + tie.id + " is ignored.")
+        elif end_id in previous_note:
+            diagnostics.append("More than one note is tied to the note " + end_id + "; the <tie> with id " + tie.id + " is ignored.")
+        else:
+            next_note[start_id] = end_id
+            previous_note[end_id] = start_id
+            starts.append(start_id)
+
+    # Follow each chain from its first note (a note that starts a tie, but isn't the end of any other tie)
+    chains = []
+    chained_ids = set()
+    for start_id in starts:
+        if start_id in previous_note:
+            continue
+        chain_ids = [start_id]
+        while chain_ids[-1] in next_note:
+            chain_ids.append(next_note[chain_ids[-1]])
+        chained_ids.update(chain_ids)
+        chains.append([doc_index.getElementById(note_id) for note_id in chain_ids])
+
+    # The ties that were not reached from any first note form closed loops
+    for start_id in starts:
+        if start_id in chained_ids:
+            continue
+        loop_ids = [start_id]
+        while next_note[loop_ids[-1]] != start_id:
+            loop_ids.append(next_note[loop_ids[-1]])
+        chained_ids.update(loop_ids)
+        diagnostics.append("Cyclic reference: the notes " + " -> ".join(loop_ids + [start_id]) + " are tied in a loop; these ties are ignored.")
+
+    return chains, diagnostics
+
+
+def merge_ties(doc_index):
+    """Join into one the notes that are tied together in the pymei.MeiDocument object.
 
-def remove_non_mensural_attributes(doc):
-    """Remove/Replace attributes inside <note> and <rest> elments on the pymei.MeiDocument object, that are not part of the Mensural-MEI schema.
+    Set the @dur of the first note of the tied notes to the value 'TiedNote!'.
+    And set its @dur.ges (performed duration) to the sum of the performed duration of the individual notes that make up the tie.
+    Return a set of the ids of the other notes that make up the tie (the ones after the first), which shouldn't be included in the output file.
+    Problems found in the ties (dangling or cyclic references) are printed and returned as diagnostic messages.
 
     Arguments:
-    doc -- the pymei.MeiDocument object to be translated to Mensural-MEI
+    doc_index -- the DocumentIndex of the pymei.MeiDocument object to be translated to Mensural-MEI
+
+    Return value:
+    Tuple with the set of ids of the notes to be removed, and the list of diagnostic messages.
     """
-    notes = doc.getElementsByName('note')
-    for note in notes:
-        # Remove extraneous attributes in the <note> element
-        if note.hasAttribute('layer'):
-            note.removeAttribute('layer')
-        if note.hasAttribute('pnum'):
-            note.removeAttribute('pnum')
-        if note.hasAttribute('staff'):
-            note.removeAttribute('staff')
-        if note.hasAttribute('stem.dir'):
-            note.removeAttribute('stem.dir')
-        if note.hasAttribute('dots'):
-            note.removeAttribute('dots')
-        # Replace extraneous attributes by the appropriate mensural attributes in the <note> element:
-        # For plicas
-        if note.hasAttribute('stem.mod'):
-            stemmod = note.getAttribute('stem.mod')
-            if stemmod.value == "1slash":
-                note.addAttribute('plica', 'desc')
-                note.removeAttribute('stem.mod')
-            elif stemmod.value == "2slash":
-                note.addAttribute('plica', 'asc')
-                note.removeAttribute('stem.mod')
+    chains, diagnostics = resolve_tie_chains(doc_index)
+    ids_removeSet = set()
+    for chain in chains:
+        start_note = chain[0]
+        # Calculation of the @dur.ges: the sum of the performed durations of all the notes in the chain (values of the form: '1024p')
+        durGes_number = 0
+        for note in chain:
+            if note.hasAttribute('dur.ges'):
+                durGes_number += int(note.getAttribute('dur.ges').value[:-1])
             else:
-                pass
-        # Articulations changes
-        if note.hasAttribute('artic'):
-            artic = note.getAttribute('artic')
-            if artic.value == "stacc":
-                note.removeAttribute('artic')
-            elif artic.value == "ten":
-                note.addAttribute('stem.dir', 'down')  # If the note has this attribute (@stem.dir) already, it overwrites its value
-                note.removeAttribute('artic')
-    # Remove @dots from <rest> elements
-    rests = doc.getElementsByName('rest')
-    for rest in rests:
-        if rest.hasAttribute('dots'):
-            rest.removeAttribute('dots')
+                diagnostics.append("The tied note " + note.id + " has no @dur.ges, so it doesn't add any duration to the tie.")
+        start_note.addAttribute('dur.ges', str(durGes_number) + "p")
+        # Sets @dur = 'TiedNote!'
+        start_note.addAttribute('dur', 'TiedNote!')
+        for note in chain[1:]:
+            ids_removeSet.add(note.id)
+
+    for diagnostic in diagnostics:
+        print(diagnostic)
+
+    return ids_removeSet, diagnostics
 
 
 def num(mensurationString):
@@ -138,18 +169,37 @@ def num(mensurationString):
     return mensurationNumber
 
 
+def classification_arguments(ars_type, staffDef, triplet_of_minims_flag):
+    """Return the tuple of arguments that give the mensuration of a voice to the classification of its notes and rests (see voice_classification.classify_voice).
+
+    Arguments:
+    ars_type -- string that indicates the style of the piece: 'ars_antiqua', 'ars_nova' or 'white_mensural'
+    staffDef -- the <staffDef> element of the voice, with its mensuration (@modusmaior, @modusminor, @tempus and @prolatio)
+    triplet_of_minims_flag -- boolean flag that indicates the presence of a 'triplet of minims' in the piece (not used in Ars Antiqua)
+    """
+    modusminor = int(staffDef.getAttribute('modusminor').value)
+    if ars_type in ["white_mensural", "ars_nova"]:
+        modusmaior = int(staffDef.getAttribute('modusmaior').value)
+        tempus = int(staffDef.getAttribute('tempus').value)
+        prolatio = int(staffDef.getAttribute('prolatio').value)
+        return (modusmaior, modusminor, tempus, prolatio, triplet_of_minims_flag)
+    # The semibreves are grouped into minor-major pairs when the breve is divided into 3 semibreves
+    return (modusminor, staffDef.getAttribute('tempus').value == '3')
+
+
 class MensuralTranslation(MeiDocument):
     """Translate a CMN-MEI document to a Mensural-MEI document.
 
     MensuralTranslation is a subclass of MeiDocument. It inherits all its methods, without any modification to any of them.
     The constructor is the only extended method, as not only the MeiDocument which would contain the Mensural-translation is created here, but also the translation process itself is done here. 
     And there is only one additional method (getModifiedNotes) to deal with the peculiarities of mensural notation.
+    The translation takes over the CMN-MEI document (its elements become part of the Mensural-MEI document), use the translate function to leave the CMN-MEI document unchanged.
 
     Methods:
     getModifiedNotes -- gets a list of notes which value has been modified from the original (the default value given by the mensuration)
     """
 
-    def __init__(self, cmn_meidoc, ars_type, mensuration_list):
+    def __init__(self, cmn_meidoc, ars_type, mensuration_list, vectorized_mode=False, processes=None):
         """Create the Mensural-MEI document that contains the translation of the CMN-MEI document.
 
         Arguments:
@@ -158,10 +208,20 @@ class MensuralTranslation(MeiDocument):
         mensuration_list -- list in which each element is a list that encodes the mensuration for each voice.
         For Ars Nova each sublist has 4 elements (with values 'p' or 'i') that indicate the mensuration of the voice (in the order: modusmaior, modusminor, tempus and prolatio).
         For Ars Antiqua each sublist has 2 elemnts (the first is '3' or '2' -indicating the division of the breve-, and the second is 'p' or 'i' -indicating the modusminor-).
+        vectorized_mode -- boolean flag to classify the notes of Ars Nova and White Mensural pieces with the NumPy backend of the vectorized module (default False).
+        The result is the same as with the default (pure-Python) classification. It requires NumPy, and it has no effect on Ars Antiqua pieces.
+        processes -- number of processes in which the voices are classified concurrently (default None: the voices are classified one after the other).
+        The processes of a shared pool are started once for all the translations; a multiprocessing.Pool or a concurrent.futures executor can also be given instead of a number.
+        The result is the same as classifying the voices one after the other (see the voice_classification module).
         """
+        if vectorized_mode and not vectorized.available:
+            raise ImportError("The vectorized mode requires NumPy, which is not installed.")
+
         # Getting necessary information from the input (CMN-MEI) file
-        all_voices = separate_staves_per_voice(cmn_meidoc)
-        ids_removeList = merge_ties(cmn_meidoc)
+        # (the whole input document is traversed only once, to build its index)
+        cmn_index = DocumentIndex(cmn_meidoc)
+        all_voices = separate_staves_per_voice(cmn_index)
+        ids_removeSet, self.tie_diagnostics = merge_ties(cmn_index)
 
         # Output (Mensural-MEI) file Part:
         MeiDocument.__init__(self)
@@ -170,9 +230,9 @@ class MensuralTranslation(MeiDocument):
         # ScoreDef Part of the <score> element:
         out_scoreDef = MeiElement('scoreDef')
         # Make it share the id (@xml:id) it has in the input file
-        out_scoreDef.id = cmn_meidoc.getElementsByName('scoreDef')[0].id
+        out_scoreDef.id = cmn_index.getElementsByName('scoreDef')[0].id
         # Add as its child the <staffGrp> element, with all the <staffDef> elements and the right mensuration (@modusmaior, @modusminor, @tempus and @prolatio) for each one
-        out_staffGrp = cmn_meidoc.getElementsByName('staffGrp')[-1]
+        out_staffGrp = cmn_index.getElementsByName('staffGrp')[-1]
         # The [-1] guarantees that the <staffGrp> element taken is the one which contains the <staffDef> elements (previous versions of the plugin stored a <staffGrp> element inside another <staffGrp>)
         stavesDef = out_staffGrp.getChildren()
         # Mensuration added to the staves definition <staffDef>
@@ -199,69 +259,41 @@ class MensuralTranslation(MeiDocument):
 
         # Section Part of the <score> element:
         out_section = MeiElement('section')
-        out_section.id = cmn_meidoc.getElementsByName('section')[0].id
+        out_section.id = cmn_index.getElementsByName('section')[0].id
 
         # Add the new <scoreDef> and empty <section> elements to the <score> element after cleaning it up
-        score = self.getElementsByName('score')[0]
+        score = cmn_index.getElementsByName('score')[0]
         score.deleteAllChildren()
         score.addChild(out_scoreDef)
         score.addChild(out_section)
 
-        # Fill the section element with the information of each voice (contained in all_voices)
+        # Fill the section element with the information of each voice (contained in all_voices), and classify the notes and rests of each voice
+        self._fill_section(out_section, stavesDef, all_voices, ids_removeSet, cmn_index, ars_type, mensuration_list, vectorized_mode, processes)
+
+    def _fill_section(self, out_section, stavesDef, all_voices, ids_removeSet, cmn_index, ars_type, mensuration_list, vectorized_mode, processes):
+        """Fill the <section> element with the notes and rests of each voice, and classify them according to the mensuration of the voice (see the incremental module for another way to fill it)."""
+        # The <note> and <rest> elements of each voice are collected while filling the section
         # -> For white notation
         if ars_type == "white_mensural":
-            tuplet_minims = white_notation.fill_section(out_section, all_voices, ids_removeList, cmn_meidoc)
-            staffDefs = self.getElementsByName('staffDef')
-            staves = self.getElementsByName('staff')
-            for i in range(0, len(staffDefs)):
-                staffDef = staffDefs[i]
-                modusmaior = int(staffDef.getAttribute('modusmaior').value)
-                modusminor = int(staffDef.getAttribute('modusminor').value)
-                tempus = int(staffDef.getAttribute('tempus').value)
-                prolatio = int(staffDef.getAttribute('prolatio').value)
-
-                notes_per_voice = staves[i].getChildrenByName('layer')[0].getChildrenByName('note')
-                rests_per_voice = staves[i].getChildrenByName('layer')[0].getChildrenByName('rest')
-
-                white_notation.noterest_to_mensural(notes_per_voice, rests_per_voice, modusmaior, modusminor, tempus, prolatio, tuplet_minims)
+            voices, tuplet_minims = white_notation.fill_section(out_section, all_voices, ids_removeSet, cmn_index)
         # -> For ars nova
         elif ars_type == "ars_nova":
-            tuplet_minims = arsnova.fill_section(out_section, all_voices, ids_removeList, cmn_meidoc)
-            staffDefs = self.getElementsByName('staffDef')
-            staves = self.getElementsByName('staff')
-            for i in range(0, len(staffDefs)):
-                staffDef = staffDefs[i]
-                modusmaior = int(staffDef.getAttribute('modusmaior').value)
-                modusminor = int(staffDef.getAttribute('modusminor').value)
-                tempus = int(staffDef.getAttribute('tempus').value)
-                prolatio = int(staffDef.getAttribute('prolatio').value)
-
-                notes_per_voice = staves[i].getChildrenByName('layer')[0].getChildrenByName('note')
-                rests_per_voice = staves[i].getChildrenByName('layer')[0].getChildrenByName('rest')
-
-                arsnova.noterest_to_mensural(notes_per_voice, rests_per_voice, modusmaior, modusminor, tempus, prolatio, tuplet_minims)
+            voices, tuplet_minims = arsnova.fill_section(out_section, all_voices, ids_removeSet, cmn_index)
         # -> For ars antiqua
         else:
             breve = mensuration_list[0][0]
-            voices_elements = arsantiqua.fill_section(out_section, all_voices, ids_removeList, cmn_meidoc, breve)
-            staffDefs = self.getElementsByName('staffDef')
-            staves = self.getElementsByName('staff')
-            for i in range(0, len(staffDefs)):
-                staffDef = staffDefs[i]
-                modusminor = int(staffDef.getAttribute('modusminor').value)
-
-                notes_per_voice = staves[i].getChildrenByName('layer')[0].getChildrenByName('note')
-                rests_per_voice = staves[i].getChildrenByName('layer')[0].getChildrenByName('rest')
-                elements_per_voice = voices_elements[i]
-
-                arsantiqua.noterest_to_mensural(notes_per_voice, rests_per_voice, modusminor)
-
-                if staffDef.getAttribute('tempus').value == '3':
-                    arsantiqua.sb_major_minor(elements_per_voice)
-                else:
-                    pass
-
-        remove_non_mensural_attributes(self)
+            voices = arsantiqua.fill_section(out_section, all_voices, ids_removeSet, cmn_index, breve)
+            tuplet_minims = None
+
+        # Classify the notes and rests of each voice according to its mensuration:
+        # their attributes are read once into records (see the element_records module), the notes and rests are classified on these records,
+        # and the changes are written back to the document at the end
+        voice_tasks = []
+        for staffDef, voice in zip(stavesDef, voices):
+            voice_tasks.append((VoiceRecords(voice), classification_arguments(ars_type, staffDef, tuplet_minims)))
+        self.semibreve_diagnostics = classify_voices(ars_type, voice_tasks, vectorized_mode, processes)
+        for records, arguments in voice_tasks:
+            records.write_back()
 
     def getModifiedNotes(self, modification_type=None):
         """Return a list of tuplets that indicate the note and the modification it has experienced from its default value.
@@ -298,12 +330,118 @@ class MensuralTranslation(MeiDocument):
         return all_modified_notes
 
 
+def translate(cmn_meidoc, ars_type, mensuration_list, vectorized_mode=False, processes=None):
+    """Translate a CMN-MEI document to Mensural-MEI and return the MensuralTranslation, without modifying the CMN-MEI document.
+
+    The MensuralTranslation takes over the document it translates (it keeps its root element, moves its elements and rewrites the notes in place),
+    so here the translation is done on a private copy of the document. The same CMN-MEI document can then be translated again (e.g., with another mensuration),
+    and many translations can run at the same time in different threads, as the only state shared between them (the tables of the style modules) is read-only.
+    To translate the same document many times, a ParsedPiece writes its text only once.
+
+    Arguments:
+    cmn_meidoc -- the pymei.MeiDocument object that contains the CMN-MEI document intended to be translated to Mensural-MEI
+    ars_type, mensuration_list, vectorized_mode, processes -- see MensuralTranslation
+    """
+    cmn_copy = documentFromText(documentToText(cmn_meidoc)).getMeiDocument()
+    return MensuralTranslation(cmn_copy, ars_type, mensuration_list, vectorized_mode, processes)
+
+
+def translate_text(cmn_text, ars_type, mensuration_list, vectorized_mode=False):
+    """Translate the text of a CMN-MEI document and return the text of the Mensural-MEI document.
+
+    Arguments:
+    cmn_text -- string with the CMN-MEI document (see archives.decode_mei, for the content of an MEI file)
+    ars_type, mensuration_list, vectorized_mode -- see MensuralTranslation
+    """
+    cmn_meidoc = documentFromText(cmn_text).getMeiDocument()
+    return documentToText(MensuralTranslation(cmn_meidoc, ars_type, mensuration_list, vectorized_mode))
+
+
+class ParsedPiece(object):
+    """CMN-MEI document read once, which gives any number of independent translations (e.g., with several mensurations, to compare them):
+
+        piece = parse_piece('TestFiles/IvTrem/zodiacum.mei')
+        for mensuration_list in [[['i', 'p', 'i', 'p']] * 3, [['i', 'i', 'p', 'p']] * 3]:
+            print(documentToText(piece.translate('ars_nova', mensuration_list)))
+
+    The ParsedPiece keeps the text of the document, written when it is created (so the file is read and decoded only once),
+    and each translation takes over its own copy of the document, parsed from that text (by libmei, as a single call).
+    So the translations don't affect each other, the changes made to the original document afterwards don't affect them,
+    and several translations can run at the same time in different threads.
+
+    Methods:
+    document -- Return a new copy of the CMN-MEI document
+    translate -- Translate a copy of the document and return the MensuralTranslation
+    translate_text -- Translate a copy of the document and return the text of the Mensural-MEI document
+
+    Attributes:
+    number_voices -- number of voices (<staffDef> elements) of the piece
+    cmn_text -- text of the CMN-MEI document (see pymei.documentToText), from which each copy is parsed
+    """
+
+    def __init__(self, cmn_meidoc):
+        """
+        Arguments:
+        cmn_meidoc -- the pymei.MeiDocument object that contains the CMN-MEI document (it isn't modified, and it can be modified afterwards)
+        """
+        self.cmn_text = documentToText(cmn_meidoc)
+        self.number_voices = len(cmn_meidoc.getElementsByName('staffDef'))
+
+    def document(self):
+        """Return a new pymei.MeiDocument with a copy of the CMN-MEI document, as it was when the ParsedPiece was created."""
+        return documentFromText(self.cmn_text).getMeiDocument()
+
+    def translate(self, ars_type, mensuration_list, vectorized_mode=False, processes=None):
+        """Translate a copy of the CMN-MEI document and return the MensuralTranslation.
+
+        Arguments:
+        ars_type, mensuration_list, vectorized_mode, processes -- see MensuralTranslation
+        """
+        return MensuralTranslation(self.document(), ars_type, mensuration_list, vectorized_mode, processes)
+
+    def translate_text(self, ars_type, mensuration_list, vectorized_mode=False):
+        """Translate a copy of the CMN-MEI document and return the text of the Mensural-MEI document.
+
+        Arguments:
+        ars_type, mensuration_list, vectorized_mode -- see MensuralTranslation
+        """
+        return documentToText(self.translate(ars_type, mensuration_list, vectorized_mode))
+
+
+def parse_piece(path):
+    """Parse the CMN-MEI file of a piece once, and return its ParsedPiece, which translates it any number of times.
+
+    Arguments:
+    path -- path of the piece: a plain file, a gzip-compressed file ('.gz') or a member of an archive ('archive!member') (see archives.read_document)
+    """
+    return ParsedPiece(archives.read_document(path))
+
+
 if __name__ == "__main__":
+    # Batch mode: translate all the pieces of a manifest (see the batch module)
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        import batch
+        sys.exit(batch.main(sys.argv[2:]))
+    # Merge mode: merge the summaries of the shards of a batch translation (see the shards module)
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        import shards
+        sys.exit(shards.main(sys.argv[2:]))
+    # Serve mode: run a local translation server (see the server module)
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        import server
+        sys.exit(server.main(sys.argv[2:]))
+    # Watch mode: translate again the pieces of a directory tree when they change (see the watch module)
+    if len(sys.argv) > 1 and sys.argv[1] == 'watch':
+        import watch
+        sys.exit(watch.main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser()
     parser.add_argument('piece', help="If the CMN-MEI file of the piece is in the same directory as the MEI_Translator module, just enter the 'name' of the piece (including its extension: '.mei'). If not, insert the whole 'path' of the piece.")
     parser.add_argument('style', choices=['ars_antiqua', 'ars_nova', 'white_mensural'], help="This indicates the style of the piece, whether it belongs to the 'ars antiqua', 'ars nova', or 'white notation' repertoire. If you select 'ars_nova' or 'white_mensural' you have to use the optional argument '-NewVoiceN' to add the mensuration (values for: modusmajor, modusminor, tempus, and prolatio) for each voice. If you choose 'ars_antiqua' you have to use the optional argument '-NewVoiceA' to add the mensuration (values for: breve and modusminor) for each voice.")
     parser.add_argument('-NewVoiceA', nargs=2, action='append', choices=['3', '2', 'p', 'i'], help="Use this flag for each new voice (in ars antiqua) that you are entering. After the flag, use '2' or '3' to indicate the 'division of the breve' (duple of triple division) and then use 'p' or 'i' to indicate the 'modusminor'. The order in which you enter the mensuration of the voices here should be the same as the order of the voices in the CMN-MEI file. \nExample for an Ars Antiqua 4-voice motet with 3 minor semibreves per breve and imperfect modus: -NewVoiceA 3 i -NewVoiceA 3 i -NewVoiceA 3 i -NewVoiceA 3 i") # for now, you have to add each voice
     parser.add_argument('-NewVoiceN', nargs=4, action='append', choices=['p', 'i'], help="Use this flag for each new voice (in ars nova or in white mensural notation) that you are entering. After the flag, use 'p' or 'i' to indicate the mensuration (in the order: modusmajor + modusminor + tempus + prolatio). The order in which you enter the mensuration of the voices here should be the same as the order of the voices in the CMN-MEI file. \nExample for an Ars Nova 3-voice motet with different mensurations for each voice: -NewVoiceN i i p p -NewVoiceN i p i p -NewVoiceN p i i i") # for now, just 4 values per voice are allowed
+    parser.add_argument('-Vectorized', action='store_true', help="Use this flag to classify the notes with the NumPy backend (vectorized module), which is faster for large pieces and corpora. It requires NumPy, and it only affects 'ars_nova' and 'white_mensural' pieces. The result is the same as without the flag.")
+    parser.add_argument('-Processes', type=int, default=None, help="Use this flag to classify the voices of the piece concurrently, in the given number of processes (useful for pieces with many voices). The result is the same as without the flag.")
     args = parser.parse_args()
 
     # Parser errors:
@@ -334,9 +472,12 @@ if __name__ == "__main__":
                 parser.error("Use of invalid arguments for -NewVoiceA. First argument (breve division) should be '3' or '2' (triple or duple).")
             else:
                 pass
+    # NumPy is needed for the vectorized classification
+    if args.Vectorized and not vectorized.available:
+        parser.error("The flag -Vectorized requires NumPy, which is not installed.")
     # Case: the numer of voices entered by the user is smaller/larger than the number of voices in the piece
     print(args.piece)
-    input_doc = documentFromFile(args.piece).getMeiDocument()
+    input_doc = archives.read_document(args.piece)
     stavesDef = input_doc.getElementsByName('staffDef')
     if len(mensurationList) < len(stavesDef):
         parser.error("The number of voices entered (amount of 'NewVoice' flags) is smaller than the number of voices on the CMN-MEI file of the piece.")
@@ -346,5 +487,5 @@ if __name__ == "__main__":
         pass
 
     # Translation step: use of the MensuralMeiTranslatedDocument class
-    mensural_meidoc = MensuralTranslation(input_doc, args.style, mensurationList)
-    documentToFile(mensural_meidoc, args.piece[:-4] + "_MENSURAL.mei")
+    mensural_meidoc = MensuralTranslation(input_doc, args.style, mensurationList, args.Vectorized, args.Processes)
+    archives.write_document(mensural_meidoc, archives.default_output(args.piece))
@@ -0,0 +1,265 @@
+"""
+archives module
+
+Reads the CMN-MEI pieces from plain files, gzip-compressed files ('.mei.gz') and members of zip or tar archives,
+and writes the Mensural-MEI outputs to plain files, gzip-compressed files or a single zip or tar archive,
+so a corpus doesn't have to be unpacked (and packed again) to be translated.
+
+A member of an archive is given by the path of the archive and the name of the member inside it, separated by '!', e.g.: 'corpus.zip!Fauv/fauvel.mei'.
+The members are read straight into memory (and parsed from there), and each process keeps its archives open, so reading many members of the same archive doesn't open it each time.
+Zip archives are better than compressed tar archives for large corpora, as their members can be read in any order without decompressing the members before them.
+
+Functions:
+split_member -- Return the (archive, member) of the path of a piece, or (path, None)
+read_bytes -- Return the content of a piece (plain file, gzip-compressed file or member of an archive)
+decode_mei -- Return the text of the content of an MEI file (UTF-8 or UTF-16), declared as UTF-8
+read_document -- Return the pymei.MeiDocument of a piece (plain file, gzip-compressed file or member of an archive)
+default_output -- Return the default path of the output of a piece
+write_document -- Write a Mensural-MEI document to a file (gzip-compressed if its name ends with '.gz') atomically
+write_bytes -- Write the content of an output to a file (gzip-compressed if its name ends with '.gz') atomically
+
+Classes:
+ArchiveWriter -- Zip or tar archive to which the outputs of a translation are added
+"""
+import codecs
+import gzip
+import io
+import os
+import re
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+from pymei import documentFromFile, documentFromText, documentToFile, documentToText
+
+# Suffixes of the archives, with the mode in which tarfile writes them (None for zip archives)
+ARCHIVE_SUFFIXES = (('.zip', None), ('.tar', 'w'), ('.tar.gz', 'w:gz'), ('.tgz', 'w:gz'), ('.tar.bz2', 'w:bz2'), ('.tar.xz', 'w:xz'))
+
+# Encoding in the XML declaration of an MEI file
+_ENCODING_DECLARATION = re.compile(r"""^(\s*<\?xml[^>]*?encoding\s*=\s*["'])[^"']*(["'])""")
+
+# Archives open in this process (path -> ZipFile or TarFile), and lock that serializes the reads of their members
+_open_archives = {}
+_archives_lock = threading.Lock()
+
+
+def _archive_mode(path):
+    """Return the tarfile mode of an archive ('w', 'w:gz', ...), None for a zip archive, or False if the path is not an archive."""
+    lower_path = path.lower()
+    for suffix, mode in ARCHIVE_SUFFIXES:
+        if lower_path.endswith(suffix):
+            return mode
+    return False
+
+
+def split_member(path):
+    """Return the tuple (archive, member) of a path of the form 'archive!member', or (path, None) if the path is not a member of an archive.
+
+    Arguments:
+    path -- path of the piece
+    """
+    if '!' in path:
+        archive, member = path.split('!', 1)
+        if _archive_mode(archive) is not False:
+            return archive, member
+    return path, None
+
+
+def _open_archive(archive):
+    """Return the ZipFile or TarFile of an archive, opening it the first time it is used in this process."""
+    opened = _open_archives.get(archive)
+    if opened is None:
+        if zipfile.is_zipfile(archive):
+            opened = zipfile.ZipFile(archive, 'r')
+        else:
+            try:
+                opened = tarfile.open(archive, 'r:*')
+            except tarfile.TarError:
+                raise IOError("The file " + archive + " is not a zip or tar archive")
+        _open_archives[archive] = opened
+    return opened
+
+
+def read_bytes(path):
+    """Return the content (bytes) of a piece: a plain file, a gzip-compressed file ('.gz') or a member of an archive ('archive!member').
+    Raise IOError if the member is not in the archive.
+
+    Arguments:
+    path -- path of the piece
+    """
+    archive, member = split_member(path)
+    if member is not None:
+        with _archives_lock:
+            opened = _open_archive(archive)
+            try:
+                if isinstance(opened, zipfile.ZipFile):
+                    data = opened.read(member)
+                else:
+                    member_file = opened.extractfile(member)
+                    if member_file is None:
+                        raise KeyError(member)
+                    data = member_file.read()
+            except KeyError:
+                raise IOError("There is no file '" + member + "' in the archive " + archive)
+    elif path.lower().endswith('.gz'):
+        with gzip.open(path, 'rb') as input_file:
+            data = input_file.read()
+    else:
+        with open(path, 'rb') as input_file:
+            data = input_file.read()
+    if member is not None and member.lower().endswith('.gz'):
+        data = gzip.decompress(data)
+    return data
+
+
+def decode_mei(data):
+    """Return the text (string) of the content of an MEI file, encoded in UTF-8 or UTF-16 (as the files exported by Sibelius), with its XML declaration changed to UTF-8.
+
+    Arguments:
+    data -- content (bytes) of the MEI file
+    """
+    if data.startswith(codecs.BOM_UTF16_LE) or data.startswith(codecs.BOM_UTF16_BE):
+        text = data.decode('utf-16')
+    elif data.startswith(codecs.BOM_UTF8):
+        text = data[len(codecs.BOM_UTF8):].decode('utf-8')
+    else:
+        text = data.decode('utf-8')
+    # The text is given to the parser as UTF-8, so it can't keep declaring another encoding
+    return _ENCODING_DECLARATION.sub(r"\g<1>UTF-8\g<2>", text, count=1)
+
+
+def read_document(path):
+    """Return the pymei.MeiDocument of a piece: a plain file, a gzip-compressed file ('.gz') or a member of an archive ('archive!member').
+
+    Arguments:
+    path -- path of the piece
+    """
+    if split_member(path)[1] is None and not path.lower().endswith('.gz'):
+        # A plain file is read by the parser itself
+        return documentFromFile(path).getMeiDocument()
+    return documentFromText(decode_mei(read_bytes(path))).getMeiDocument()
+
+
+def default_output(path):
+    """Return the default path of the output of a piece: next to the piece, with the suffix '_MENSURAL.mei' (or '_MENSURAL.mei.gz' for a gzip-compressed piece).
+    The output of a member of an archive goes to the directory of the archive, in the same subdirectory as the member inside the archive.
+
+    Arguments:
+    path -- path of the piece
+    """
+    archive, member = split_member(path)
+    if member is not None:
+        path = os.path.join(os.path.dirname(archive), *member.split('/'))
+    if path.lower().endswith('.mei.gz'):
+        return path[:-7] + "_MENSURAL.mei.gz"
+    return path[:-4] + "_MENSURAL.mei"
+
+
+def _write_atomically(output_path, write):
+    """Call write(temporary_path) to write a file next to the output, and then rename it to the output (so the output is never half-written)."""
+    output_directory, output_name = os.path.split(os.path.abspath(output_path))
+    if not os.path.isdir(output_directory):
+        # E.g., the subdirectory of the output of a member of an archive
+        os.makedirs(output_directory)
+    descriptor, temporary_path = tempfile.mkstemp(prefix=output_name + ".", suffix=".tmp", dir=output_directory)
+    os.close(descriptor)
+    try:
+        write(temporary_path)
+        os.replace(temporary_path, output_path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def write_document(mensural_meidoc, output_path):
+    """Write the Mensural-MEI document to a temporary file next to the output, and then rename it to the output (so the output is never half-written).
+    If the name of the output ends with '.gz', the file is gzip-compressed.
+
+    Arguments:
+    mensural_meidoc -- the Mensural-MEI document
+    output_path -- path of the output file
+    """
+    if output_path.lower().endswith('.gz'):
+        write_bytes(documentToText(mensural_meidoc).encode('utf-8'), output_path)
+        return
+
+    def write(temporary_path):
+        if documentToFile(mensural_meidoc, temporary_path) is False:
+            raise IOError("The Mensural-MEI document couldn't be written to " + temporary_path)
+    _write_atomically(output_path, write)
+
+
+def write_bytes(data, output_path):
+    """Write the content of an output (e.g., a serialized Mensural-MEI document) to a file atomically, as write_document.
+    If the name of the output ends with '.gz', the file is gzip-compressed.
+
+    Arguments:
+    data -- content (bytes) of the output
+    output_path -- path of the output file
+    """
+    def write(temporary_path):
+        if output_path.lower().endswith('.gz'):
+            with gzip.open(temporary_path, 'wb') as output_file:
+                output_file.write(data)
+        else:
+            with open(temporary_path, 'wb') as output_file:
+                output_file.write(data)
+    _write_atomically(output_path, write)
+
+
+class ArchiveWriter(object):
+    """Zip or tar archive (the format is given by the suffix of its name: '.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2' or '.tar.xz') to which the outputs of a translation are added.
+
+    The archive is written to a temporary file, which is renamed to the archive when it is closed (so the archive is never half-written).
+    The files can be added from several threads (e.g., the writer threads of pipeline.OutputWriters): they are added one at a time, as tarfile isn't thread-safe.
+
+    Methods:
+    add -- Add a file to the archive
+    close -- Finish the archive
+    """
+
+    def __init__(self, archive_path):
+        """
+        Arguments:
+        archive_path -- path of the archive
+        """
+        mode = _archive_mode(archive_path)
+        if mode is False:
+            raise ValueError("Unknown archive format: " + archive_path + " (it should end with one of: " + ", ".join(suffix for suffix, mode in ARCHIVE_SUFFIXES) + ")")
+        self.path = archive_path
+        archive_directory, archive_name = os.path.split(os.path.abspath(archive_path))
+        descriptor, self.temporary_path = tempfile.mkstemp(prefix=archive_name + ".", suffix=".tmp", dir=archive_directory)
+        os.close(descriptor)
+        if mode is None:
+            self.archive = zipfile.ZipFile(self.temporary_path, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            self.archive = tarfile.open(self.temporary_path, mode)
+        self.lock = threading.Lock()
+
+    def add(self, name, data):
+        """Add a file to the archive.
+
+        Arguments:
+        name -- name of the file inside the archive
+        data -- content (bytes) of the file
+        """
+        with self.lock:
+            if isinstance(self.archive, zipfile.ZipFile):
+                self.archive.writestr(name, data)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = time.time()
+                self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self, keep=True):
+        """Finish the archive (and rename it to its path), or discard it if 'keep' is False."""
+        with self.lock:
+            self.archive.close()
+        if keep:
+            os.replace(self.temporary_path, self.path)
+        else:
+            os.remove(self.temporary_path)
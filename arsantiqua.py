@@ -5,8 +5,14 @@ Contains all the relevant functions for translating Ars Antiqua pieces written i
 
 Functions:
 noterest_to_mensural -- Perform the actual change, in notes and rests, from contemporary to mensural notation
-sb_major_minor -- Identify 'major semibreves' by adding @num, @numbase and @quality attributes to the note-element
+tenuto -- Identify the notes with a tenuto mark (downward stem) and return True/False
+is_tuplet_2_1 -- Identify the 2:1 tuplets and return True/False
+sb_major_minor -- Identify 'major semibreves' by adding @num, @numbase and @quality attributes to the note-element, and return the sequences of semibreves that can't be paired
 fill_section -- Fill the output <section> element with the appropriate musical content
+
+Classes:
+OddSemibreveSequence -- Diagnostic of a sequence of semibreves that can't be grouped into minor-major pairs
+ArsAntiquaLayerBuilder -- Layer builder that encodes the duration of the semibreves grouped in tuplets
 """
 # Ars Antiqua is characterized by the following:
 # 1. Absence of 'minims'
@@ -17,10 +23,14 @@ fill_section -- Fill the output <section> element with the appropriate musical c
 # 4. The fact that the 'breve' can't be catalogued as 'perfect' or 'imperfect', implies that the 'semibreve' can't be 'altered.
 #    It just can't be 'major' or 'minor'.
 # 5. There are no 'maximas' just 'duplex longas'
+from collections import namedtuple
 from fractions import *
 
 from pymei import *
 
+from layer_builder import LayerBuilder
+from mensural_attributes import NOTE_ATTRIBUTES, REST_ATTRIBUTES, remove_non_mensural_attributes
+
 
 # Performs the actual change, in notes and rests, from contemporary to mensural notation.  This involves 2 steps:
 # 1. Note/Rest Shape part: Changes the @dur value to represent mensural figures
@@ -30,8 +40,8 @@ def noterest_to_mensural(notes, rests, modusminor):
     Change the @dur attribute within the <note> and <rest> elements to a mensural-value; and add @num, @numbase and @quality attributes when appropriate.
 
     Arguments:
-    notes -- list of all the <note> elements from a particular voice
-    rests -- list of all the <rest> elements from a particular voice
+    notes -- list of the ElementRecords (see the element_records module) of all the <note> elements from a particular voice
+    rests -- list of the ElementRecords of all the <rest> elements from a particular voice
     modusminor -- integer value of the modusminor from a particular voice
     """
     # Default values for notes according to the mensuration
@@ -49,8 +59,8 @@ def noterest_to_mensural(notes, rests, modusminor):
     # Only breves can be altered (as only longs can be perfect/imperfect)
     # Breves can't be perfect/imperfect (they are always 3 minor-semibreves long)
     for note in notes:
-        dur = note.getAttribute('dur').value
-        durges_num = int(note.getAttribute('dur.ges').value[:-1])
+        dur = note.get('dur')
+        durges_num = int(note.get('dur.ges')[:-1])
 
         # For the tied notes:
         # First find its right (contemporary) duration
@@ -64,7 +74,7 @@ def noterest_to_mensural(notes, rests, modusminor):
             # MISTAKE in tie duration
             else:
                 print("Weird\n The tied note doesn't seem to be any note in the range of longa to maxima - " + str(note) + ", its duration is " + str(durges_num) + "p")
-            note.getAttribute('dur').setValue(dur)
+            note.set('dur', dur)
 
         # Look for the corresponding mensural duration of the notes
 
@@ -81,9 +91,9 @@ def noterest_to_mensural(notes, rests, modusminor):
             if durges_num == l_perf:
                 # Perfection case
                 if modusminor == 2:
-                    note.addAttribute('quality', 'p')
-                    note.addAttribute('num', '2')
-                    note.addAttribute('numbase', '3')
+                    note.set('quality', 'p')
+                    note.set('num', '2')
+                    note.set('numbase', '3')
                     # # And we add a dot of perfection
                     # if not note.hasChildren('dot'):
                     #     dot = MeiElement('dot')
@@ -100,16 +110,16 @@ def noterest_to_mensural(notes, rests, modusminor):
             elif durges_num == l_imp:
                 if modusminor == 3:
                     # Alteration case - here the @dur attribute changes
-                    if note.hasAttribute('artic') and note.getAttribute('artic').value == 'stop':
+                    if note.has('artic') and note.get('artic') == 'stop':
                         mens_dur = 'brevis'
-                        note.addAttribute('quality', 'a')
-                        note.addAttribute('num', '1')
-                        note.addAttribute('numbase', '2')
+                        note.set('quality', 'a')
+                        note.set('num', '1')
+                        note.set('numbase', '2')
                     # Imperfection case
                     else:
-                        note.addAttribute('quality', 'i')
-                        note.addAttribute('num', '3')
-                        note.addAttribute('numbase', '2')
+                        note.set('quality', 'i')
+                        note.set('num', '3')
+                        note.set('numbase', '2')
                 # Default case
                 elif modusminor == 2:
                     pass
@@ -138,28 +148,30 @@ def noterest_to_mensural(notes, rests, modusminor):
                 print("Still tied-note")
 
         # Change the @dur value to the corresponding mensural note value
-        note.getAttribute('dur').setValue(mens_dur)
+        note.set('dur', mens_dur)
+        # Remove/Replace the attributes that are not part of the Mensural-MEI schema
+        remove_non_mensural_attributes(note, NOTE_ATTRIBUTES)
 
     # Rest's Part:
     # Rests can't be modified from its original value
     # Long-rests don't exist, there only is 1, 2 or 3 breve rests.
     for rest in rests:
         # Due to the mRest part of the code, all the rests have a @dur attribute.
-        dur = rest.getAttribute('dur').value
+        dur = rest.get('dur')
         # Semibreve rest
         if dur == "1":
             mens_dur = "semibrevis"
             # Check for mistakes in duration (@dur.ges attribute)
-            if rest.hasAttribute('dur.ges'):
-                durges_num = int(rest.getAttribute('dur.ges').value[:-1])
+            if rest.has('dur.ges'):
+                durges_num = int(rest.get('dur.ges')[:-1])
                 if durges_num != 1024:
                     print("This SEMIBREVE rest " + str(rest) + ", doesn't have the appropriate @dur.ges value, as it is " + str(durges_num) + "p, instead of 1024p\n")
         # Breve rest
         elif dur == "breve":
             mens_dur = "brevis"  # 1B rest??????????
             # Check for mistakes in duration (@dur.ges attribute)
-            if rest.hasAttribute('dur.ges'):
-                durges_num = int(rest.getAttribute('dur.ges').value[:-1])
+            if rest.has('dur.ges'):
+                durges_num = int(rest.get('dur.ges')[:-1])
                 if durges_num != 2048:
                     print("This BREVE rest " + str(rest) + ", doesn't have the appropriate @dur.ges value, as it is " + str(durges_num) + "p, instead of 2048p\n")
         # 2-breve and 3-breve rest
@@ -167,27 +179,27 @@ def noterest_to_mensural(notes, rests, modusminor):
             ##########################################################################################################
             mens_dur = "longa" # THIS WONT BE HERE, INSTEAD WE WILL USE THE MENS_DUR SPECIFIED IN EACH CONDITION (IF)
             ##########################################################################################################
-            if rest.hasAttribute('dur.ges'):
-                durges_num = int(rest.getAttribute('dur.ges').value[:-1])
+            if rest.has('dur.ges'):
+                durges_num = int(rest.get('dur.ges')[:-1])
                 # 2-breve rest
                 if durges_num == l_imp:
-                    rest.addAttribute('EVENTUALDUR', '2B')  # It will be:   mens_dur = '2B'
+                    rest.set('EVENTUALDUR', '2B')  # It will be:   mens_dur = '2B'
                     ###################################################################################################################
                     ###### This will go away when the 3B and 2B rests (3-spaces and 2-spaces rests) are implemented in Verovio ########
                     if modusminor == 3:  # 'imperfected'
-                        rest.addAttribute('num', '3')
-                        rest.addAttribute('numbase', '2')
+                        rest.set('num', '3')
+                        rest.set('numbase', '2')
                     else:   # Default
                         pass
                     ###################################################################################################################
                 # 3-breve rest
                 elif durges_num == l_perf:
-                    rest.addAttribute('EVENTUALDUR', '3B')  # It will be:   mens_dur = '3B'
+                    rest.set('EVENTUALDUR', '3B')  # It will be:   mens_dur = '3B'
                     ###################################################################################################################
                     ###### This will go away when the 3B and 2B rests (3-spaces and 2-spaces rests) are implemented in Verovio ########
                     if modusminor == 2:  # 'perfected'
-                        rest.addAttribute('num', '2')
-                        rest.addAttribute('numbase', '3')
+                        rest.set('num', '2')
+                        rest.set('numbase', '3')
                     else:   # Default
                         pass
                     ###################################################################################################################
@@ -198,10 +210,10 @@ def noterest_to_mensural(notes, rests, modusminor):
             else:
                 # 3-breve rest
                 if modusminor == 3:
-                    rest.addAttribute('EVENTUALDUR', '3B')
+                    rest.set('EVENTUALDUR', '3B')
                 # 2-breve rest
                 elif modusminor == 2:
-                    rest.addAttribute('EVENTUALDUR', '2B')
+                    rest.set('EVENTUALDUR', '2B')
                 # Check for mistakes in duration (@dur.ges attribute)
                 else:
                     print("This 'LONG' Rest " + str(rest) + ", doesn't have the appropriate @dur.ges value")
@@ -211,218 +223,171 @@ def noterest_to_mensural(notes, rests, modusminor):
             mens_dur = dur
 
         # Change the @dur value to the corresponding mensural note value
-        rest.getAttribute('dur').setValue(mens_dur)
+        rest.set('dur', mens_dur)
+        # Remove/Replace the attributes that are not part of the Mensural-MEI schema
+        remove_non_mensural_attributes(rest, REST_ATTRIBUTES)
+
+
+def tenuto(element):
+    """Return True if the element has a tenuto mark (a downward stem), otherwise return False.
+
+    By the time the semibreves are paired, noterest_to_mensural has already replaced the @artic='ten' of the <note> elements by @stem.dir='down' (see the mensural_attributes module).
+    <rest> elements keep their @artic attribute (and their @stem.dir, which is not a tenuto mark).
+
+    Arguments:
+    element -- the ElementRecord (see the element_records module) of a <note> or <rest> element
+    """
+    if element.name == 'note' and element.has('stem.dir') and element.get('stem.dir') == 'down':
+        return True
+    return element.has('artic') and element.get('artic') == 'ten'
+
+
+# Diagnostic of a sequence of semibreves that can't be grouped into minor-major pairs (see sb_major_minor):
+# start, end -- positions of the elements (breves, longas, maximas or tuplets) that delimit the sequence (start is -1 when the sequence opens the voice)
+# start_element, end_element -- the ElementRecords of the elements at these positions (start_element is None when the sequence opens the voice)
+# number_sb -- number of semibreves in the sequence (an odd number)
+OddSemibreveSequence = namedtuple('OddSemibreveSequence', ['start', 'end', 'start_element', 'end_element', 'number_sb'])
+
+
+def is_tuplet_2_1(element):
+    """Return True if the element (an ElementRecord, or None) is a 2:1 <tuplet> (two semibreves in the time of one), otherwise return False."""
+    return (element is not None and element.name == 'tuplet' and
+            element.get('num') == '2' and element.get('numbase') == '1')
 
 
 # Finds and indicates which Semibreves are Major, completing the encoding of the "Note's Actual Duration" part.
 def sb_major_minor(children_of_voiceStaff):
     """
     Add @quality, @num and @numbase attributes to indicate a 'major semibreve' (as opposed to a 'minor semibreve').
+    Return a list with an OddSemibreveSequence for each sequence of semibreves that couldn't be grouped into minor-major pairs (empty if there is none).
+
+    The voice is swept once, by position, to find the elements (breves, longas, maximas and tuplets) that delimit the sequences of semibreves;
+    then the major semibreves of each sequence are picked by their positions, and the attributes are added to all of them at the end.
 
     Arguments:
-    children_of_voiceStaff -- list of all the MeiElement objects contained in the <staff> element of a single voice, this includes: <tuplet>, <note> and <rest> elements.
+    children_of_voiceStaff -- list of the ElementRecords (see the element_records module) of all the elements contained in the <staff> element of a single voice, this includes: <tuplet>, <note> and <rest> elements.
     """
+    # Positions of the breves (longas, maximas) and tuplets of the voice, the first sequence of semibreves starts at the beginning of the voice (position -1)
     indices_BrevesOrTuplets = [-1]
-    for element in children_of_voiceStaff:
-        if (element.name == 'tuplet') or (element.hasAttribute('dur') and (element.getAttribute('dur').value == 'brevis' or element.getAttribute('dur').value == 'longa' or element.getAttribute('dur').value == 'maxima')):
-            indices_BrevesOrTuplets.append(children_of_voiceStaff.index(element))
+    for index, element in enumerate(children_of_voiceStaff):
+        if element.name == 'tuplet':
+            indices_BrevesOrTuplets.append(index)
+        elif element.has('dur'):
+            dur = element.get('dur')
+            if dur == 'brevis' or dur == 'longa' or dur == 'maxima':
+                indices_BrevesOrTuplets.append(index)
+
+    # Positions of the major semibreves
+    majors = []
+    diagnostics = []
     for i in range(0, len(indices_BrevesOrTuplets)-1):
         start = indices_BrevesOrTuplets[i]
         end = indices_BrevesOrTuplets[i+1]
         number_sb = end - start - 1
-        # Case 1: Even number of semibreves
+        # Case 1: Even number of semibreves, all of them are grouped into minor-major pairs
         if number_sb % 2 == 0:
-            cont_sb = 0
-            for j in range(start+1, end):
-                cont_sb = cont_sb + 1
-                # 2nd, 4th, 6th, ... semibreve in the sequence; generally, these are the ones that are Major (default case), but there are exceptions
-                if cont_sb % 2 == 0:
-                    previous_sb = children_of_voiceStaff[j-1]
-                    # The exception: tenuto marks (downward stems) in the previous note (1st, 3rd, 5th, ... semibreve)
-                    if previous_sb.hasAttribute('artic') and previous_sb.getAttribute('artic').value == 'ten':
-                        previous_sb.addAttribute('quality', 'major')
-                        previous_sb.addAttribute('num', '1')
-                        previous_sb.addAttribute('numbase', '2')
-                    # The default case:
-                    else:
-                        current_sb = children_of_voiceStaff[j]
-                        current_sb.addAttribute('quality', 'major')
-                        current_sb.addAttribute('num', '1')
-                        current_sb.addAttribute('numbase', '2')
-                else:
-                    pass
+            first, last = start + 1, end
         # Case 2: Odd number of semibreves
         else:
             # This can (should) only happen when there is a 2:1 tuplet at one end of the sequence of semibreves,
             # so that the whole tuplet is equal to just 1 minor semibreve,
             # and the semibreve that precedes/follows it (ususally has a downward stem to indicate its longer duration in the group) is the Major Semibreve that completes the Perfect Breve.
             # Without this grouping (major semibreve and tuplet), we are left with an even number of semibreves that can be grouped into minor-major pairs, as usual.
-            start_element = children_of_voiceStaff[start]
+            start_element = children_of_voiceStaff[start] if start >= 0 else None
             end_element = children_of_voiceStaff[end]
-            # If the 2:1 tuplet precedes of the sequence of semibreves
-            if (start_element.name == 'tuplet' and start_element.getAttribute('num').value == '2' and start_element.getAttribute('numbase').value == '1'):
-                # The semibreve that follows this 2:1 tuplet should be major (completing the perfection)
-                major_sb = children_of_voiceStaff[start + 1]
-                major_sb.addAttribute('quality', 'major')
-                major_sb.addAttribute('num', '1')
-                major_sb.addAttribute('numbase', '2')
-                # The other semibreves are grouped into minor-major pairs
-                cont_sb = 0
-                for j in range(start+2, end):
-                    cont_sb = cont_sb + 1
-                    # The second semibreve of each pair: generally it is Major (default case), but there are exceptions
-                    if cont_sb % 2 == 0:
-                        previous_sb = children_of_voiceStaff[j-1]
-                        # The exception: tenuto marks (downward stems) in the previous note (1st, 3rd, 5th, ... semibreve)
-                        if previous_sb.hasAttribute('artic') and previous_sb.getAttribute('artic').value == 'ten':
-                            previous_sb.addAttribute('quality', 'major')
-                            previous_sb.addAttribute('num', '1')
-                            previous_sb.addAttribute('numbase', '2')
-                        # The default case:
-                        else:
-                            current_sb = children_of_voiceStaff[j]
-                            current_sb.addAttribute('quality', 'major')
-                            current_sb.addAttribute('num', '1')
-                            current_sb.addAttribute('numbase', '2')
-                    # The first semibreve of each pair (it is generally minor, so we don't make any changes to it)
-                    else:
-                        pass
-            # If the 2:1 tuplet follows the sequence of semibreves
-            elif (end_element.name == 'tuplet' and end_element.getAttribute('num').value == '2' and end_element.getAttribute('numbase').value == '1'):
-                # The semibreve that precedes the 2:1 tuplet, should be major (completing the perfection)
-                major_sb = children_of_voiceStaff[end - 1]
-                major_sb.addAttribute('quality', 'major')
-                major_sb.addAttribute('num', '1')
-                major_sb.addAttribute('numbase', '2')
-                # The other semibreves are grouped into minor-major pairs
-                cont_sb = 0
-                for j in range(start+1, end-1):
-                    cont_sb = cont_sb + 1
-                    # The second semibreve of each pair: generally it is Major (default case), but there are exceptions
-                    if cont_sb % 2 == 0:
-                        previous_sb = children_of_voiceStaff[j-1]
-                        # The exception: tenuto marks (downward stems) in the previous note (1st, 3rd, 5th, ... semibreve)
-                        if previous_sb.hasAttribute('artic') and previous_sb.getAttribute('artic').value == 'ten':
-                            previous_sb.addAttribute('quality', 'major')
-                            previous_sb.addAttribute('num', '1')
-                            previous_sb.addAttribute('numbase', '2')
-                        # The default case:
-                        else:
-                            current_sb = children_of_voiceStaff[j]
-                            current_sb.addAttribute('quality', 'major')
-                            current_sb.addAttribute('num', '1')
-                            current_sb.addAttribute('numbase', '2')
-                    # The first semibreve of each pair (it is generally minor, so we don't make any changes to it)
-                    else:
-                        pass
+            # If the 2:1 tuplet precedes of the sequence of semibreves,
+            # the semibreve that follows this 2:1 tuplet should be major (completing the perfection)
+            if is_tuplet_2_1(start_element):
+                majors.append(start + 1)
+                first, last = start + 2, end
+            # If the 2:1 tuplet follows the sequence of semibreves,
+            # the semibreve that precedes the 2:1 tuplet, should be major (completing the perfection)
+            elif is_tuplet_2_1(end_element):
+                majors.append(end - 1)
+                first, last = start + 1, end - 1
             # Mistake case: If there is no tuplet 2:1 at any of the ends of the sequence, there shouldn't be an odd number of semibreves
             else:
-                print("This shouldn't happen! \nThere is an odd number of semibreves between two perfect breves (or tuplets that are equivalent to a perfect breve), \nwhich doesn't allow to form minor-major (or major-minor) pairs of semibreves.")
-                print("You can find these breves between the " + str(start_element.name) + " with id " + str(start_element.id) + " and the " + str(end_element.name) + " with id " + str(end_element.id))
+                diagnostics.append(OddSemibreveSequence(start, end, start_element, end_element, number_sb))
+                continue
+        # The other semibreves are grouped into minor-major pairs (first, first+1), (first+2, first+3), ...
+        for j in range(first + 1, last, 2):
+            # The exception: tenuto marks (downward stems) in the first semibreve of the pair
+            if tenuto(children_of_voiceStaff[j-1]):
+                majors.append(j-1)
+            # The default case: the second semibreve of the pair is the Major one
+            else:
+                majors.append(j)
+
+    # Write the quality of all the major semibreves at once
+    for index in majors:
+        major_sb = children_of_voiceStaff[index]
+        major_sb.set('quality', 'major')
+        major_sb.set('num', '1')
+        major_sb.set('numbase', '2')
+
+    for sequence in diagnostics:
+        if sequence.start_element is None:
+            start_description = "beginning of the voice"
+        else:
+            start_description = str(sequence.start_element.name) + " with id " + str(sequence.start_element.id)
+        print("This shouldn't happen! \nThere is an odd number of semibreves between two perfect breves (or tuplets that are equivalent to a perfect breve), \nwhich doesn't allow to form minor-major (or major-minor) pairs of semibreves.")
+        print("You can find these breves between the " + start_description + " and the " + str(sequence.end_element.name) + " with id " + str(sequence.end_element.id))
+
+    return diagnostics
+
+
+class ArsAntiquaLayerBuilder(LayerBuilder):
+    """Fill the <section> element of an Ars Antiqua piece (see layer_builder.LayerBuilder), encoding the duration of the semibreves grouped in tuplets."""
 
+    def __init__(self, ids_removeSet, doc_index, breve_choice):
+        LayerBuilder.__init__(self, ids_removeSet, doc_index)
+        self.breve_choice = breve_choice
 
-def fill_section(out_section, all_voices, ids_removeList, input_doc, breve_choice):
+    def tuplet(self, tuplet, voice):
+        # Add the <tuplet> to the list of elements in the voice
+        voice.elements.append(tuplet)
+        # The only tuplets present in Ars Antiqua are tuplets of semibreves
+        num = int(tuplet.getAttribute('num').value)
+        numbase = int(tuplet.getAttribute('numbase').value)
+        # @numbase is usually '2', because generally a breve = 3 minor semibreves, so tuplets of 3:2 are frequently used to represent 3 (minor) semibreves per breve.
+        # There are also other cases in which we have more than 3 semibreves per breve: 4:2, 5:2, 6:2, and 7:2. According to Petrus de Cruce, you could have up to 9:2
+        if numbase == 2:
+            base = int(self.breve_choice)
+        # There is also the case of 2:1 tuplets, in which case @numbase = '1', to indicate a group of two semibreves which should be interpreted as one minor semibreve
+        elif numbase == 1:
+            base = 1
+        else:
+            print("Shouldn't happen!")
+            base = numbase
+        # Find the simplified ratio between @numbase and @num
+        durRatio = Fraction(base, num)
+        # If the ratio isn't 1, add the simplified @num and @numbase attributes to each of the notes in the tuplet
+        if durRatio != 1:
+            for note in tuplet.getChildren():
+                note.addAttribute('num', str(durRatio.denominator))
+                note.addAttribute('numbase', str(durRatio.numerator))
+        # And add each note to the <layer> of the voice
+        self.add_grouped(tuplet, voice)
+
+
+def fill_section(out_section, all_voices, ids_removeSet, doc_index, breve_choice):
     """
     Fill the <section> element of the Mensural-MEI document with the appropriate musical content.
 
-    This function calls the other two functions (noterest_to_mensural and sb_major_minor) to fill the <section> element with the right note (and rest) values.
     The appropriate musical content for the <section> in a Mensural-MEI document includes <note> and <rest> elements, but not <tuplet> or <tie> elements.
+    The <note> and <rest> elements of each voice, and the ordered list of its elements (<note>, <rest> and <tuplet>), are collected while filling the section,
+    to be passed to the other two functions (noterest_to_mensural and sb_major_minor).
 
     Arguments:
     out_section -- the <section> element to be filled in
     all_voices -- list of lists, each sublist represents a particular voice in the CMN-MEI document and contains all the <staff> elements from that voice
-    ids_removeList -- list of <note> elements that shouldn't be included in the Mensural-MEI output document (generally notes that are part of a tie)
-    input_doc -- the pymei.MeiDocument that has all the CMN-MEI file information
+    ids_removeSet -- set of the ids of the <note> elements that shouldn't be included in the Mensural-MEI output document (generally notes that are part of a tie)
+    doc_index -- the DocumentIndex of the pymei.MeiDocument that has all the CMN-MEI file information
     breve_choice -- string that indicates the division of the breve: '3' or '2'
+
+    Return value:
+    List of the VoiceContent of each voice.
     """
-    # List of lists, each of them with all the elements of one voice
-    voices_elements = []
-    # Filling the section element:
-    for ind_voice in all_voices:
-        # Add a staff for each voice, with the id corresponding to the first <staff> element in the input_file for that exact voice
-        staff = MeiElement('staff')
-        old_staff = input_doc.getElementsByName('staff')[all_voices.index(ind_voice)]
-        staff.setId(old_staff.id)
-        staff.addAttribute(old_staff.getAttribute('n'))
-        out_section.addChild(staff)
-        # Add a layer inside the <staff> for each voice, with the id corresponding to the first <layer> element in the input_file for that exact voice
-        layer = MeiElement('layer')
-        old_layer = input_doc.getElementsByName('layer')[all_voices.index(ind_voice)]
-        layer.setId(old_layer.id)
-        layer.addAttribute(old_layer.getAttribute('n'))
-        staff.addChild(layer)
-        # Ordered list of all the elements of one voice (<note>, <rest> and <tuplet>), useful for identifying the 'Major Semibreves' of the voice
-        elements_per_voice = []
-        # Fill each voice (fill the <layer> of each <staff>) with musical information (notes/rests)
-        for i in range(0, len(ind_voice)):
-            musical_content = ind_voice[i].getChildrenByName('layer')[0].getChildren()
-            # Add the elements of each measure into the <layer> and a <barLine/> element after the measure-content
-            for element in musical_content:
-                # Tied notes
-                # If the element is a tied note (other than the first note of the tie: <note @dur = 'TiedNote!'>), it is not included in the output file (as only the first tied note will be included with the right note shape and duration -@dur.ges-)
-                if element.id in ids_removeList:
-                    pass
-                # Tuplets
-                elif element.name == 'tuplet':
-                    # Add the <tuplet> to the list of elements in the voice
-                    elements_per_voice.append(element)
-                    # The only tuplets present in Ars Antiqua are tuplets of semibreves
-                    tuplet = element
-                    num = int(tuplet.getAttribute('num').value)
-                    numbase = int(tuplet.getAttribute('numbase').value)
-                    # @numbase is usually '2', because generally a breve = 3 minor semibreves, so tuplets of 3:2 are frequently used to represent 3 (minor) semibreves per breve.
-                    # There are also other cases in which we have more than 3 semibreves per breve: 4:2, 5:2, 6:2, and 7:2. According to Petrus de Cruce, you could have up to 9:2
-                    if numbase == 2:
-                        base = int(breve_choice)
-                    # There is also the case of 2:1 tuplets, in which case @numbase = '1', to indicate a group of two semibreves which should be interpreted as one minor semibreve
-                    elif numbase == 1:
-                        base = 1
-                    else:
-                        print("Shouldn't happen!")
-                    # Find the simplified ratio between @numbase and @num
-                    notes_grouped = tuplet.getChildren()
-                    durRatio = Fraction(base, num)
-                    # If the ratio isn't 1, add the simplified @num and @numbase attributes to each of the notes in the tuplet
-                    # And add each note to the <layer> of the voice
-                    if durRatio == 1:
-                        for note in notes_grouped:
-                            layer.addChild(note)
-                            # Adding the <dot> element after a 'staccated' note or rest element
-                            if note.hasAttribute('artic') and note.getAttribute('artic').value == "stacc":
-                                layer.addChild(MeiElement('dot'))
-                    else:
-                        notes_grouped = tuplet.getChildren()
-                        for note in notes_grouped:
-                            note.addAttribute('num', str(durRatio.denominator))
-                            note.addAttribute('numbase', str(durRatio.numerator))
-                            layer.addChild(note)
-                            # Adding the <dot> element after a 'staccated' note or rest element
-                            if note.hasAttribute('artic') and note.getAttribute('artic').value == "stacc":
-                                layer.addChild(MeiElement('dot'))
-                # mRests
-                elif element.name == 'mRest':
-                    # Change into simple <rest> elements (as there are no measure-rests in mensural notation)
-                    rest = MeiElement('rest')
-                    rest.id = element.id
-                    rest.setAttributes(element.getAttributes())
-                    layer.addChild(rest)
-                    # If there is no duration encoded in the rest, this mRest has the duration of the measure (which, generally, is a long)
-                    if rest.hasAttribute('dur') is False:
-                        rest.addAttribute('dur', 'long')
-                    # Add the <rest> to the list of elements in the voice
-                    elements_per_voice.append(rest)
-                # Notes and simple rests
-                else:
-                    layer.addChild(element)
-                    # Add the <note> or <rest> to the list of elements in the voice
-                    elements_per_voice.append(element)
-
-                # Adding the <dot> element after a 'staccated' note or rest element
-                if element.hasAttribute('artic') and element.getAttribute('artic').value == "stacc":
-                    layer.addChild(MeiElement('dot'))
-            # Add barline
-            layer.addChild(MeiElement('barLine'))
-        # Completing the list of lists with the mei-elements of each voice
-        voices_elements.append(elements_per_voice)
-
-    return voices_elements
+    builder = ArsAntiquaLayerBuilder(ids_removeSet, doc_index, breve_choice)
+
+    return builder.fill_section(out_section, all_voices)
@@ -0,0 +1,160 @@
+"""
+async_translation module
+
+Asyncio entry points of the translator, for services that run on an event loop (e.g., an ingestion service).
+The parsing, translation and writing of the pieces are blocking and CPU-bound, so they run in an executor (a pool of threads or processes),
+and the event loop keeps answering other requests while they run:
+
+    async with AsyncTranslator(limit=4) as translator:
+        mensural_text = await translator.translate_text(cmn_text, 'ars_nova', mensuration_list)
+        async for result in translator.batch(batch.read_manifest('manifest.csv')):
+            print(result['piece'], result['status'])
+
+The translator applies backpressure: at most 'limit' translations are in the executor at the same time, and the others wait for a free slot
+(the batch iterator doesn't even start the next pieces until there is room for them).
+A translation can be cancelled (e.g., with asyncio.wait_for, or by cancelling its task): if it is still waiting for a slot or in the queue of the executor, it never runs;
+if it is already running, its result is discarded (the slot is freed when it finishes, so the limit counts the work that is really running).
+
+Functions:
+translate_async -- Translate a CMN-MEI document in an executor, and return the MensuralTranslation
+
+Classes:
+AsyncTranslator -- Asyncio translator with an executor, a concurrency limit and cancellation
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import archives
+import batch
+from MEI_Translator import translate, translate_text
+
+
+async def translate_async(cmn_meidoc, ars_type, mensuration_list, executor=None, vectorized_mode=False):
+    """Translate a CMN-MEI document in a thread of the executor, without modifying the document (see MEI_Translator.translate), and return the MensuralTranslation.
+
+    Arguments:
+    cmn_meidoc -- the pymei.MeiDocument object that contains the CMN-MEI document intended to be translated to Mensural-MEI
+    ars_type, mensuration_list, vectorized_mode -- see MEI_Translator.MensuralTranslation
+    executor -- a thread pool executor (default None: the default executor of the event loop)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, translate, cmn_meidoc, ars_type, mensuration_list, vectorized_mode)
+
+
+class AsyncTranslator(object):
+    """Asyncio translator that runs the translations in an executor, with at most 'limit' of them in the executor at the same time.
+
+    The pymei documents can't leave the process, so translate() needs a thread pool executor;
+    translate_text(), translate_piece() and batch() also work with a process pool executor, in which the translations run in parallel.
+
+    Methods:
+    translate -- Translate a CMN-MEI document, and return the MensuralTranslation
+    translate_text -- Translate the text of a CMN-MEI document, and return the text of the Mensural-MEI document
+    translate_piece -- Translate a piece of a manifest (and write its output), and return its result
+    batch -- Asynchronous iterator over the results of the pieces of a manifest, as they finish
+    close -- Shut down the executor, if the translator created it
+    """
+
+    def __init__(self, executor=None, limit=4):
+        """
+        Arguments:
+        executor -- a concurrent.futures executor (default None: the translator creates a thread pool of 'limit' threads, and shuts it down when it is closed)
+        limit -- maximum number of translations in the executor at the same time (default 4)
+        """
+        if limit < 1:
+            raise ValueError("The limit of concurrent translations should be at least 1.")
+        self.limit = limit
+        self.own_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(limit)
+        self.executor = executor
+        self.slots = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def _run(self, function, *arguments):
+        """Run function(*arguments) in the executor when there is a free slot, and return its result."""
+        loop = asyncio.get_running_loop()
+        if self.slots is None:
+            # Created here, so it belongs to the running event loop
+            self.slots = asyncio.Semaphore(self.limit)
+        await self.slots.acquire()
+        try:
+            future = self.executor.submit(function, *arguments)
+        except BaseException:
+            self.slots.release()
+            raise
+        # The slot is freed when the work finishes (or is cancelled before it starts), not when the caller stops waiting for it
+        future.add_done_callback(lambda done: loop.call_soon_threadsafe(self.slots.release))
+        return await asyncio.wrap_future(future)
+
+    async def translate(self, cmn_meidoc, ars_type, mensuration_list, vectorized_mode=False):
+        """Translate a CMN-MEI document, without modifying it (see MEI_Translator.translate), and return the MensuralTranslation.
+
+        Arguments:
+        cmn_meidoc -- the pymei.MeiDocument object that contains the CMN-MEI document intended to be translated to Mensural-MEI
+        ars_type, mensuration_list, vectorized_mode -- see MEI_Translator.MensuralTranslation
+        """
+        if isinstance(self.executor, ProcessPoolExecutor):
+            raise TypeError("A pymei document can't be sent to a process pool: use translate_text, or a thread pool executor.")
+        return await self._run(translate, cmn_meidoc, ars_type, mensuration_list, vectorized_mode)
+
+    async def translate_text(self, cmn_text, ars_type, mensuration_list, vectorized_mode=False):
+        """Translate the text of a CMN-MEI document, and return the text of the Mensural-MEI document.
+
+        Arguments:
+        cmn_text -- the CMN-MEI document, as a string (or as the bytes of an MEI file, in UTF-8 or UTF-16)
+        ars_type, mensuration_list, vectorized_mode -- see MEI_Translator.MensuralTranslation
+        """
+        if isinstance(cmn_text, bytes):
+            cmn_text = archives.decode_mei(cmn_text)
+        return await self._run(translate_text, cmn_text, ars_type, mensuration_list, vectorized_mode)
+
+    async def translate_piece(self, piece):
+        """Translate a piece of a manifest, write its output, and return its result (see batch.translate_piece; a failed piece gives a result with the status 'failed').
+
+        Arguments:
+        piece -- dictionary with the keys: 'piece', 'style', 'mensuration' and 'output' (see batch.read_manifest)
+        """
+        return await self._run(batch.translate_piece, piece)
+
+    async def batch(self, pieces):
+        """Asynchronous iterator over the results of the pieces (see translate_piece), in the order in which they finish.
+
+        Only 'limit' pieces are started at a time, and the next ones are started as the results come out.
+        If the iteration stops before the end (or the task that iterates is cancelled), the pieces that haven't finished are cancelled.
+
+        Arguments:
+        pieces -- iterable of pieces of a manifest (see batch.read_manifest)
+        """
+        pieces = iter(pieces)
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.limit:
+                    try:
+                        piece = next(pieces)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self.translate_piece(piece)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def close(self):
+        """Shut down the executor, if the translator created it (without waiting for the translations that are still running)."""
+        if self.own_executor:
+            self.executor.shutdown(wait=False)
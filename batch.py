@@ -0,0 +1,543 @@
+"""
+batch module
+
+Translate a whole corpus of CMN-MEI pieces to Mensural-MEI with a single command:
+
+    python MEI_Translator.py batch manifest.csv --jobs 4 --summary summary.json
+
+The pieces are listed in a manifest (a CSV or a JSON file) with their style and the mensuration of each voice.
+They are translated in a pool of worker processes (each worker imports the translator once and translates many pieces),
+and a summary with the successes, the failures and the time taken by each piece is printed (and optionally written to a JSON file).
+Each piece runs under a timeout and a memory ceiling, and the workers are recycled after a number of pieces (see the worker_pool module),
+so a malformed piece only fails by itself; the pieces that failed can be written, with their errors, to a quarantine file (a JSON manifest).
+A large corpus can be split across several nodes with the option --shard i/N, and the summaries of the shards merged afterwards (see the shards module).
+Each piece that finishes is recorded in a checkpoint journal and the outputs are written atomically, so an interrupted run can be resumed with --resume (see the journal module).
+The pieces can be plain files, gzip-compressed files or members of zip and tar archives, and the outputs can be written to a single archive with --archive (see the archives module).
+With --prefetch, the pieces are read ahead and the outputs written in background threads, overlapping the I/O with the translation (see the pipeline module).
+With --incremental, only the measures that changed since the previous translation of each piece are translated again (see the incremental module).
+With --cache, the translations are kept in a persistent cache, and the pieces that didn't change since they were last translated (with the same rules) come from it (see the translation_cache module), except with --incremental.
+
+CSV manifest -- one piece per row, with the columns: piece, style, mensuration (and, optionally, output).
+The mensuration gives the values of each voice separated by spaces, and the voices separated by semicolons, e.g.: 'i p i p; i p i p; i i i p' (ars nova / white mensural) or '3 p; 3 p; 3 p' (ars antiqua).
+JSON manifest -- a list of objects with the keys: piece, style, mensuration (a list with a list of values for each voice) and, optionally, output.
+The paths of the pieces (and outputs) are relative to the directory of the manifest; a member of an archive is given as 'archive!member' (e.g., 'corpus.zip!Fauv/fauvel.mei').
+By default, the output of a piece is written next to it (next to the archive, for a member of an archive), with the suffix '_MENSURAL.mei' (see archives.default_output).
+
+Functions:
+read_manifest -- Return the list of pieces (dictionaries) of a CSV or JSON manifest
+parse_mensuration -- Return the mensuration of the voices given by a string such as 'i p i p; i p i p'
+check_mensuration -- Return the problem with the style or the mensuration of a piece, or None
+capture_output -- Context manager that captures what the current thread prints
+translate_piece -- Translate one piece of the manifest and return its result
+failed_result -- Return the result of a piece whose translation didn't finish
+resumed_result -- Return the result of a piece that was already translated, from its journal entry
+run_batch -- Translate all the pieces of a manifest in a pool of processes and return their results
+print_result -- Print the status and time of the result of a piece
+main -- Command line interface of the batch mode
+"""
+import argparse
+import csv
+import io
+import json
+import hashlib
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from pymei import documentFromText, documentToText
+
+import archives
+import incremental
+import journal
+import pipeline
+import shards
+import translation_cache
+from MEI_Translator import MensuralTranslation
+from worker_pool import WorkerPool
+
+# Valid values of the mensuration of a voice, for each style
+STYLES = {
+    'ars_antiqua': (['3', '2'], ['p', 'i']),
+    'ars_nova': (['p', 'i'],) * 4,
+    'white_mensural': (['p', 'i'],) * 4,
+}
+
+
+def read_manifest(manifest_path):
+    """Return the list of pieces of a manifest. Each piece is a dictionary with the keys: 'index' (position of the piece in the manifest), 'piece', 'style', 'mensuration' and 'output' (all the paths are resolved).
+
+    Arguments:
+    manifest_path -- path of the CSV (.csv) or JSON (.json) manifest
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r') as manifest:
+        if manifest_path.lower().endswith('.json'):
+            rows = json.load(manifest)
+        else:
+            rows = []
+            for row in csv.DictReader(manifest):
+                row['mensuration'] = parse_mensuration(row['mensuration'])
+                rows.append(row)
+
+    pieces = []
+    for index, row in enumerate(rows):
+        piece = os.path.join(base, row['piece'].strip())
+        output = (row.get('output') or '').strip()
+        if output:
+            output = os.path.join(base, output)
+        else:
+            output = archives.default_output(piece)
+        pieces.append({'index': index, 'piece': piece, 'style': row['style'].strip(), 'mensuration': row['mensuration'], 'output': output})
+    return pieces
+
+
+def parse_mensuration(mensuration_text):
+    """Return the mensuration (a list with the list of values of each voice) given by a string with the values of each voice separated by spaces,
+    and the voices separated by semicolons, e.g.: 'i p i p; i p i p; i i i p' (ars nova / white mensural) or '3 p; 3 p; 3 p' (ars antiqua).
+
+    Arguments:
+    mensuration_text -- the string with the mensuration of the voices
+    """
+    return [voice.split() for voice in mensuration_text.split(';') if voice.strip()]
+
+
+def check_mensuration(style, mensuration):
+    """Return a string that describes the problem with the style or the mensuration of a piece, or None if there is no problem.
+
+    Arguments:
+    style -- 'ars_antiqua', 'ars_nova' or 'white_mensural'
+    mensuration -- list with the list of values of each voice (as in the mensuration_list of MensuralTranslation)
+    """
+    if style not in STYLES:
+        return "Invalid style '" + str(style) + "', it should be one of: " + ", ".join(sorted(STYLES))
+    if not mensuration:
+        return "No voice mensuration information has been provided."
+    valid_values = STYLES[style]
+    for voice in mensuration:
+        if len(voice) != len(valid_values) or any(value not in valid for value, valid in zip(voice, valid_values)):
+            return "Invalid mensuration " + " ".join(voice) + " for the style " + style + ", the values of each voice should be: " + " + ".join("/".join(valid) for valid in valid_values)
+    return None
+
+
+class _ThreadOutput(object):
+    """Replacement of sys.stdout that sends what each thread prints to the stream of that thread (see capture_output), or to the original sys.stdout."""
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.local = threading.local()
+
+    def _stream(self):
+        return getattr(self.local, 'stream', None) or self.stdout
+
+    def write(self, text):
+        return self._stream().write(text)
+
+    def flush(self):
+        return self._stream().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stdout, name)
+
+
+_output_lock = threading.Lock()
+
+
+@contextmanager
+def capture_output(stream):
+    """Context manager that sends what the current thread prints to the stream (and only what this thread prints,
+    unlike contextlib.redirect_stdout, so the pieces can be translated in several threads at the same time, e.g., by the async_translation module).
+
+    Arguments:
+    stream -- file-like object (e.g., an io.StringIO) that receives the output
+    """
+    with _output_lock:
+        if not isinstance(sys.stdout, _ThreadOutput):
+            sys.stdout = _ThreadOutput(sys.stdout)
+        thread_output = sys.stdout
+    previous = getattr(thread_output.local, 'stream', None)
+    thread_output.local.stream = stream
+    try:
+        yield stream
+    finally:
+        thread_output.local.stream = previous
+
+
+def translate_piece(piece):
+    """Translate one piece of the manifest, write its output file, and return its result.
+
+    The result is a dictionary with the keys of the piece and: 'status' ('ok' or 'failed'), 'error' (None or the traceback of the failure),
+    'seconds' (time taken by the piece), 'messages' (what the translation printed) and 'output_sha1' (SHA-1 of the output file, or None).
+    If the piece has the key 'input_data', the piece is parsed from that content (bytes) instead of being read (see pipeline.Prefetcher).
+    If the piece doesn't have its content hash (the key 'key', see shards.piece_key), it is computed from the content read for the translation, and added to the result.
+    If the piece has the key 'return_output', its output is not written: the result has its content (bytes) in 'output_data', to be written by the caller
+    (e.g., added to an archive, see archives.ArchiveWriter, or written by a writer thread, see pipeline.OutputWriters).
+    If the piece has the key 'cache' (the directory of a translation cache, with its maximum size in bytes in 'cache_size'), the output is taken from the cache
+    when the piece was already translated, and stored in it otherwise (see the translation_cache module); the result has the key 'cached'.
+    If the piece has the key 'incremental', only the measures that changed since the previous translation of the piece (in its output) are translated again (see the incremental module);
+    its output is not taken from the cache (so that the state of the incremental translation is written with it), but its complete translations are stored in the cache.
+
+    Arguments:
+    piece -- dictionary with the keys: 'piece', 'style', 'mensuration' and 'output' (see read_manifest)
+    """
+    result = dict(piece)
+    result.pop('input_data', None)
+    start = time.time()
+    messages = io.StringIO()
+    cached = None
+    input_data = piece.get('input_data')
+    try:
+        if 'input_error' in piece:
+            raise IOError("The piece couldn't be read:\n" + piece['input_error'])
+        if 'key' not in piece:
+            # The content of the piece is read once, for both its content hash (for the journal) and its translation
+            if input_data is None:
+                input_data = archives.read_bytes(piece['piece'])
+            result['key'] = shards.piece_key(piece, input_data)
+        problem = check_mensuration(piece['style'], piece['mensuration'])
+        if problem is not None:
+            raise ValueError(problem)
+        # With a translation cache, the output comes from the cache if the same content was already translated with the same style, mensuration and rules
+        cache = None
+        mensural_text = None
+        if piece.get('cache'):
+            cache = translation_cache.open_cache(piece['cache'], piece.get('cache_size'))
+            if input_data is None:
+                input_data = archives.read_bytes(piece['piece'])
+            key = translation_cache.cache_key(input_data, piece['style'], piece['mensuration'], cache.version)
+            # An incremental piece is always translated, as its state (the fingerprints of its measures) has to be written with its output
+            if not piece.get('incremental'):
+                cached = cache.get(key)
+        if cached is not None:
+            mensural_text, cached_messages = cached
+            messages.write(cached_messages)
+        else:
+            with capture_output(messages):
+                if input_data is not None:
+                    input_doc = documentFromText(archives.decode_mei(input_data)).getMeiDocument()
+                else:
+                    input_doc = archives.read_document(piece['piece'])
+                number_voices = len(input_doc.getElementsByName('staffDef'))
+                if len(piece['mensuration']) != number_voices:
+                    raise ValueError("The number of voices entered (" + str(len(piece['mensuration'])) + ") is different from the number of voices on the CMN-MEI file of the piece (" + str(number_voices) + ").")
+                if piece.get('incremental'):
+                    mensural_meidoc = incremental.translate(input_doc, piece['style'], piece['mensuration'], piece['output'])
+                else:
+                    mensural_meidoc = MensuralTranslation(input_doc, piece['style'], piece['mensuration'])
+                if cache is not None or piece.get('return_output') or piece.get('incremental'):
+                    mensural_text = documentToText(mensural_meidoc)
+                else:
+                    archives.write_document(mensural_meidoc, piece['output'])
+            # The messages of a translation that reused measures of the previous output are not those of the whole piece, so it isn't cached
+            if cache is not None and not (piece.get('incremental') and mensural_meidoc.reused_measures):
+                cache.put(key, mensural_text, messages.getvalue())
+        if mensural_text is not None:
+            output_data = mensural_text.encode('utf-8')
+            if piece.get('return_output'):
+                result['output_data'] = output_data
+            else:
+                archives.write_bytes(output_data, piece['output'])
+            if piece.get('incremental'):
+                # (if the output is written by a writer thread and the write fails, the state won't match the output, and the next translation will be complete)
+                incremental.write_state(mensural_meidoc, piece['output'], output_data)
+        if piece.get('return_output'):
+            result['output_sha1'] = hashlib.sha1(result['output_data']).hexdigest()
+        else:
+            result['output_sha1'] = shards.file_hash(piece['output'])
+        result['status'] = 'ok'
+        result['error'] = None
+    except Exception:
+        result['output_sha1'] = None
+        result['status'] = 'failed'
+        result['error'] = traceback.format_exc()
+        if 'key' not in result:
+            # (the piece couldn't be read: its path is used instead of its content)
+            result['key'] = shards.piece_key(piece, input_data)
+    result['cached'] = cached is not None
+    result['seconds'] = time.time() - start
+    result['messages'] = messages.getvalue()
+    return result
+
+
+def failed_result(piece, error):
+    """Return the result of a piece whose translation didn't finish (e.g., it timed out, or its worker process crashed),
+    with the content hash of the piece (see shards.piece_key), as the worker didn't return it.
+
+    Arguments:
+    piece -- dictionary with the keys: 'piece', 'style', 'mensuration' and 'output' (see read_manifest)
+    error -- string that describes the failure
+    """
+    result = dict(piece)
+    result.pop('input_data', None)
+    if 'key' not in result:
+        result['key'] = shards.piece_key(piece, piece.get('input_data'))
+    result['status'] = 'failed'
+    result['error'] = error
+    result['seconds'] = None
+    result['messages'] = ''
+    result['output_sha1'] = None
+    return result
+
+
+def resumed_result(piece, entry):
+    """Return the result of a piece that was already translated in a previous run (see journal.is_complete).
+
+    Arguments:
+    piece -- dictionary with the keys: 'piece', 'style', 'mensuration' and 'output' (see read_manifest)
+    entry -- journal entry of the piece
+    """
+    result = dict(piece)
+    result['status'] = 'ok'
+    result['error'] = None
+    result['seconds'] = entry['seconds']
+    result['messages'] = ''
+    result['output_sha1'] = entry['output_sha1']
+    result['resumed'] = True
+    return result
+
+
+def run_batch(pieces, jobs=1, report=None, timeout=None, memory_limit=None, recycle=None, items=None):
+    """Translate all the pieces in a pool of 'jobs' worker processes and return the list of their results (in the order of the pieces).
+
+    Each piece is translated under a timeout and a memory ceiling (see the worker_pool module), so a piece that hangs, crashes its worker or uses too much memory
+    only makes that piece fail, and the rest of the pieces are translated normally.
+
+    Arguments:
+    pieces -- list of pieces (see read_manifest)
+    jobs -- number of worker processes (default 1)
+    report -- function called with the result of each piece as soon as it is available (default None)
+    timeout -- maximum number of seconds for each piece (default None: no timeout)
+    memory_limit -- maximum size, in bytes, of each worker process (default None: no limit)
+    recycle -- number of pieces after which a worker process is replaced by a new one (default None: never)
+    items -- iterable that gives the pieces sent to the workers, in the same order as 'pieces' (default None: the pieces themselves), e.g., a pipeline.Prefetcher
+    """
+    results = [None] * len(pieces)
+    pool = WorkerPool(translate_piece, jobs, timeout, memory_limit, recycle)
+    if items is None:
+        items = pieces
+    for index, succeeded, value in pool.run(items):
+        if succeeded:
+            result = value
+        else:
+            result = failed_result(pieces[index], value)
+        results[index] = result
+        if report is not None:
+            report(result)
+    return results
+
+
+def print_result(result):
+    """Print one line with the status, the time and the piece of a result (and the last line of the error of a failed piece)."""
+    if result.get('resumed'):
+        print("%-6s %9s  %s" % (result['status'].upper(), "resumed", result['piece']))
+    elif result.get('cached'):
+        print("%-6s %8.2fs  %s (cached)" % (result['status'].upper(), result['seconds'], result['piece']))
+    elif result['seconds'] is None:
+        print("%-6s %9s  %s" % (result['status'].upper(), "-", result['piece']))
+    else:
+        print("%-6s %8.2fs  %s" % (result['status'].upper(), result['seconds'], result['piece']))
+    if result['error'] is not None:
+        print("       " + result['error'].strip().splitlines()[-1])
+
+
+def main(argv):
+    """Command line interface of the batch mode, return the exit status (0 when all the pieces were translated).
+
+    Arguments:
+    argv -- list of the command line arguments (after 'batch')
+    """
+    parser = argparse.ArgumentParser(prog='MEI_Translator.py batch', description="Translate all the pieces listed in a manifest (CSV or JSON) in a pool of worker processes.")
+    parser.add_argument('manifest', help="CSV or JSON file with the path, style and mensuration of each piece (see the batch module).")
+    parser.add_argument('--jobs', type=int, default=1, help="Number of worker processes (default 1).")
+    parser.add_argument('--summary', help="Write the summary (the result of each piece, with its time and messages) to this JSON file.")
+    parser.add_argument('--timeout', type=float, default=None, help="Maximum number of seconds for each piece (default: no timeout).")
+    parser.add_argument('--memory', type=int, default=None, help="Maximum memory, in megabytes, of each worker process (default: no limit).")
+    parser.add_argument('--recycle', type=int, default=100, help="Number of pieces after which a worker process is replaced by a new one (default 100).")
+    parser.add_argument('--quarantine', help="Write the pieces that failed (with their errors) to this JSON file, which can be used as a manifest to translate them again.")
+    parser.add_argument('--shard', help="Translate only the shard i/N of the manifest (e.g., 2/5), chosen by the content hash of each piece (see the shards module). "
+                                        "The summary is written to <manifest>.shard-i-of-N.json unless --summary is given.")
+    parser.add_argument('--journal', help="Checkpoint journal of the pieces that finished (default: <manifest>.journal, or <manifest>.shard-i-of-N.journal for a shard).")
+    parser.add_argument('--resume', action='store_true', help="Skip the pieces that the journal records as translated, if their input hasn't changed and their output is intact.")
+    parser.add_argument('--archive', help="Write all the outputs to this zip or tar archive (.zip, .tar, .tar.gz, .tgz, .tar.bz2 or .tar.xz) instead of separate files. "
+                                          "The name of each output inside the archive is its path relative to the directory of the manifest.")
+    parser.add_argument('--prefetch', type=int, default=0, help="Read up to this number of pieces ahead, and write the outputs in background threads, "
+                                                                "overlapping the I/O with the translation (default 0: each worker reads and writes its own pieces).")
+    parser.add_argument('--writers', type=int, default=1, help="Number of background writer threads, with --prefetch (default 1).")
+    parser.add_argument('--incremental', action='store_true', help="Translate again only the measures that changed since the previous translation of each piece, "
+                                                                   "reusing the rest of its output (see the incremental module).")
+    parser.add_argument('--cache', help="Directory of a persistent translation cache: the pieces already translated (same content, style, mensuration and rules) are taken from it, "
+                                        "and the new translations are added to it (see the translation_cache module).")
+    parser.add_argument('--cache-size', type=int, default=1024, help="Maximum size, in megabytes, of the translation cache (default 1024).")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs should be at least 1.")
+    if args.recycle < 1:
+        parser.error("--recycle should be at least 1.")
+    if args.prefetch < 0:
+        parser.error("--prefetch can't be negative.")
+    if args.writers < 1:
+        parser.error("--writers should be at least 1.")
+    if args.cache_size < 1:
+        parser.error("--cache-size should be at least 1.")
+    if args.incremental and args.archive:
+        parser.error("--incremental can't be used with --archive, as the previous outputs are not kept in the archive.")
+    if args.resume and args.archive:
+        parser.error("--resume can't be used with --archive, as the archive is written again by each run.")
+    memory_limit = None
+    if args.memory is not None:
+        memory_limit = args.memory * 1024 * 1024
+    shard = None
+    if args.shard is not None:
+        try:
+            shard = shards.parse_shard(args.shard)
+        except ValueError as error:
+            parser.error(str(error))
+        if not args.summary:
+            args.summary = args.manifest + ".shard-%d-of-%d.json" % shard
+    if not args.journal:
+        if shard is not None:
+            args.journal = args.manifest + ".shard-%d-of-%d.journal" % shard
+        else:
+            args.journal = args.manifest + ".journal"
+
+    pieces = read_manifest(args.manifest)
+    manifest_entries = len(pieces)
+    if shard is not None:
+        pieces = shards.select_shard(pieces, *shard)
+        print("Shard %d/%d: %d of the %d pieces of the manifest\n" % (shard[0], shard[1], len(pieces), manifest_entries))
+    elif args.resume:
+        # The journal entries of the pieces are found by their content hash; otherwise, each piece gets it from the content read for its translation
+        for piece in pieces:
+            piece['key'] = shards.piece_key(piece)
+
+    # Results of the pieces already translated (when resuming), and pieces still to translate
+    results_by_index = {}
+    remaining = pieces
+    if args.resume:
+        entries = journal.read_journal(args.journal)
+        remaining = []
+        for piece in pieces:
+            entry = entries.get(piece['key'])
+            if journal.is_complete(piece, entry):
+                results_by_index[piece['index']] = resumed_result(piece, entry)
+            else:
+                remaining.append(piece)
+        print("Resuming: " + str(len(results_by_index)) + " pieces already translated, " + str(len(remaining)) + " to translate\n")
+
+    # The outputs of the pieces go to the archive, with their paths relative to the directory of the manifest
+    archive_writer = None
+    if args.archive:
+        try:
+            archive_writer = archives.ArchiveWriter(args.archive)
+        except ValueError as error:
+            parser.error(str(error))
+        base = os.path.dirname(os.path.abspath(args.manifest))
+        for piece in remaining:
+            piece['member'] = os.path.relpath(piece['output'], base).replace(os.sep, '/')
+            if piece['member'].lower().endswith('.gz'):
+                # The archive does the compression
+                piece['member'] = piece['member'][:-3]
+            piece['output'] = args.archive + "!" + piece['member']
+            piece['return_output'] = True
+    if args.incremental:
+        for piece in remaining:
+            piece['incremental'] = True
+    if args.cache:
+        for piece in remaining:
+            piece['cache'] = args.cache
+            piece['cache_size'] = args.cache_size * 1024 * 1024
+    checkpoint = journal.Journal(args.journal)
+
+    def write_output(result, output_data):
+        if archive_writer is not None:
+            archive_writer.add(result['member'], output_data)
+        else:
+            archives.write_bytes(output_data, result['output'])
+            result['output_sha1'] = shards.file_hash(result['output'])
+
+    # Pipeline: the pieces are read ahead by a reader thread, and their outputs written by writer threads
+    prefetcher = None
+    writers = None
+    if args.prefetch:
+        for piece in remaining:
+            piece['return_output'] = True
+        prefetcher = pipeline.Prefetcher(remaining, args.prefetch)
+
+        def written(result, error):
+            if error is not None:
+                result['status'] = 'failed'
+                result['error'] = error
+                result['output_sha1'] = None
+            print_result(result)
+            checkpoint.append(result)
+        writers = pipeline.OutputWriters(write_output, written, args.writers)
+
+    def report(result):
+        output_data = result.pop('output_data', None)
+        if writers is not None and output_data is not None:
+            # The result is reported when its output has been written
+            writers.put(result, output_data)
+            return
+        if output_data is not None:
+            write_output(result, output_data)
+        print_result(result)
+        checkpoint.append(result)
+
+    start = time.time()
+    try:
+        for result in run_batch(remaining, args.jobs, report, args.timeout, memory_limit, args.recycle, prefetcher):
+            results_by_index[result['index']] = result
+        if writers is not None:
+            writers.close()
+    except BaseException as error:
+        if prefetcher is not None:
+            prefetcher.stop()
+        # An unfinished archive is discarded
+        if archive_writer is not None:
+            archive_writer.close(keep=False)
+        if isinstance(error, ValueError):
+            parser.error(str(error))
+        raise
+    finally:
+        checkpoint.close()
+    if archive_writer is not None:
+        archive_writer.close()
+    total_seconds = time.time() - start
+    results = [results_by_index[piece['index']] for piece in pieces]
+
+    succeeded = len([result for result in results if result['status'] == 'ok'])
+    failed = len(results) - succeeded
+    print("\n" + str(len(results)) + " pieces: " + str(succeeded) + " translated, " + str(failed) + " failed, in %.2fs (%d jobs)" % (total_seconds, args.jobs))
+    cache_stats = None
+    if args.cache:
+        # The workers only count their own entries, so the size of the cache is checked again when all of them are done
+        cache = translation_cache.TranslationCache(args.cache, args.cache_size * 1024 * 1024)
+        cache_stats = {'hits': len([result for result in results if result.get('cached')]), 'evicted': cache.evict()}
+        cache_stats['misses'] = len([result for result in results if not result.get('cached') and not result.get('resumed')])
+        print("Cache: %d translations from the cache, %d translated (%d old entries evicted)" % (cache_stats['hits'], cache_stats['misses'], cache_stats['evicted']))
+    pipeline_stats = None
+    if prefetcher is not None:
+        pipeline_stats = {'read_blocked': prefetcher.read_blocked, 'input_wait': prefetcher.input_wait, 'handoff_blocked': writers.handoff_blocked,
+                          'output_wait': writers.output_wait, 'write_seconds': writers.write_seconds}
+        print("Pipeline (seconds blocked): reader %.2f (prefetch queue full), workers %.2f (waiting for input), "
+              "results %.2f (write queue full), writers %.2f (waiting for outputs, %.2f writing)" % (prefetcher.read_blocked, prefetcher.input_wait,
+                                                                                                  writers.handoff_blocked, writers.output_wait, writers.write_seconds))
+
+    if args.summary:
+        # The hash and the number of entries of the manifest let the merge step check that the summaries of the shards belong to the same corpus
+        summary = {'manifest': os.path.abspath(args.manifest), 'manifest_sha1': shards.file_hash(args.manifest), 'manifest_entries': manifest_entries,
+                   'shard': list(shard) if shard is not None else None, 'jobs': args.jobs, 'seconds': total_seconds,
+                   'succeeded': succeeded, 'failed': failed, 'pipeline': pipeline_stats, 'cache': cache_stats, 'pieces': results}
+        with open(args.summary, 'w') as summary_file:
+            json.dump(summary, summary_file, indent=2)
+
+    if args.quarantine:
+        quarantine = [result for result in results if result['status'] != 'ok']
+        with open(args.quarantine, 'w') as quarantine_file:
+            json.dump(quarantine, quarantine_file, indent=2)
+
+    if failed:
+        return 1
+    return 0
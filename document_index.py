@@ -0,0 +1,99 @@
+"""
+document_index module
+
+Index the elements of a pymei.MeiDocument in a single traversal, so the translation stages can query the document without walking the whole tree again.
+
+Classes:
+DocumentIndex -- One-pass index of a document: name -> elements, id -> element, and measure -> staff -> layer
+"""
+
+
+class DocumentIndex(object):
+    """One-pass index of the elements of a pymei.MeiDocument.
+
+    The whole tree is traversed once (in document order) when the index is created.
+    Afterwards, the elements can be looked up by name or by id, and the <staff> and <layer> elements can be accessed measure by measure, without any further traversal.
+    The index is a snapshot: elements added to (or removed from) the document after its creation are not reflected in it.
+
+    Methods:
+    getElementsByName -- list of all the elements with a given name, in document order
+    getElementById -- the element with a given @xml:id (or None)
+    getMeasures -- list of all the <measure> elements, in document order
+    getStaves -- list of the <staff> elements of a <measure>
+    getLayers -- list of the <layer> elements of a <staff>
+    """
+
+    def __init__(self, doc):
+        """Traverse the document once and index all its elements.
+
+        Arguments:
+        doc -- the pymei.MeiDocument object to be indexed
+        """
+        self.elements_by_name = {}
+        self.elements_by_id = {}
+        self.measures = []
+        # For each measure (same order as self.measures), the list of its <staff> elements
+        self.staves_by_measure = []
+        # For each staff (key: its @xml:id), the list of its <layer> elements
+        self.layers_by_staff = {}
+
+        root = doc.getRootElement()
+        if root is None:
+            return
+        # Depth-first (pre-order) traversal with an explicit stack, so the elements are indexed in document order
+        stack = [root]
+        while stack:
+            element = stack.pop()
+            name = element.name
+            children = element.getChildren()
+
+            if name in self.elements_by_name:
+                self.elements_by_name[name].append(element)
+            else:
+                self.elements_by_name[name] = [element]
+            self.elements_by_id[element.id] = element
+
+            # measure -> staff -> layer
+            if name == 'measure':
+                self.measures.append(element)
+                self.staves_by_measure.append([child for child in children if child.name == 'staff'])
+            elif name == 'staff':
+                self.layers_by_staff[element.id] = [child for child in children if child.name == 'layer']
+
+            stack.extend(reversed(children))
+
+    def getElementsByName(self, name):
+        """Return the list of all the elements called 'name' in the document, in document order (an empty list if there are none).
+
+        Arguments:
+        name -- string with the name of the element (e.g., 'note', 'staff', 'tie')
+        """
+        return self.elements_by_name.get(name, [])
+
+    def getElementById(self, element_id):
+        """Return the element whose @xml:id is 'element_id', or None if there is no such element in the document.
+
+        Arguments:
+        element_id -- string with the @xml:id of the element (without the '#' character)
+        """
+        return self.elements_by_id.get(element_id)
+
+    def getMeasures(self):
+        """Return the list of all the <measure> elements of the document, in document order."""
+        return self.measures
+
+    def getStaves(self, measure_number):
+        """Return the list of <staff> elements of a measure.
+
+        Arguments:
+        measure_number -- position (starting from 0) of the <measure> in the document
+        """
+        return self.staves_by_measure[measure_number]
+
+    def getLayers(self, staff):
+        """Return the list of <layer> elements of a <staff> element.
+
+        Arguments:
+        staff -- a <staff> element of the indexed document
+        """
+        return self.layers_by_staff.get(staff.id, [])
@@ -0,0 +1,144 @@
+"""
+element_records module
+
+Contains the records in which the attributes of the <note>, <rest> and <tuplet> elements of a voice are read (only once) from the pymei document,
+so that the classification of the notes and rests (noterest_to_mensural and sb_major_minor) runs on plain Python objects.
+The attributes that were changed are written back to the MeiElements at the end, in a single pass.
+
+Classes:
+ElementRecord -- Snapshot of the attributes of one element, which keeps track of the attributes that were changed
+VoiceRecords -- The ElementRecords of all the <note>, <rest> (and <tuplet>) elements of one voice
+"""
+
+
+class ElementRecord(object):
+    """Snapshot of the attributes of one MeiElement.
+
+    The attributes are read from the element once (when the record is created).
+    Afterwards they are read and modified in the record, which keeps track of the changes until they are written back to the element (see write_back).
+
+    Attributes:
+    element -- the MeiElement (None in a detached record, see detach)
+    label -- string that represents the element in the messages of a detached record (None otherwise)
+    name, id -- the name and the @xml:id of the element
+    attributes -- dictionary with the current values of the attributes of the element (attribute name -> value)
+    changed -- dictionary with the attributes added or modified since the snapshot, in the order in which they were first changed (attribute name -> True)
+    removed -- set with the names of the attributes removed since the snapshot
+    """
+    __slots__ = ('element', 'label', 'name', 'id', 'attributes', 'changed', 'removed')
+
+    def __init__(self, element):
+        self.element = element
+        self.label = None
+        self.name = element.name
+        self.id = element.id
+        self.attributes = {}
+        for attribute in element.getAttributes():
+            self.attributes[attribute.name] = attribute.value
+        self.changed = {}
+        self.removed = set()
+
+    def __str__(self):
+        if self.element is None:
+            return self.label
+        return str(self.element)
+
+    def detach(self):
+        """Return a copy of the record without the MeiElement, which can be pickled (e.g., to be sent to another process)."""
+        record = ElementRecord.__new__(ElementRecord)
+        record.element = None
+        record.label = str(self)
+        record.name = self.name
+        record.id = self.id
+        record.attributes = dict(self.attributes)
+        record.changed = dict(self.changed)
+        record.removed = set(self.removed)
+        return record
+
+    def update(self, record):
+        """Take the attributes (and the changes that haven't been written back yet) of another record of the same element (e.g., a detached record)."""
+        self.attributes = record.attributes
+        self.changed = record.changed
+        self.removed = record.removed
+
+    def has(self, name):
+        """Return True if the element has the attribute 'name', otherwise return False."""
+        return name in self.attributes
+
+    def get(self, name):
+        """Return the value of the attribute 'name', or None if the element doesn't have that attribute."""
+        return self.attributes.get(name)
+
+    def set(self, name, value):
+        """Add the attribute 'name' with the given value (or change its value, if the element already has the attribute)."""
+        self.attributes[name] = value
+        self.changed[name] = True
+        self.removed.discard(name)
+
+    def remove(self, name):
+        """Remove the attribute 'name' (if the element has it)."""
+        if name in self.attributes:
+            del self.attributes[name]
+            self.changed.pop(name, None)
+            self.removed.add(name)
+
+    def write_back(self):
+        """Write the changes of the attributes to the MeiElement, and start keeping track of the changes again."""
+        for name in self.removed:
+            self.element.removeAttribute(name)
+        for name in self.changed:
+            self.element.addAttribute(name, self.attributes[name])
+        self.changed = {}
+        self.removed = set()
+
+
+class VoiceRecords(object):
+    """The ElementRecords of the musical elements of one voice (see layer_builder.VoiceContent).
+
+    Each element has a single record, so the changes made on a note while translating its value (noterest_to_mensural) are seen when the note is listed among the elements of the voice (sb_major_minor).
+
+    Attributes:
+    notes -- list of the ElementRecords of the <note> elements of the voice, in order
+    rests -- list of the ElementRecords of the <rest> elements of the voice, in order
+    elements -- list of the ElementRecords of the musical elements of the voice (<note>, <rest> and <tuplet>), in order
+    """
+    __slots__ = ('notes', 'rests', 'elements', 'records_by_id')
+
+    def __init__(self, voice):
+        """
+        Arguments:
+        voice -- the VoiceContent of the voice (see layer_builder.VoiceContent)
+        """
+        self.records_by_id = {}
+        self.notes = [self.record(note) for note in voice.notes]
+        self.rests = [self.record(rest) for rest in voice.rests]
+        self.elements = [self.record(element) for element in voice.elements]
+
+    def record(self, element):
+        """Return the ElementRecord of the element, creating it the first time the element is seen."""
+        record = self.records_by_id.get(element.id)
+        if record is None:
+            record = ElementRecord(element)
+            self.records_by_id[element.id] = record
+        return record
+
+    def detach(self):
+        """Return a copy of the records of the voice without their MeiElements, which can be pickled (see ElementRecord.detach)."""
+        detached = VoiceRecords.__new__(VoiceRecords)
+        detached.records_by_id = {}
+        for element_id, record in self.records_by_id.items():
+            detached.records_by_id[element_id] = record.detach()
+        detached.notes = [detached.records_by_id[record.id] for record in self.notes]
+        detached.rests = [detached.records_by_id[record.id] for record in self.rests]
+        detached.elements = [detached.records_by_id[record.id] for record in self.elements]
+        return detached
+
+    def update(self, detached):
+        """Take the attributes of the records of a detached copy of the voice (see detach), after it has been classified."""
+        for element_id, record in self.records_by_id.items():
+            record.update(detached.records_by_id[element_id])
+
+    def write_back(self):
+        """Write the changes of all the records to their MeiElements, in a single pass."""
+        for record in self.records_by_id.values():
+            record.write_back()
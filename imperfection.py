@@ -0,0 +1,92 @@
+"""
+imperfection module
+
+Contains the table of 'partial imperfections' shared by the arsnova and white_notation modules.
+
+A note experiments a partial imperfection when only a part of its value is imperfected (immediate imperfection, by a note of the next smaller value;
+remote imperfection, by a note two levels smaller), so that its performed duration is a particular fraction of its default value.
+The table is keyed by the mensuration and by the reduced ratio between the performed and the default duration of the note, so it can be checked with integers only.
+
+Functions:
+partial_imperfection_quality -- Return the @quality, @num and @numbase of a note that experimented a partial imperfection (or None)
+partial_imperfection_ratios -- Return the ratios (and qualities) of all the partial imperfections possible in a mensuration
+"""
+from math import gcd
+from types import MappingProxyType
+
+# Rules of partial imperfection, in order of precedence: (modusminor, tempus, prolatio, numerator, denominator, quality).
+# A prolatio of None in a rule means that the rule applies for any prolatio (including the absence of prolatio).
+# The mensuration arguments have different meanings depending on the note:
+# for a 'longa' they are modusminor, tempus and prolatio; for a 'maxima' they stand for modusmaior, modusminor and tempus;
+# and for a 'brevis' they stand for tempus, prolatio and None.
+_RULES = (
+    # Immediate imperfection: tempus should be 3
+    (2, 3, None, 5, 6, 'immediate_imp'),
+    (2, 3, None, 4, 6, 'immediate_imp'),
+    (3, 3, None, 5, 9, 'imperfection + immediate_imp'),    # Should I also include the case: ratio = 4/9?
+    (3, 3, None, 8, 9, 'immediate_imp'),
+    (3, 3, None, 7, 9, 'immediate_imp'),
+    # Remote imperfection: there should be a prolatio value, and it should be 3
+    (2, 2, 3, 11, 12, 'remote_imp'),
+    (3, 2, 3, 11, 18, 'imperfection + remote_imp'),
+    (3, 2, 3, 17, 18, 'remote_imp'),
+    (2, 3, 3, 17, 18, 'remote_imp'),
+    (3, 3, 3, 17, 27, 'imperfection + remote_imp'),
+    (3, 3, 3, 26, 27, 'remote_imp'),
+)
+
+
+def _build_table(rules):
+    """Return the table of partial imperfections: a dictionary that maps (modusminor, tempus, prolatio, numerator, denominator) to the @quality of the note.
+
+    The ratios are reduced, and the rules that apply for any prolatio are expanded for prolatio 2, 3 and None.
+    When two rules give the same key, the first one takes precedence.
+    """
+    table = {}
+    for modusminor, tempus, prolatio, numerator, denominator, quality in rules:
+        divisor = gcd(numerator, denominator)
+        numerator, denominator = numerator // divisor, denominator // divisor
+        for prolatio_value in ([2, 3, None] if prolatio is None else [prolatio]):
+            key = (modusminor, tempus, prolatio_value, numerator, denominator)
+            if key not in table:
+                table[key] = quality
+    return table
+
+
+# Read-only, so that it can be shared by concurrent translations
+PARTIAL_IMPERFECTIONS = MappingProxyType(_build_table(_RULES))
+
+
+def partial_imperfection_quality(durges_num, default_val, modusminor, tempus, prolatio=None):
+    """Identify when a note experimented a partial imperfection.
+
+    Return a tuple with the values of the @quality, @num and @numbase attributes of the note in that case, otherwise return None.
+
+    Arguments:
+    durges_num -- integer with the actual performed duration of the <note>
+    default_val -- integer with the default performed duration of the <note>
+    modusminor, tempus, prolatio -- Integer values (3 or 2) that give the mensuration of the voice. The last argument is optional (default None).
+    When the note is a 'longa' these exact arguments are used: modusminor, tempus and prolatio.
+    When the note is a 'maxima', these arguments stand for: modusmaior, modusminor and tempus, respectively.
+    When the note is a breve, these arguments stand for: tempus, prolatio and None (the last argument is left blank).
+    """
+    divisor = gcd(durges_num, default_val)
+    numerator, denominator = durges_num // divisor, default_val // divisor
+    quality = PARTIAL_IMPERFECTIONS.get((modusminor, tempus, prolatio, numerator, denominator))
+    if quality is None:
+        return None
+    return quality, str(denominator), str(numerator)
+
+
+def partial_imperfection_ratios(modusminor, tempus, prolatio=None):
+    """Return a list of tuples (numerator, denominator, quality) with the (reduced) ratios of all the partial imperfections possible in the given mensuration.
+
+    Arguments:
+    modusminor, tempus, prolatio -- Integer values (3 or 2) that give the mensuration of the voice (see partial_imperfection_quality)
+    """
+    ratios = []
+    for (rule_modusminor, rule_tempus, rule_prolatio, numerator, denominator), quality in PARTIAL_IMPERFECTIONS.items():
+        if (rule_modusminor, rule_tempus, rule_prolatio) == (modusminor, tempus, prolatio):
+            ratios.append((numerator, denominator, quality))
+    ratios.sort()
+    return ratios
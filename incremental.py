@@ -0,0 +1,447 @@
+"""
+incremental module
+
+Incremental translation of the pieces that are edited and translated again many times (e.g., exported again from Sibelius after fixing a few measures):
+
+    python MEI_Translator.py batch manifest.csv --incremental
+    python MEI_Translator.py watch TranscriptionsDir --incremental
+
+Next to the output of a piece, its translation state ('<output>.measures.json') keeps a fingerprint of each measure of each voice:
+the SHA-1 of the content of the measure in the CMN-MEI file (its elements, with their ids and attributes, and the ties that go through it),
+the mensuration of the voice and the parameters of the whole piece (the style, the division of the breve in Ars Antiqua, the presence of triplets of minims).
+When the piece is translated again, only the measures whose fingerprint changed are translated again (together with the measures joined to them by ties),
+and the notes and rests of the other measures are taken from the previous output; the header and the <scoreDef> always come from the new CMN-MEI file.
+The classification of the notes and rests doesn't depend on the other measures, except for the grouping of the semibreves into minor-major pairs in Ars Antiqua,
+which is done for each sequence of semibreves between two breves (longas, maximas or tuplets): the measures translated again are extended to the previous
+and next measures with a breve, and the pairs of semibreves are only computed again for the sequences of semibreves that go through them.
+
+The previous output is only used if it is intact (same SHA-1 as when it was written) and the state was written by the same version of the translator
+(see translation_cache.rule_version) for the same style and number of voices; otherwise the whole piece is translated.
+The ids of the elements are part of the fingerprints (they are kept in the output), so an export that renumbers all the elements translates the whole piece.
+
+Functions:
+measure_fingerprints -- Return the fingerprint of each measure of each voice, the measures joined by ties, and the presence of triplets of minims in the piece
+affected_measures -- Return the measures of a voice that have to be translated again
+state_path -- Return the path of the translation state of an output
+read_state -- Return the translation state of an output and the previous output document, if they can be used
+write_state -- Write the translation state of an output
+translate -- Translate a piece, reusing the measures of its previous translation
+
+Classes:
+IncrementalTranslation -- MensuralTranslation that translates again only the measures that changed since the previous translation
+"""
+import hashlib
+import json
+
+from pymei import documentFromText
+
+import archives
+import arsantiqua
+import arsnova
+import translation_cache
+import white_notation
+from element_records import VoiceRecords
+from layer_builder import VoiceContent
+from MEI_Translator import MensuralTranslation, classification_arguments, resolve_tie_chains
+from voice_classification import classify_voice
+
+# Mensural durations of the elements that delimit the sequences of semibreves in Ars Antiqua (besides the tuplets), see arsantiqua.sb_major_minor
+_SEQUENCE_DELIMITERS = ('brevis', 'longa', 'maxima')
+
+
+def _describe(element):
+    """Return a string with the name, id and attributes of the element and (recursively) of its children."""
+    attributes = sorted(attribute.name + '=' + attribute.value for attribute in element.getAttributes())
+    children = [_describe(child) for child in element.getChildren()]
+    return element.name + '#' + element.id + '[' + ' '.join(attributes) + '](' + ', '.join(children) + ')'
+
+
+def measure_fingerprints(doc_index, all_voices, ars_type, mensuration_list):
+    """Return a tuple with the list of fingerprints (SHA-1 hexadecimal strings) of the measures of each voice, the list of the sets of measures of each voice
+    joined by a chain of tied notes, and the presence of triplets of minims in the piece.
+
+    The fingerprint of a measure covers the content of the <layer> of the voice in the measure, the chains of tied notes that go through the measure,
+    the mensuration of the voice and the parameters of the whole piece. It has to be computed before the section is filled (which takes the elements of the layers).
+
+    Arguments:
+    doc_index -- the DocumentIndex of the CMN-MEI document (after merge_ties)
+    all_voices -- list with the <staff> elements of each voice (see MEI_Translator.separate_staves_per_voice)
+    ars_type, mensuration_list -- see MEI_Translator.MensuralTranslation
+    """
+    descriptions = []
+    # (voice, measure) of each element of the layers
+    measure_of_element = {}
+    tuplet_minims = False
+    for voice_number, ind_voice in enumerate(all_voices):
+        voice_descriptions = []
+        for measure_number, voice_staff in enumerate(ind_voice):
+            layer = doc_index.getLayers(voice_staff)[0]
+            voice_descriptions.append([_describe(child) for child in layer.getChildren()])
+            for child in layer.getChildren():
+                # The tuplets of the layers are the triplets of minims (see arsnova.ArsNovaLayerBuilder)
+                if child.name == 'tuplet':
+                    tuplet_minims = True
+            for element in layer.getDescendants():
+                measure_of_element[element.id] = (voice_number, measure_number)
+        descriptions.append(voice_descriptions)
+
+    # Each chain of tied notes is part of the content of all the measures it goes through
+    tied_measures = [[] for ind_voice in all_voices]
+    for chain in resolve_tie_chains(doc_index)[0]:
+        tie_description = 'tie(' + ' '.join(note.id for note in chain) + ')'
+        positions = set(measure_of_element[note.id] for note in chain if note.id in measure_of_element)
+        for voice_number, measure_number in positions:
+            descriptions[voice_number][measure_number].append(tie_description)
+        for voice_number in set(position[0] for position in positions):
+            tied_measures[voice_number].append(set(position[1] for position in positions if position[0] == voice_number))
+
+    # The parameters of the whole piece
+    if ars_type == 'ars_antiqua':
+        piece_description = ars_type + ' breve=' + mensuration_list[0][0]
+    else:
+        piece_description = ars_type + ' triplet_of_minims=' + str(tuplet_minims)
+
+    fingerprints = []
+    for voice_number, voice_descriptions in enumerate(descriptions):
+        voice_description = piece_description + ' mensuration=' + ' '.join(mensuration_list[voice_number])
+        fingerprints.append([hashlib.sha1((voice_description + '\n' + '\n'.join(measure_description)).encode('utf-8')).hexdigest()
+                             for measure_description in voice_descriptions])
+    return fingerprints, tied_measures, tuplet_minims
+
+
+def affected_measures(fingerprints, previous_fingerprints, tied_measures):
+    """Return the sorted list of the measures of a voice that have to be translated again: the measures whose fingerprint changed, and the measures tied to them.
+
+    Arguments:
+    fingerprints -- list of the fingerprints of the measures of the voice
+    previous_fingerprints -- list of the fingerprints of the measures of the voice in the previous translation
+    tied_measures -- list of the sets of measures of the voice joined by a chain of tied notes
+    """
+    affected = set(measure for measure, fingerprint in enumerate(fingerprints)
+                   if measure >= len(previous_fingerprints) or previous_fingerprints[measure] != fingerprint)
+    # A chain of tied notes that goes through a measure that changed is translated again as a whole
+    changed = True
+    while changed:
+        changed = False
+        for measures in tied_measures:
+            if measures & affected and not measures <= affected:
+                affected |= measures
+                changed = True
+    return sorted(affected)
+
+
+def _runs(measures):
+    """Return the list of (first, last) measures of the runs of consecutive measures in a sorted list of measures."""
+    runs = []
+    for measure in measures:
+        if runs and runs[-1][1] == measure - 1:
+            runs[-1] = (runs[-1][0], measure)
+        else:
+            runs.append((measure, measure))
+    return runs
+
+
+def _has_delimiter(elements):
+    """Return True if the elements (of a measure of a previous output) contain a breve, longa or maxima."""
+    for element in elements:
+        if element.name in ('note', 'rest') and element.hasAttribute('dur') and element.getAttribute('dur').value in _SEQUENCE_DELIMITERS:
+            return True
+    return False
+
+
+def _is_delimiter(record):
+    return record.name == 'tuplet' or (record.has('dur') and record.get('dur') in _SEQUENCE_DELIMITERS)
+
+
+def _first_note(measures, ids_removeSet):
+    """Return the first <note> that the layer builder adds to the layer from the contents of the measures (lists of children of the <layer> of a voice), or None."""
+    for musical_content in measures:
+        for element in musical_content:
+            if element.id in ids_removeSet:
+                continue
+            if element.name in ('tuplet', 'beam'):
+                for child in element.getChildren():
+                    if child.name == 'note':
+                        return child
+            elif element.name == 'note':
+                return element
+    return None
+
+
+def _is_stale_tie(note, ars_type, arguments):
+    """Return True if the note is the first note of a tie whose performed duration has no note shape in the style (the classification then keeps the @dur of the previous note).
+
+    Arguments:
+    note -- <note> element of the CMN-MEI document (after merge_ties)
+    ars_type -- 'ars_antiqua', 'ars_nova' or 'white_mensural'
+    arguments -- the classification arguments of the voice (see MEI_Translator.classification_arguments)
+    """
+    if not note.hasAttribute('dur') or note.getAttribute('dur').value != 'TiedNote!':
+        return False
+    durges_num = int(note.getAttribute('dur.ges').value[:-1])
+    if ars_type == "ars_nova":
+        modusmaior, modusminor, tempus, prolatio, triplet_of_minims_flag = arguments
+        return arsnova.decision_table(triplet_of_minims_flag, modusmaior, modusminor, tempus, prolatio).tied_dur(durges_num) is None
+    if ars_type == "white_mensural":
+        modusmaior, modusminor, tempus, prolatio, triplet_of_minims_flag = arguments
+        return white_notation.duration_table(triplet_of_minims_flag, modusmaior, modusminor, tempus, prolatio).tied_dur(durges_num * white_notation.TICKS) is None
+    # Ars Antiqua: only longas and (duplex long) maximas can be tied
+    modusminor = arguments[0]
+    return durges_num not in (2 * modusminor * 2048, 2 * 2048, 3 * 2048)
+
+
+def _previous_measures(previous_meidoc, number_measures):
+    """Return, for each voice of the previous output, the list of the elements of each of its measures (ending with its <barLine>), or None if the output doesn't have the expected measures."""
+    layers = previous_meidoc.getElementsByName('layer')
+    if len(layers) != len(number_measures):
+        return None
+    previous_measures = []
+    for layer, number in zip(layers, number_measures):
+        measures = [[]]
+        for element in layer.getChildren():
+            measures[-1].append(element)
+            if element.name == 'barLine':
+                measures.append([])
+        if measures[-1] or len(measures) - 1 != number:
+            return None
+        previous_measures.append(measures[:-1])
+    return previous_measures
+
+
+class IncrementalTranslation(MensuralTranslation):
+    """MensuralTranslation that translates again only the measures that changed since a previous translation of the piece (see the module documentation).
+    Without a previous translation, the whole piece is translated, as in MensuralTranslation.
+
+    Attributes:
+    fingerprints -- list of the fingerprints of the measures of each voice (see measure_fingerprints), to be saved in the translation state
+    retranslated -- list of the measures of each voice that were translated (all of them, when the whole piece was translated)
+    reused_measures -- number of measures (of all the voices) taken from the previous output
+    semibreve_diagnostics -- as in MensuralTranslation, when the whole piece was translated; otherwise, only the sequences of semibreves of the runs of measures translated again,
+    with their start and end relative to the elements of their run (from its first measure), as the positions of the elements of the measures taken from the previous output
+    are not known (start_element and end_element identify the sequence in the voice)
+    """
+
+    def __init__(self, cmn_meidoc, ars_type, mensuration_list, previous_meidoc=None, previous_state=None, vectorized_mode=False):
+        """Create the Mensural-MEI document that contains the translation of the CMN-MEI document, reusing the measures of the previous translation that didn't change.
+
+        Arguments:
+        cmn_meidoc, ars_type, mensuration_list, vectorized_mode -- see MensuralTranslation
+        previous_meidoc -- the previous Mensural-MEI document of the piece (default None: translate the whole piece); its elements are moved to the new document
+        previous_state -- the translation state of the previous document (see read_state)
+        """
+        self.previous_meidoc = previous_meidoc
+        self.previous_state = previous_state
+        self.ars_type = ars_type
+        self.fingerprints = None
+        self.retranslated = None
+        self.reused_measures = 0
+        MensuralTranslation.__init__(self, cmn_meidoc, ars_type, mensuration_list, vectorized_mode)
+
+    def _fill_section(self, out_section, stavesDef, all_voices, ids_removeSet, cmn_index, ars_type, mensuration_list, vectorized_mode, processes):
+        self.fingerprints, tied_measures, tuplet_minims = measure_fingerprints(cmn_index, all_voices, ars_type, mensuration_list)
+        previous_measures = None
+        if self.previous_meidoc is not None and len(self.previous_state['voices']) == len(all_voices):
+            previous_measures = _previous_measures(self.previous_meidoc, [len(fingerprints) for fingerprints in self.previous_state['voices']])
+        if previous_measures is None:
+            MensuralTranslation._fill_section(self, out_section, stavesDef, all_voices, ids_removeSet, cmn_index, ars_type, mensuration_list, vectorized_mode, processes)
+            self.retranslated = [list(range(len(ind_voice))) for ind_voice in all_voices]
+            return
+
+        if ars_type == "white_mensural":
+            builder = white_notation.WhiteLayerBuilder(ids_removeSet, cmn_index)
+        elif ars_type == "ars_nova":
+            builder = arsnova.ArsNovaLayerBuilder(ids_removeSet, cmn_index)
+        else:
+            builder = arsantiqua.ArsAntiquaLayerBuilder(ids_removeSet, cmn_index, mensuration_list[0][0])
+
+        all_runs = []
+        all_arguments = []
+        for voice_number, ind_voice in enumerate(all_voices):
+            measures = affected_measures(self.fingerprints[voice_number], self.previous_state['voices'][voice_number], tied_measures[voice_number])
+            arguments = classification_arguments(ars_type, stavesDef[voice_number], tuplet_minims)
+            # The first note of each measure (before the section is filled, which takes the elements of the layers)
+            first_notes = [_first_note([cmn_index.getLayers(voice_staff)[0].getChildren()], ids_removeSet) for voice_staff in ind_voice]
+            all_runs.append(self._extend_runs(measures, first_notes, arguments, previous_measures[voice_number], len(ind_voice)))
+            all_arguments.append(arguments)
+
+        self.semibreve_diagnostics = []
+        self.retranslated = []
+        for voice_number, ind_voice in enumerate(all_voices):
+            runs = all_runs[voice_number]
+            arguments = all_arguments[voice_number]
+            self.retranslated.append([measure for first, last in runs for measure in range(first, last + 1)])
+
+            voice = builder.add_voice(out_section, voice_number)
+            run_index = 0
+            for measure_number, voice_staff in enumerate(ind_voice):
+                if run_index < len(runs) and runs[run_index][0] <= measure_number <= runs[run_index][1]:
+                    if measure_number == runs[run_index][0]:
+                        run_voice = VoiceContent(voice.staff, voice.layer)
+                        # Number of elements of the run before each of its measures
+                        run_starts = []
+                    run_starts.append(len(run_voice.elements))
+                    builder.fill_measure(run_voice, cmn_index.getLayers(voice_staff)[0].getChildren())
+                    if measure_number == runs[run_index][1]:
+                        self._classify_run(run_voice, run_starts, runs[run_index], len(ind_voice), previous_measures[voice_number], arguments, vectorized_mode)
+                        run_index += 1
+                else:
+                    # The measure didn't change: its notes and rests (and its barline) are taken from the previous output
+                    # (which is kept in self.previous_meidoc, as the elements still belong to its tree)
+                    for element in previous_measures[voice_number][measure_number]:
+                        voice.layer.addChild(element)
+
+        number_measures = sum(len(ind_voice) for ind_voice in all_voices)
+        self.reused_measures = number_measures - sum(len(measures) for measures in self.retranslated)
+        print("Incremental translation: " + str(sum(len(measures) for measures in self.retranslated)) + " of the " + str(number_measures) + " measures (of all the voices) translated again.")
+
+    def _extend_runs(self, measures, first_notes, arguments, previous_measures, number_measures):
+        """Return the list of (first, last) measures of the runs of a voice that are translated again: the runs of the measures that changed,
+        extended to the measures whose classification depends on them (until there are no more):
+        a tied note whose duration is out of range takes the mensural @dur of the previous note of the voice (see the noterest_to_mensural functions),
+        so such a note at the beginning of a run extends it to the previous note, and such a note right after a run extends it to this note;
+        and in Ars Antiqua (with minor-major pairs of semibreves), each run is extended to the previous and next measures that contain a breve (or to the ends of the voice),
+        so that the sequences of semibreves that go through the run are complete.
+        A measure that isn't in the previous output (the piece got longer) is taken as a measure without breves.
+
+        Arguments:
+        measures -- sorted list of the measures of the voice that changed (see affected_measures)
+        first_notes -- list of the first <note> of each measure of the voice in the CMN-MEI document (None for a measure without notes)
+        arguments -- the classification arguments of the voice (see MEI_Translator.classification_arguments)
+        previous_measures -- list of the elements of each measure of the voice in the previous output (see _previous_measures)
+        number_measures -- number of measures of the voice
+        """
+        def has_delimiter(measure):
+            return measure < len(previous_measures) and _has_delimiter(previous_measures[measure])
+
+        def is_stale(note):
+            return note is not None and _is_stale_tie(note, self.ars_type, arguments)
+
+        # The measures whose translation can be different from the previous output
+        changed = set(measures)
+        measures = set(measures)
+        while True:
+            runs = _runs(sorted(measures))
+            extended = set(measures)
+            for first, last in runs:
+                run_notes = [note for note in first_notes[first:last + 1] if note is not None]
+                if first > 0 and run_notes and is_stale(run_notes[0]):
+                    previous = first - 1
+                    while previous > 0 and first_notes[previous] is None:
+                        previous -= 1
+                    extended.update(range(previous, first))
+                following = last + 1
+                while following < number_measures and first_notes[following] is None:
+                    following += 1
+                if following < number_measures and is_stale(first_notes[following]):
+                    extended.update(range(last + 1, following + 1))
+                    changed.update(range(last + 1, following + 1))
+
+                if self.ars_type == "ars_antiqua" and arguments[1]:
+                    # A run that already starts (ends) with an unchanged measure with a breve isn't extended any further
+                    if first in changed or not has_delimiter(first):
+                        while first > 0 and not has_delimiter(first - 1):
+                            first -= 1
+                        if first > 0:
+                            first -= 1
+                    if last in changed or not has_delimiter(last):
+                        while last < number_measures - 1 and not has_delimiter(last + 1):
+                            last += 1
+                        if last < number_measures - 1:
+                            last += 1
+                    extended.update(range(first, last + 1))
+            if extended == measures:
+                return runs
+            measures = extended
+
+    def _classify_run(self, run_voice, run_starts, run, number_measures, previous_measures, arguments, vectorized_mode):
+        """Classify the notes and rests of a run of measures that were translated again, and write them back to the document."""
+        records = VoiceRecords(run_voice)
+        if self.ars_type != "ars_antiqua":
+            classify_voice(self.ars_type, records, arguments, vectorized_mode)
+            records.write_back()
+            return
+
+        modusminor, pair_semibreves = arguments
+        arsantiqua.noterest_to_mensural(records.notes, records.rests, modusminor)
+        if pair_semibreves:
+            first, last = run
+            elements = records.elements
+            # The semibreves are paired from the last breve of the first measure (unless the run starts the voice) to the first breve of the last measure (unless it ends the voice)
+            start = 0
+            if first > 0:
+                first_measure_end = run_starts[1] if len(run_starts) > 1 else len(elements)
+                start = max([index for index in range(first_measure_end) if _is_delimiter(elements[index])] or [0])
+            end = len(elements)
+            if last < number_measures - 1:
+                end = min([index for index in range(run_starts[-1], len(elements)) if _is_delimiter(elements[index])] or [len(elements) - 1]) + 1
+            for sequence in arsantiqua.sb_major_minor(elements[start:end]):
+                # Positions in the elements of the run, rather than in the sequences that were paired again
+                self.semibreve_diagnostics.append(sequence._replace(start=sequence.start + start, end=sequence.end + start))
+            # The semibreves outside these sequences belong to sequences that didn't change: they keep their pairs from the previous output
+            previous_elements = {}
+            if start > 0:
+                for element in previous_measures[first]:
+                    previous_elements[element.id] = element
+            if end < len(elements):
+                for element in previous_measures[last]:
+                    previous_elements[element.id] = element
+            for record in elements[:start] + elements[end:]:
+                element = previous_elements.get(record.id)
+                if element is not None and element.hasAttribute('quality') and element.getAttribute('quality').value == 'major':
+                    for name in ('quality', 'num', 'numbase'):
+                        record.set(name, element.getAttribute(name).value)
+        records.write_back()
+
+
+def state_path(output_path):
+    """Return the path of the translation state of an output: '<output>.measures.json'.
+
+    Arguments:
+    output_path -- path of the output (Mensural-MEI) file of the piece
+    """
+    return output_path + '.measures.json'
+
+
+def read_state(output_path, ars_type):
+    """Return a tuple (translation state, previous Mensural-MEI document) of an output, or (None, None) if there is no state,
+    or if it can't be used: the output changed since the state was written, or the state belongs to another version of the translator or to another style.
+
+    Arguments:
+    output_path -- path of the output (Mensural-MEI) file of the piece
+    ars_type -- style of the new translation
+    """
+    try:
+        with open(state_path(output_path), 'r') as state_file:
+            state = json.load(state_file)
+        output_data = archives.read_bytes(output_path)
+    except (IOError, OSError, ValueError):
+        return None, None
+    if (state.get('rule_version') != translation_cache.rule_version() or state.get('style') != ars_type or
+            state.get('output_sha1') != hashlib.sha1(output_data).hexdigest()):
+        return None, None
+    return state, documentFromText(archives.decode_mei(output_data)).getMeiDocument()
+
+
+def write_state(translation, output_path, output_data):
+    """Write the translation state of an output (the fingerprints of the measures of the translation, and the SHA-1 of the output).
+
+    Arguments:
+    translation -- the IncrementalTranslation of the piece
+    output_path -- path of the output (Mensural-MEI) file of the piece
+    output_data -- content (bytes) of the output, as written
+    """
+    state = {'rule_version': translation_cache.rule_version(), 'style': translation.ars_type,
+             'output_sha1': hashlib.sha1(output_data).hexdigest(), 'voices': translation.fingerprints}
+    archives.write_bytes(json.dumps(state).encode('utf-8'), state_path(output_path))
+
+
+def translate(cmn_meidoc, ars_type, mensuration_list, output_path, vectorized_mode=False):
+    """Translate a piece, reusing the measures of its previous translation (in 'output_path') that didn't change, and return the IncrementalTranslation.
+    The output and its new translation state have to be written afterwards (see write_state).
+
+    Arguments:
+    cmn_meidoc, ars_type, mensuration_list, vectorized_mode -- see MensuralTranslation
+    output_path -- path of the output (Mensural-MEI) file of the piece
+    """
+    previous_state, previous_meidoc = read_state(output_path, ars_type)
+    return IncrementalTranslation(cmn_meidoc, ars_type, mensuration_list, previous_meidoc, previous_state, vectorized_mode)
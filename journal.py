@@ -0,0 +1,103 @@
+"""
+journal module
+
+Contains the checkpoint journal of a batch translation (see the batch module), so that a long run that is interrupted can be resumed:
+
+    python MEI_Translator.py batch manifest.csv --jobs 4 --resume
+
+The journal is an append-only file with one JSON line for each piece that finished (translated or failed), with the content hash of its input
+(see shards.piece_key), the path and the SHA-1 of its output, and the time it took. Each line is flushed to the disk as soon as the piece finishes,
+and the outputs are written atomically (to a temporary file that is then renamed), so after an interruption the journal never refers to a half-written output.
+When resuming, a piece is skipped only if the journal has a successful entry for the same input (same content, style and mensuration) and the same output path,
+and the output file still has the SHA-1 recorded in the journal; all the other pieces are translated again.
+
+Functions:
+read_journal -- Return the last entry of each input (content hash) in a journal
+is_complete -- Return True if a piece was already translated, according to its journal entry, and its output is intact
+
+Classes:
+Journal -- Append-only journal of the pieces that finished
+"""
+import json
+import os
+
+from shards import file_hash
+
+
+def read_journal(journal_path):
+    """Return a dictionary with the last entry (a dictionary) of each input in the journal (content hash of the input -> entry).
+
+    A missing journal is empty, and a line that can't be read (e.g., the last line, if the run was killed while writing it) is ignored.
+
+    Arguments:
+    journal_path -- path of the journal
+    """
+    entries = {}
+    if not os.path.exists(journal_path):
+        return entries
+    with open(journal_path, 'r') as journal_file:
+        for line in journal_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and 'key' in entry:
+                entries[entry['key']] = entry
+    return entries
+
+
+def is_complete(piece, entry):
+    """Return True if the piece was already translated: its journal entry is successful, for the same output path, and the output still has the SHA-1 recorded in the journal.
+    Otherwise, return False.
+
+    Arguments:
+    piece -- dictionary with the keys of a piece of the manifest (see batch.read_manifest) and its content hash ('key')
+    entry -- journal entry of the input of the piece (or None)
+    """
+    if entry is None or entry.get('status') != 'ok' or entry.get('output') != piece['output'] or not entry.get('output_sha1'):
+        return False
+    try:
+        return file_hash(piece['output']) == entry['output_sha1']
+    except (IOError, OSError):
+        return False
+
+
+class Journal(object):
+    """Append-only journal of the pieces of a batch translation that finished.
+
+    Methods:
+    append -- Add the entry of the result of a piece to the journal, and flush it to the disk
+    close -- Close the journal
+    """
+
+    def __init__(self, journal_path):
+        """
+        Arguments:
+        journal_path -- path of the journal (it is created if it doesn't exist, otherwise the new entries are added at its end)
+        """
+        self.path = journal_path
+        # If the last line was cut (the run was killed while writing it), end it, so it doesn't spoil the next entry
+        complete = True
+        if os.path.exists(journal_path) and os.path.getsize(journal_path) > 0:
+            with open(journal_path, 'rb') as journal_file:
+                journal_file.seek(-1, os.SEEK_END)
+                complete = journal_file.read(1) == b"\n"
+        self.journal_file = open(journal_path, 'a')
+        if not complete:
+            self.journal_file.write("\n")
+
+    def append(self, result):
+        """Add the entry of the result of a piece (see batch.translate_piece) to the journal, and flush it to the disk.
+
+        Arguments:
+        result -- dictionary with the result of the piece, which includes its content hash ('key')
+        """
+        entry = {'key': result['key'], 'piece': result['piece'], 'style': result['style'], 'mensuration': result['mensuration'],
+                 'output': result['output'], 'output_sha1': result.get('output_sha1'), 'status': result['status'], 'seconds': result['seconds']}
+        self.journal_file.write(json.dumps(entry) + "\n")
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def close(self):
+        """Close the journal."""
+        self.journal_file.close()
@@ -0,0 +1,166 @@
+"""
+layer_builder module
+
+Contains the engine, shared by the arsnova, arsantiqua and white_notation modules, that fills the <section> element of the Mensural-MEI document.
+
+Classes:
+VoiceContent -- The <staff> and <layer> elements of one voice, and the <note> and <rest> elements collected while filling it
+LayerBuilder -- Fill the output <section> element in a single pass over the CMN-MEI staves, with hooks for the style-specific handling of tuplets, beams, mRests and dots
+"""
+from pymei import MeiElement
+
+
+class VoiceContent(object):
+    """The <staff> and <layer> elements of one voice of the Mensural-MEI document, and the elements collected while the layer was filled.
+
+    Attributes:
+    staff, layer -- the <staff> and <layer> elements of the voice in the Mensural-MEI document
+    notes -- list of all the <note> elements of the voice, in order
+    rests -- list of all the <rest> elements of the voice, in order
+    elements -- ordered list of the musical elements of the voice (<note>, <rest> and <tuplet>; the notes of a tuplet are not listed individually)
+    """
+
+    def __init__(self, staff, layer):
+        self.staff = staff
+        self.layer = layer
+        self.notes = []
+        self.rests = []
+        self.elements = []
+
+
+class LayerBuilder(object):
+    """Fill the <section> element of the Mensural-MEI document with the appropriate musical content.
+
+    Each voice gets a <staff> with a single <layer>, which is filled (measure by measure) with the <note> and <rest> elements of that voice, and a <barLine> element after each measure.
+    The appropriate musical content for the <section> in a Mensural-MEI document includes <note> and <rest> elements, but not <tuplet>, <beam>, <mRest> or <tie> elements.
+    The <note> and <rest> elements of each voice are collected while the layer is being filled, so there is no need to look for them afterwards.
+
+    The voices can also be filled measure by measure (see add_voice and fill_measure), e.g., to translate again only some of the measures of a piece (see the incremental module).
+
+    The style modules (arsnova, arsantiqua and white_notation) subclass this class to override the hooks:
+    tuplet -- add the content of a <tuplet> element to the layer
+    beam -- add the content of a <beam> element to the layer
+    mRest -- add the <rest> element that replaces an <mRest> element to the layer
+    dot -- add a <dot> element after a note or rest element, when appropriate
+    """
+    # Duration of an <mRest> element without @dur (it has the duration of the measure)
+    mRest_dur = 'long'
+
+    def __init__(self, ids_removeSet, doc_index):
+        """
+        Arguments:
+        ids_removeSet -- set of the ids of the <note> elements that shouldn't be included in the Mensural-MEI output document (generally notes that are part of a tie)
+        doc_index -- the DocumentIndex of the pymei.MeiDocument that has all the CMN-MEI file information
+        """
+        self.ids_removeSet = ids_removeSet
+        self.doc_index = doc_index
+
+    def fill_section(self, out_section, all_voices):
+        """Fill the <section> element and return a list with the VoiceContent of each voice.
+
+        Arguments:
+        out_section -- the <section> element to be filled in
+        all_voices -- list of lists, each sublist represents a particular voice in the CMN-MEI document and contains all the <staff> elements from that voice
+        """
+        voices = []
+        for voice_number, ind_voice in enumerate(all_voices):
+            voice = self.add_voice(out_section, voice_number)
+            # Fill each voice (fill the <layer> of each <staff>) with musical information (notes/rests)
+            for voice_staff in ind_voice:
+                self.fill_measure(voice, self.doc_index.getLayers(voice_staff)[0].getChildren())
+            voices.append(voice)
+
+        return voices
+
+    def add_voice(self, out_section, voice_number):
+        """Add the <staff> element of a voice, with its empty <layer>, to the <section> element and return the VoiceContent of the voice.
+
+        Arguments:
+        out_section -- the <section> element to be filled in
+        voice_number -- position (starting from 0) of the voice in the CMN-MEI document
+        """
+        # Add a staff for each voice, with the id corresponding to the first <staff> element in the input_file for that exact voice
+        staff = MeiElement('staff')
+        old_staff = self.doc_index.getElementsByName('staff')[voice_number]
+        staff.setId(old_staff.id)
+        staff.addAttribute(old_staff.getAttribute('n'))
+        out_section.addChild(staff)
+        # Add a layer inside the <staff> for each voice, with the id corresponding to the first <layer> element in the input_file for that exact voice
+        layer = MeiElement('layer')
+        old_layer = self.doc_index.getElementsByName('layer')[voice_number]
+        layer.setId(old_layer.id)
+        layer.addAttribute(old_layer.getAttribute('n'))
+        staff.addChild(layer)
+        return VoiceContent(staff, layer)
+
+    def fill_measure(self, voice, musical_content):
+        """Add the elements of one measure into the <layer> of the voice, and a <barLine/> element after the measure-content.
+
+        Arguments:
+        voice -- the VoiceContent of the voice
+        musical_content -- list of the children of the <layer> element of the voice in this measure (in the CMN-MEI document)
+        """
+        for element in musical_content:
+            # Tied notes
+            # If the element is a tied note (other than the first note of the tie: <note @dur = 'TiedNote!'/>), it is not included in the output file (as only the first tied note will be included with the right note shape and duration -@dur.ges-)
+            if element.id in self.ids_removeSet:
+                continue
+            # Tuplets
+            elif element.name == 'tuplet':
+                self.tuplet(element, voice)
+            # Beams
+            elif element.name == 'beam':
+                self.beam(element, voice)
+            # mRests
+            elif element.name == 'mRest':
+                self.mRest(element, voice)
+            # Notes and simple rests
+            else:
+                self.add(element, voice)
+                voice.elements.append(element)
+
+            # Adding the <dot> element after a 'staccated' note or rest element
+            self.dot(element, voice)
+        # Add barline
+        voice.layer.addChild(MeiElement('barLine'))
+
+    def add(self, element, voice):
+        """Add the element to the <layer> of the voice, and keep track of it if it is a <note> or a <rest>."""
+        voice.layer.addChild(element)
+        if element.name == 'note':
+            voice.notes.append(element)
+        elif element.name == 'rest':
+            voice.rests.append(element)
+
+    def add_grouped(self, container, voice):
+        """Add each of the notes (and rests) grouped in a <tuplet> or <beam> element to the <layer>, followed by a <dot> when appropriate."""
+        for note in container.getChildren():
+            self.add(note, voice)
+            self.dot(note, voice)
+
+    def tuplet(self, tuplet, voice):
+        """Hook: add the notes of a <tuplet> element to the layer (the <tuplet> itself is not part of the Mensural-MEI document)."""
+        voice.elements.append(tuplet)
+        self.add_grouped(tuplet, voice)
+
+    def beam(self, beam, voice):
+        """Hook: add the notes of a <beam> element to the layer (the <beam> itself is not part of the Mensural-MEI document)."""
+        for note in beam.getChildren():
+            voice.elements.append(note)
+        self.add_grouped(beam, voice)
+
+    def mRest(self, mRest, voice):
+        """Hook: change the <mRest> into a simple <rest> element (as there are no measure-rests in mensural notation) and add it to the layer."""
+        rest = MeiElement('rest')
+        rest.id = mRest.id
+        rest.setAttributes(mRest.getAttributes())
+        # If there is no duration encoded in the rest, this mRest has the duration of the measure
+        if rest.hasAttribute('dur') is False:
+            rest.addAttribute('dur', self.mRest_dur)
+        self.add(rest, voice)
+        voice.elements.append(rest)
+
+    def dot(self, element, voice):
+        """Hook: add a <dot> element after a 'staccated' note or rest element."""
+        if element.hasAttribute('artic') and element.getAttribute('artic').value == "stacc":
+            voice.layer.addChild(MeiElement('dot'))
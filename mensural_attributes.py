@@ -0,0 +1,54 @@
+"""
+mensural_attributes module
+
+Contains the tables that map the attributes of the CMN-MEI <note> and <rest> elements that are not part of the Mensural-MEI schema to their mensural equivalents.
+These tables are applied by the noterest_to_mensural functions of the arsnova, arsantiqua and white_notation modules, in the same visit to each note (or rest) in which its value is translated.
+
+Functions:
+remove_non_mensural_attributes -- Remove/Replace the attributes of a <note> or <rest> element according to an attribute table
+"""
+
+# Each entry of the tables is a tuple of the form: (attribute, CMN value, mensural replacement), and the entries are applied in order.
+# - attribute: name of the CMN-MEI attribute
+# - CMN value: the entry applies only when the attribute has this value; None means that it applies for any value
+# - mensural replacement: (attribute, value) pair to be added instead; None means that the attribute is just removed
+
+# Attribute table for the <note> elements
+NOTE_ATTRIBUTES = (
+    # Remove extraneous attributes in the <note> element
+    ('layer', None, None),
+    ('pnum', None, None),
+    ('staff', None, None),
+    ('stem.dir', None, None),
+    ('dots', None, None),
+    # Replace extraneous attributes by the appropriate mensural attributes in the <note> element:
+    # For plicas (other values of @stem.mod are kept)
+    ('stem.mod', '1slash', ('plica', 'desc')),
+    ('stem.mod', '2slash', ('plica', 'asc')),
+    # Articulations changes (other values of @artic are kept)
+    ('artic', 'stacc', None),
+    ('artic', 'ten', ('stem.dir', 'down')),   # Any previous @stem.dir has already been removed
+)
+
+# Attribute table for the <rest> elements
+REST_ATTRIBUTES = (
+    # Remove @dots from <rest> elements
+    ('dots', None, None),
+)
+
+
+def remove_non_mensural_attributes(record, attribute_table):
+    """Remove/Replace the attributes of a <note> or <rest> element that are not part of the Mensural-MEI schema, according to the attribute table.
+
+    The changes are made on the ElementRecord of the element (see the element_records module), which already has all the attributes of the element.
+
+    Arguments:
+    record -- the ElementRecord of a <note> or <rest> element
+    attribute_table -- tuple of (attribute, CMN value, mensural replacement) entries (NOTE_ATTRIBUTES or REST_ATTRIBUTES)
+    """
+    for name, cmn_value, replacement in attribute_table:
+        value = record.get(name)
+        if value is not None and (cmn_value is None or value == cmn_value):
+            record.remove(name)
+            if replacement is not None:
+                record.set(replacement[0], replacement[1])
@@ -0,0 +1,162 @@
+"""
+pipeline module
+
+Contains the stages of the pipelined batch translation (see the batch module, option --prefetch), which overlaps the I/O of the pieces with their translation:
+
+    reader thread  -->  worker processes  -->  writer threads
+    (Prefetcher)        (translate_piece)      (OutputWriters)
+
+The reader thread reads the next pieces (files, gzip-compressed files or archive members) while the worker processes translate the current ones,
+keeping at most a given number of pieces read ahead; the worker processes parse the pieces from memory and send back their serialized outputs;
+and the writer threads write the outputs (or add them to an archive) while the next pieces are translated.
+On slow (e.g., network-mounted) storage the worker processes don't wait for the disk, and the time that each stage spends blocked tells where the bottleneck is:
+a reader that waits for room in the prefetch queue and writers that wait for outputs mean that the translation is the bottleneck;
+workers that wait for input, or outputs that wait for room in the write queue, mean that the I/O is.
+
+Classes:
+Prefetcher -- Reader thread that reads the pieces ahead into a bounded queue
+OutputWriters -- Writer threads that write the outputs of the pieces from a bounded queue
+"""
+import queue
+import threading
+import time
+import traceback
+
+import archives
+
+# Marks the end of a queue
+_END = None
+
+
+class Prefetcher(object):
+    """Reader thread that reads the content of the pieces ahead (keeping at most 'prefetch' pieces in memory), and iterator over the pieces with their content.
+
+    Each piece is a copy of a piece of the manifest with its content (bytes) in 'input_data', or the traceback of the read in 'input_error' if it couldn't be read.
+
+    Attributes:
+    read_blocked -- seconds that the reader thread waited for room in the queue (the consumer is slower than the reads)
+    input_wait -- seconds that the consumer waited for the next piece (the reads are slower than the consumer)
+    """
+
+    def __init__(self, pieces, prefetch):
+        """
+        Arguments:
+        pieces -- list of pieces (see batch.read_manifest)
+        prefetch -- maximum number of pieces read ahead
+        """
+        self.pieces = pieces
+        self.queue = queue.Queue(max(1, prefetch))
+        self.read_blocked = 0.0
+        self.input_wait = 0.0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._read, name="prefetcher")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _read(self):
+        for piece in self.pieces:
+            piece = dict(piece)
+            try:
+                piece['input_data'] = archives.read_bytes(piece['piece'])
+            except Exception:
+                piece['input_error'] = traceback.format_exc()
+            if not self._put(piece):
+                return
+        self._put(_END)
+
+    def _put(self, item):
+        """Put an item in the queue, waiting for room; return False if the prefetcher was stopped."""
+        start = time.time()
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                self.read_blocked += time.time() - start
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        while True:
+            start = time.time()
+            piece = self.queue.get()
+            self.input_wait += time.time() - start
+            if piece is _END:
+                return
+            yield piece
+
+    def stop(self):
+        """Stop the reader thread (e.g., if the consumer stops before the end of the pieces)."""
+        self.stopped.set()
+        self.thread.join()
+
+
+class OutputWriters(object):
+    """Writer threads that write the outputs of the pieces, taken from a bounded queue.
+
+    Attributes:
+    output_wait -- seconds that the writer threads waited for outputs to write (added over all the threads)
+    write_seconds -- seconds that the writer threads spent writing (added over all the threads)
+    handoff_blocked -- seconds that the producer waited for room in the queue (the writes are slower than the translation)
+    """
+
+    def __init__(self, write, done, writers=1, capacity=None):
+        """
+        Arguments:
+        write -- function called (in a writer thread) with the result of a piece and the content (bytes) of its output, which writes the output
+        done -- function called (in a writer thread, one call at a time) with the result of a piece and None, or the traceback of the failure of 'write'
+        writers -- number of writer threads (default 1)
+        capacity -- maximum number of outputs waiting to be written (default: twice the number of writer threads)
+        """
+        self.write = write
+        self.done = done
+        self.queue = queue.Queue(capacity or 2 * max(1, writers))
+        self.output_wait = 0.0
+        self.write_seconds = 0.0
+        self.handoff_blocked = 0.0
+        self.lock = threading.Lock()
+        self.threads = []
+        for number in range(max(1, writers)):
+            thread = threading.Thread(target=self._run, name="writer-" + str(number + 1))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def _run(self):
+        while True:
+            start = time.time()
+            item = self.queue.get()
+            waited = time.time() - start
+            if item is _END:
+                with self.lock:
+                    self.output_wait += waited
+                return
+            result, output_data = item
+            start = time.time()
+            try:
+                self.write(result, output_data)
+                error = None
+            except Exception:
+                error = traceback.format_exc()
+            with self.lock:
+                self.output_wait += waited
+                self.write_seconds += time.time() - start
+                self.done(result, error)
+
+    def put(self, result, output_data):
+        """Give the output of a piece to the writer threads (waiting for room in the queue).
+
+        Arguments:
+        result -- result of the piece (see batch.translate_piece)
+        output_data -- content (bytes) of its output
+        """
+        start = time.time()
+        self.queue.put((result, output_data))
+        self.handoff_blocked += time.time() - start
+
+    def close(self):
+        """Wait until all the outputs have been written, and stop the writer threads."""
+        for thread in self.threads:
+            self.queue.put(_END)
+        for thread in self.threads:
+            thread.join()
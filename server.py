@@ -0,0 +1,262 @@
+"""
+server module
+
+Long-running local translation server, so the tools that translate a piece on every save don't pay for the start of the interpreter,
+the import of pymei and the setup of the translator on every call:
+
+    python MEI_Translator.py serve --port 8765 --workers 2
+    python MEI_Translator.py serve --socket /tmp/mei_translator.sock
+
+The server listens on localhost (or on a Unix socket) and speaks HTTP:
+POST /translate?style=<style>&mensuration=<mensuration> -- the body is the CMN-MEI file (UTF-8 or UTF-16), and the response is the Mensural-MEI file.
+The mensuration is written as in a CSV manifest (see the batch module), e.g.: 'i p i p; i p i p; i i i p' or '3 p; 3 p; 3 p'.
+With the parameter format=json, the response is a JSON object with the Mensural-MEI file ('mei'), what the translation printed ('messages') and whether it came from the cache ('cached').
+Invalid requests get the status 400 (with the description of the problem), failed translations 500 (with the traceback) and translations that take longer than the timeout 504.
+GET /status -- JSON object with the number of requests, of cache hits, of failures, and the size of the cache.
+
+The translations run in a pool of worker processes (see worker_pool.WorkerPool), forked when the server starts (so they already have pymei and the rule tables of the translator loaded);
+a worker that doesn't stop a translation when it takes longer than the timeout is killed and replaced by a new one, so it doesn't keep one of the workers of the server busy.
+The last translations are kept in an LRU cache, keyed by the content of the file, the style and the mensuration.
+
+Functions:
+main -- Command line interface of the serve mode
+
+Classes:
+TranslationService -- Pre-forked pool of translation workers with an LRU cache of the results
+TranslationRequestHandler -- HTTP handler of the requests to the server
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import signal
+import socketserver
+import threading
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from pymei import documentFromText, documentToText
+
+import archives
+import batch
+from MEI_Translator import MensuralTranslation
+from worker_pool import WorkerError, WorkerPool
+
+
+def _translate_request(request):
+    """Translate a piece in a worker process, and return a tuple (problem, Mensural-MEI text, messages):
+    problem is the description of the problem if the number of voices of the mensuration is not the number of voices of the piece (and None otherwise),
+    and messages is what the translation printed. The piece is parsed once, for both.
+
+    Arguments:
+    request -- tuple (CMN-MEI text, style, mensuration)
+    """
+    cmn_text, style, mensuration = request
+    messages = io.StringIO()
+    with batch.capture_output(messages):
+        cmn_meidoc = documentFromText(cmn_text).getMeiDocument()
+        number_voices = len(cmn_meidoc.getElementsByName('staffDef'))
+        if len(mensuration) != number_voices:
+            return "The number of voices entered (" + str(len(mensuration)) + ") is different from the number of voices on the CMN-MEI file of the piece (" + str(number_voices) + ").", None, None
+        mensural_text = documentToText(MensuralTranslation(cmn_meidoc, style, mensuration))
+    return None, mensural_text, messages.getvalue()
+
+
+class TranslationService(object):
+    """Pre-forked pool of worker processes that translate the pieces, with an LRU cache of the last results.
+
+    Methods:
+    translate -- Return the translation of a CMN-MEI file (from the cache, or from a worker process)
+    status -- Return the statistics of the service
+    close -- Stop the worker processes
+    """
+
+    def __init__(self, workers=2, cache_size=128, timeout=None):
+        """
+        Arguments:
+        workers -- number of worker processes (default 2)
+        cache_size -- maximum number of translations in the cache (default 128; 0 disables the cache)
+        timeout -- maximum number of seconds for a translation (default None: no timeout)
+        """
+        self.pool = WorkerPool(_translate_request, max(1, workers), timeout)
+        self.pool.start()
+        self.workers = max(1, workers)
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'cache_hits': 0, 'failed': 0}
+
+    def _count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def translate(self, cmn_data, style, mensuration):
+        """Return a tuple (Mensural-MEI text, messages, cached) with the translation of a CMN-MEI file, and whether it came from the cache.
+        Raise ValueError if the style or the mensuration are not valid, TimeoutError if the translation takes longer than the timeout,
+        and worker_pool.WorkerError (with the traceback) if the translation fails.
+
+        Arguments:
+        cmn_data -- content (bytes) of the CMN-MEI file
+        style -- 'ars_antiqua', 'ars_nova' or 'white_mensural'
+        mensuration -- list with the list of values of each voice (see batch.check_mensuration)
+        """
+        self._count('requests')
+        problem = batch.check_mensuration(style, mensuration)
+        if problem is not None:
+            raise ValueError(problem)
+        key = hashlib.sha1(cmn_data).hexdigest() + "\n" + style + "\n" + json.dumps(mensuration)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.counters['cache_hits'] += 1
+                mensural_text, messages = self.cache[key]
+                return mensural_text, messages, True
+
+        try:
+            cmn_text = archives.decode_mei(cmn_data)
+        except UnicodeDecodeError:
+            raise ValueError("The CMN-MEI file should be encoded in UTF-8 or UTF-16.")
+        try:
+            problem, mensural_text, messages = self.pool.call((cmn_text, style, mensuration))
+            if problem is not None:
+                raise ValueError(problem)
+        except Exception:
+            self._count('failed')
+            raise
+
+        if self.cache_size > 0:
+            with self.lock:
+                self.cache[key] = (mensural_text, messages)
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return mensural_text, messages, False
+
+    def status(self):
+        """Return a dictionary with the statistics of the service: the number of requests, of cache hits and of failures, the size of the cache and the number of workers."""
+        with self.lock:
+            status = dict(self.counters)
+            status['cached'] = len(self.cache)
+        status['cache_size'] = self.cache_size
+        status['workers'] = self.workers
+        return status
+
+    def close(self):
+        """Stop the worker processes."""
+        self.pool.close()
+
+
+class TranslationRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler of the requests to the server (see the module documentation). The TranslationService is the attribute 'service' of the server."""
+
+    def address_string(self):
+        # The clients of a Unix socket don't have an address
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix-socket"
+
+    def _respond(self, status, body, content_type, headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/status':
+            self._respond(200, json.dumps(self.server.service.status()), 'application/json')
+        else:
+            self._respond(404, "Unknown path: use POST /translate or GET /status\n", 'text/plain; charset=utf-8')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/translate':
+            self._respond(404, "Unknown path: use POST /translate or GET /status\n", 'text/plain; charset=utf-8')
+            return
+        parameters = parse_qs(url.query)
+        style = parameters.get('style', [''])[0]
+        mensuration = batch.parse_mensuration(parameters.get('mensuration', [''])[0])
+        as_json = parameters.get('format', [''])[0] == 'json'
+        cmn_data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        try:
+            mensural_text, messages, cached = self.server.service.translate(cmn_data, style, mensuration)
+        except ValueError as error:
+            self._respond(400, str(error) + "\n", 'text/plain; charset=utf-8')
+            return
+        except TimeoutError:
+            self._respond(504, "The translation took longer than the timeout of the server.\n", 'text/plain; charset=utf-8')
+            return
+        except WorkerError as error:
+            self._respond(500, str(error), 'text/plain; charset=utf-8')
+            return
+        except Exception:
+            self._respond(500, traceback.format_exc(), 'text/plain; charset=utf-8')
+            return
+
+        headers = {'X-Cache': 'hit' if cached else 'miss'}
+        if as_json:
+            self._respond(200, json.dumps({'mei': mensural_text, 'messages': messages, 'cached': cached}), 'application/json', headers)
+        else:
+            self._respond(200, mensural_text, 'application/xml; charset=utf-8', headers)
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix socket, which handles each request in a thread."""
+    daemon_threads = True
+
+
+def _stop(signum, frame):
+    """Stop the server on SIGTERM (as on Ctrl-C), ignoring the next SIGTERMs while it shuts down."""
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt()
+
+
+def main(argv):
+    """Command line interface of the serve mode, return the exit status.
+
+    Arguments:
+    argv -- list of the command line arguments (after 'serve')
+    """
+    parser = argparse.ArgumentParser(prog='MEI_Translator.py serve', description="Run a local translation server (HTTP on localhost, or on a Unix socket) with warm worker processes and a cache of the last translations.")
+    parser.add_argument('--port', type=int, default=8765, help="Port on localhost (127.0.0.1) on which the server listens (default 8765).")
+    parser.add_argument('--socket', help="Listen on this Unix socket instead of a port on localhost.")
+    parser.add_argument('--workers', type=int, default=2, help="Number of worker processes (default 2).")
+    parser.add_argument('--cache', type=int, default=128, help="Number of translations kept in the cache (default 128, 0 disables the cache).")
+    parser.add_argument('--timeout', type=float, default=None, help="Maximum number of seconds for a translation (default: no timeout).")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers should be at least 1.")
+    if args.cache < 0:
+        parser.error("--cache can't be negative.")
+
+    # The workers are forked before the server starts listening
+    service = TranslationService(args.workers, args.cache, args.timeout)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = _ThreadingUnixHTTPServer(args.socket, TranslationRequestHandler)
+        print("Listening on the Unix socket " + args.socket)
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', args.port), TranslationRequestHandler)
+        print("Listening on http://127.0.0.1:" + str(args.port))
+    server.service = service
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
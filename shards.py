@@ -0,0 +1,175 @@
+"""
+shards module
+
+Split the translation of a corpus across several machines (or several processes side by side), and merge their results:
+
+    python MEI_Translator.py batch manifest.csv --shard 1/3 --summary shard1.json     (on the first node)
+    python MEI_Translator.py batch manifest.csv --shard 2/3 --summary shard2.json     (on the second node)
+    python MEI_Translator.py batch manifest.csv --shard 3/3 --summary shard3.json     (on the third node)
+    python MEI_Translator.py merge shard1.json shard2.json shard3.json --report corpus.json
+
+Each piece of the manifest belongs to exactly one shard, given by the hash of its content (the bytes of its file, its style and its mensuration),
+so every node computes the same partition of the manifest without any coordination, and the shards are disjoint.
+The merge step checks that the summaries of the shards come from the same manifest and partition, detects the pieces that are missing
+(e.g., a shard that wasn't run) or duplicated, and writes a single report for the whole corpus.
+
+Functions:
+file_hash -- Return the SHA-1 of a file
+piece_key -- Return the content hash of a piece of the manifest
+parse_shard -- Return the (shard, number of shards) of a 'i/N' string
+select_shard -- Return the pieces of the manifest that belong to a shard
+merge_summaries -- Merge the summaries of the shards into a corpus report
+main -- Command line interface of the merge step
+"""
+import argparse
+import hashlib
+import json
+
+import archives
+
+
+def file_hash(path):
+    """Return the SHA-1 (hexadecimal string) of the content of a file.
+
+    Arguments:
+    path -- path of the file
+    """
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as input_file:
+        for block in iter(lambda: input_file.read(65536), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def piece_key(piece, input_data=None):
+    """Return the content hash (hexadecimal string) of a piece of the manifest: the SHA-1 of the content of its file (or archive member), its style and its mensuration.
+
+    If the file of the piece can't be read, its path is used instead of its content (the translation of the piece will then fail in its shard).
+
+    Arguments:
+    piece -- dictionary with the keys: 'piece', 'style' and 'mensuration' (see batch.read_manifest)
+    input_data -- content (bytes) of the piece, when it was already read (default None: read it)
+    """
+    try:
+        if input_data is None:
+            input_data = archives.read_bytes(piece['piece'])
+        content = hashlib.sha1(input_data).hexdigest()
+    except (IOError, OSError):
+        content = 'path:' + piece['piece']
+    description = content + '\n' + piece['style'] + '\n' + json.dumps(piece['mensuration'])
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+
+def parse_shard(shard_string):
+    """Return the tuple (shard, number of shards) given by a string of the form 'i/N', with 1 <= i <= N. Raise ValueError if the string is not valid.
+
+    Arguments:
+    shard_string -- string such as '2/5' (the second of five shards)
+    """
+    try:
+        shard, shards = [int(value) for value in shard_string.split('/')]
+    except ValueError:
+        raise ValueError("The shard should be given as i/N (e.g., 2/5), not '" + shard_string + "'.")
+    if not 1 <= shard <= shards:
+        raise ValueError("The shard i/N should have 1 <= i <= N, not '" + shard_string + "'.")
+    return shard, shards
+
+
+def select_shard(pieces, shard, shards):
+    """Return the list of pieces that belong to the shard (adding the content hash of each piece to it, with the key 'key').
+
+    Arguments:
+    pieces -- list of pieces of the manifest (see batch.read_manifest)
+    shard, shards -- the shard (from 1 to shards) and the number of shards
+    """
+    selected = []
+    for piece in pieces:
+        piece['key'] = piece_key(piece)
+        if int(piece['key'], 16) % shards == shard - 1:
+            selected.append(piece)
+    return selected
+
+
+def merge_summaries(summaries):
+    """Merge the summaries of the shards (see batch.main) into a report of the whole corpus, and return it.
+
+    The report is a dictionary with the totals of the corpus ('entries', 'succeeded', 'failed'), the results of all the pieces (in the order of the manifest),
+    and the problems found: 'missing' (indices of the manifest entries without a result), 'duplicates' (indices with more than one result),
+    'missing_shards' (shards without a summary) and 'inconsistent' (descriptions of the summaries that don't belong to the same manifest and partition).
+
+    Arguments:
+    summaries -- list of the summaries (dictionaries) of the shards
+    """
+    report = {'entries': 0, 'succeeded': 0, 'failed': 0, 'seconds': 0.0, 'pieces': [],
+              'missing': [], 'duplicates': [], 'missing_shards': [], 'inconsistent': []}
+    if not summaries:
+        return report
+
+    reference = summaries[0]
+    shards = reference['shard'][1] if reference.get('shard') else 1
+    seen_shards = set()
+    results_by_index = {}
+    for summary in summaries:
+        shard = summary.get('shard') or [1, 1]
+        if summary.get('manifest_sha1') != reference.get('manifest_sha1') or summary.get('manifest_entries') != reference.get('manifest_entries') or shard[1] != shards:
+            report['inconsistent'].append("The summary of the shard " + str(shard[0]) + "/" + str(shard[1]) + " doesn't belong to the same manifest (or number of shards) as the summary of the first shard.")
+            continue
+        if shard[0] in seen_shards:
+            report['inconsistent'].append("The shard " + str(shard[0]) + "/" + str(shard[1]) + " appears in more than one summary.")
+        seen_shards.add(shard[0])
+        report['seconds'] += summary.get('seconds', 0.0)
+        for result in summary['pieces']:
+            results_by_index.setdefault(result['index'], []).append(result)
+
+    report['entries'] = reference.get('manifest_entries', 0)
+    report['missing_shards'] = [shard for shard in range(1, shards + 1) if shard not in seen_shards]
+    for index in range(report['entries']):
+        results = results_by_index.get(index, [])
+        if not results:
+            report['missing'].append(index)
+            continue
+        if len(results) > 1:
+            report['duplicates'].append(index)
+        result = results[0]
+        report['pieces'].append(result)
+        if result['status'] == 'ok':
+            report['succeeded'] += 1
+        else:
+            report['failed'] += 1
+    return report
+
+
+def main(argv):
+    """Command line interface of the merge step, return the exit status (0 when all the pieces of the corpus were translated, and no problem was found).
+
+    Arguments:
+    argv -- list of the command line arguments (after 'merge')
+    """
+    parser = argparse.ArgumentParser(prog='MEI_Translator.py merge', description="Merge the summaries of the shards of a batch translation (batch --shard i/N --summary file) into a single corpus report.")
+    parser.add_argument('summaries', nargs='+', help="JSON summaries of the shards.")
+    parser.add_argument('--report', help="Write the corpus report (the result of each piece, and the problems found) to this JSON file.")
+    args = parser.parse_args(argv)
+
+    summaries = []
+    for path in args.summaries:
+        with open(path, 'r') as summary_file:
+            summaries.append(json.load(summary_file))
+    report = merge_summaries(summaries)
+
+    for problem in report['inconsistent']:
+        print("INCONSISTENT: " + problem)
+    if report['missing_shards']:
+        print("MISSING SHARDS: " + ", ".join(str(shard) for shard in report['missing_shards']))
+    if report['missing']:
+        print("MISSING PIECES (manifest entries): " + ", ".join(str(index) for index in report['missing']))
+    if report['duplicates']:
+        print("DUPLICATED PIECES (manifest entries): " + ", ".join(str(index) for index in report['duplicates']))
+    print(str(report['entries']) + " pieces: " + str(report['succeeded']) + " translated, " + str(report['failed']) + " failed, " + str(len(report['missing'])) + " missing, " + str(len(report['duplicates'])) + " duplicated")
+
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+    if report['failed'] or report['missing'] or report['duplicates'] or report['missing_shards'] or report['inconsistent']:
+        return 1
+    return 0
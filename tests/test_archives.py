@@ -0,0 +1,69 @@
+"""
+Check that ArchiveWriter (archives module) writes intact archives when the files are added from several threads at the same time,
+as the writer threads of pipeline.OutputWriters do with --prefetch --writers N --archive.
+
+Run from the root of the repository:
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import unittest
+import zipfile
+
+from archives import ArchiveWriter
+
+
+def file_content(number):
+    """Return the content of the file 'number' (of different sizes, so that the writes of the threads overlap)."""
+    return (("<mei n='%d'>" % number) * (50 + 37 * (number % 23))).encode('utf-8')
+
+
+class ArchiveWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_archive(self, name, threads=8, files=400):
+        path = os.path.join(self.directory, name)
+        writer = ArchiveWriter(path)
+
+        def add_files(first):
+            for number in range(first, files, threads):
+                writer.add('piece_%d.mei' % number, file_content(number))
+
+        workers = [threading.Thread(target=add_files, args=(first,)) for first in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        writer.close()
+        return path, files
+
+    def test_tar(self):
+        for name in ['out.tar', 'out.tar.gz', 'out.tar.bz2', 'out.tar.xz']:
+            path, files = self.write_archive(name)
+            with tarfile.open(path) as archive:
+                members = archive.getmembers()
+                self.assertEqual(len(members), files)
+                for member in members:
+                    number = int(member.name[len('piece_'):-len('.mei')])
+                    self.assertEqual(archive.extractfile(member).read(), file_content(number))
+
+    def test_zip(self):
+        path, files = self.write_archive('out.zip')
+        with zipfile.ZipFile(path) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(len(archive.namelist()), files)
+            for name in archive.namelist():
+                self.assertEqual(archive.read(name), file_content(int(name[len('piece_'):-len('.mei')])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Check that the batch mode gives each result the content hash of its piece (see shards.piece_key), used by the journal,
+when it is computed by the worker from the content read for the translation.
+
+Run from the root of the repository:
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import archives
+import batch
+import shards
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'TestFiles')
+
+
+class PieceKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pieces = batch.read_manifest(os.path.join(TEST_FILES, 'pieces.csv'))
+        for piece in self.pieces:
+            piece['output'] = os.path.join(self.directory, os.path.basename(piece['output']))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_translated_piece(self):
+        for piece in self.pieces:
+            result = batch.translate_piece(piece)
+            self.assertEqual(result['status'], 'ok')
+            self.assertEqual(result['key'], shards.piece_key(piece))
+
+    def test_prefetched_piece(self):
+        piece = dict(self.pieces[0], input_data=archives.read_bytes(self.pieces[0]['piece']))
+        self.assertEqual(batch.translate_piece(piece)['key'], shards.piece_key(self.pieces[0]))
+
+    def test_missing_piece(self):
+        piece = dict(self.pieces[0], piece=os.path.join(self.directory, 'missing.mei'))
+        result = batch.translate_piece(piece)
+        self.assertEqual(result['status'], 'failed')
+        self.assertEqual(result['key'], shards.piece_key(piece))
+        self.assertEqual(batch.failed_result(piece, "Timeout")['key'], result['key'])
+
+    def test_given_key(self):
+        piece = dict(self.pieces[0], key='given')
+        self.assertEqual(batch.translate_piece(piece)['key'], 'given')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Exhaustive check of the table of partial imperfections (imperfection module) against the original partial_imperfection function of the arsnova and white_notation modules,
+which compared Fractions with the ratios of each rule.
+
+Run from the root of the repository:
+
+    python -m pytest tests
+"""
+from fractions import Fraction
+from itertools import product
+import unittest
+
+import arsnova
+import white_notation
+from imperfection import partial_imperfection_quality, partial_imperfection_ratios
+
+
+class _Note(object):
+    """Stand-in for the <note> element of the original function, which records the attributes added to it."""
+
+    def __init__(self):
+        self.attributes = {}
+
+    def addAttribute(self, name, value):
+        self.attributes[name] = value
+
+
+def baseline_partial_imperfection(note, ratio, modusminor, tempus, prolatio=None):
+    """The original partial_imperfection function (the same in the arsnova and white_notation modules)."""
+    partial_imperf = True
+
+    # Immediate imperfection: tempus should be 3
+    if tempus == 3 and modusminor == 2 and (ratio == Fraction(5, 6) or ratio == Fraction(4, 6)):
+        note.addAttribute('quality', 'immediate_imp')
+    elif tempus == 3 and modusminor == 3 and (ratio == Fraction(5, 9)):
+        note.addAttribute('quality', 'imperfection + immediate_imp')
+    elif tempus == 3 and modusminor == 3 and (ratio == Fraction(8, 9) or ratio == Fraction(7, 9)):
+        note.addAttribute('quality', 'immediate_imp')
+
+    # Remote imperfection: there should be a prolatio value, and it should be 3
+    elif prolatio is not None:
+        if prolatio == 3 and tempus == 2 and modusminor == 2 and ratio == Fraction(11, 12):
+            note.addAttribute('quality', 'remote_imp')
+        elif prolatio == 3 and tempus == 2 and modusminor == 3 and ratio == Fraction(11, 18):
+            note.addAttribute('quality', 'imperfection + remote_imp')
+        elif prolatio == 3 and tempus == 2 and modusminor == 3 and ratio == Fraction(17, 18):
+            note.addAttribute('quality', 'remote_imp')
+        elif prolatio == 3 and tempus == 3 and modusminor == 2 and ratio == Fraction(17, 18):
+            note.addAttribute('quality', 'remote_imp')
+        elif prolatio == 3 and tempus == 3 and modusminor == 3 and ratio == Fraction(17, 27):
+            note.addAttribute('quality', 'imperfection + remote_imp')
+        elif prolatio == 3 and tempus == 3 and modusminor == 3 and ratio == Fraction(26, 27):
+            note.addAttribute('quality', 'remote_imp')
+        else:
+            partial_imperf = False
+
+    else:
+        partial_imperf = False
+
+    # Add the @num and @numbase attributes in case of partial imperfection
+    if partial_imperf:
+        note.addAttribute('num', str(ratio.denominator))
+        note.addAttribute('numbase', str(ratio.numerator))
+    return partial_imperf
+
+
+def baseline_quality(durges_num, default_val, modusminor, tempus, prolatio=None):
+    """Return the (@quality, @num, @numbase) given by the original function, or None."""
+    note = _Note()
+    if not baseline_partial_imperfection(note, Fraction(durges_num, default_val), modusminor, tempus, prolatio):
+        return None
+    return note.attributes['quality'], note.attributes['num'], note.attributes['numbase']
+
+
+def partial_imperfection_cases(module):
+    """Return the set of (default performed duration, partial imperfection arguments) of the breves, longas and maximas of all the mensurations of a style module."""
+    cases = set()
+    for triplet_of_minims, modusmaior, modusminor, tempus, prolatio in product([False, True], [2, 3], [2, 3], [2, 3], [2, 3]):
+        semibrevis_val, brevis_val, longa_val, maxima_val = module.relative_vals(triplet_of_minims, modusmaior, modusminor, tempus, prolatio)
+        # The arguments of each note (see DecisionTable and DurationTable)
+        cases.add((brevis_val, (tempus, prolatio, None)))
+        cases.add((longa_val, (modusminor, tempus, prolatio)))
+        cases.add((maxima_val, (modusmaior, modusminor, tempus)))
+    return sorted(cases, key=lambda case: (case[0], [-1 if value is None else value for value in case[1]]))
+
+
+class PartialImperfectionTableTest(unittest.TestCase):
+
+    def check_style(self, module):
+        for default_val, arguments in partial_imperfection_cases(module):
+            ratios = dict(((numerator, denominator), quality) for numerator, denominator, quality in partial_imperfection_ratios(*arguments))
+            for durges_num in range(1, 2 * default_val + 1):
+                expected = baseline_quality(durges_num, default_val, *arguments)
+                self.assertEqual(partial_imperfection_quality(durges_num, default_val, *arguments), expected,
+                                 "%s: %dp with a default value of %dp and the arguments %r" % (module.__name__, durges_num, default_val, arguments))
+                # The ratios used to build the decision tables give the same qualities
+                ratio = Fraction(durges_num, default_val)
+                quality = ratios.get((ratio.numerator, ratio.denominator))
+                self.assertEqual(quality, None if expected is None else expected[0])
+
+    def test_arsnova(self):
+        self.check_style(arsnova)
+
+    def test_white_notation(self):
+        self.check_style(white_notation)
+
+    def test_every_mensuration(self):
+        # Also the combinations of arguments that the styles don't use (e.g., prolatio None for a longa)
+        for modusminor, tempus, prolatio in product([2, 3], [2, 3], [2, 3, None]):
+            for default_val in [27, 36, 54, 72, 108, 162, 216]:
+                for durges_num in range(1, 2 * default_val + 1):
+                    self.assertEqual(partial_imperfection_quality(durges_num, default_val, modusminor, tempus, prolatio),
+                                     baseline_quality(durges_num, default_val, modusminor, tempus, prolatio))
+
+
+if __name__ == '__main__':
+    unittest.main()
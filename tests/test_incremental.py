@@ -0,0 +1,121 @@
+"""
+Check that the incremental translation (incremental module) gives the same Mensural-MEI document as translating the whole piece again,
+after random edits of the pitch and duration of its notes, in Ars Antiqua (with and without minor-major pairs of semibreves), Ars Nova and white mensural notation.
+
+Run from the root of the repository:
+
+    python -m pytest tests
+"""
+from contextlib import redirect_stdout
+import io
+import os
+import random
+import re
+import shutil
+import tempfile
+import unittest
+
+from pymei import documentFromText, documentToText
+
+import archives
+import incremental
+from MEI_Translator import MensuralTranslation
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'TestFiles')
+
+# Number of edits of each piece
+EDITS = 15
+
+
+def normalized(mensural_text):
+    """Return the text of a Mensural-MEI document without the ids generated by the translation (e.g., of the barlines), which are new in each translation."""
+    return re.sub(r'xml:id="gen-[^"]*"', 'xml:id="gen"', mensural_text)
+
+
+def edit_note(meidoc, rng):
+    """Change the pitch of a random note of the document, or give it the duration of another random note (the same measure changes in all the voices)."""
+    notes = [note for note in meidoc.getElementsByName('note') if note.hasAttribute('dur') and note.hasAttribute('dur.ges')]
+    note = rng.choice(notes)
+    if rng.random() < 0.5:
+        note.addAttribute('pname', rng.choice('abcdefg'))
+    else:
+        other = rng.choice(notes)
+        for name in ('dur', 'dur.ges', 'dots'):
+            if other.hasAttribute(name):
+                note.addAttribute(name, other.getAttribute(name).value)
+            elif note.hasAttribute(name):
+                note.removeAttribute(name)
+
+
+def make_breve(meidoc, rng):
+    """Turn a random semibreve of the document into a breve, which leaves sequences of semibreves that can't be paired."""
+    semibreves = [note for note in meidoc.getElementsByName('note') if note.hasAttribute('dur') and note.getAttribute('dur').value == '1']
+    note = rng.choice(semibreves)
+    note.addAttribute('dur', 'breve')
+    note.addAttribute('dur.ges', '2048p')
+
+
+class IncrementalTranslationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, 'piece_MENSURAL.mei')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def translate(self, cmn_text, style, mensuration):
+        """Translate the piece incrementally (from its previous output), write the output and its state, and return the IncrementalTranslation and its text."""
+        translation = incremental.translate(documentFromText(cmn_text).getMeiDocument(), style, mensuration, self.output)
+        mensural_text = documentToText(translation)
+        output_data = mensural_text.encode('utf-8')
+        archives.write_bytes(output_data, self.output)
+        incremental.write_state(translation, self.output, output_data)
+        return translation, mensural_text
+
+    def check_edits(self, name, style, mensuration, edit=edit_note, seed=0):
+        rng = random.Random(seed)
+        cmn_text = documentToText(archives.read_document(os.path.join(TEST_FILES, name)))
+        reused_measures = 0
+        with redirect_stdout(io.StringIO()):
+            self.translate(cmn_text, style, mensuration)
+            for number in range(EDITS):
+                meidoc = documentFromText(cmn_text).getMeiDocument()
+                edit(meidoc, rng)
+                cmn_text = documentToText(meidoc)
+                translation, mensural_text = self.translate(cmn_text, style, mensuration)
+                reused_measures += translation.reused_measures
+                full_translation = MensuralTranslation(documentFromText(cmn_text).getMeiDocument(), style, mensuration)
+                self.assertEqual(normalized(mensural_text), normalized(documentToText(full_translation)),
+                                 "%s (%s %r): different translation after edit %d" % (name, style, mensuration[0], number + 1))
+                self.check_diagnostics(translation, full_translation)
+        # The edits were translated incrementally
+        self.assertGreater(reused_measures, 0)
+
+    def check_diagnostics(self, translation, full_translation):
+        """The diagnostics of the incremental translation are diagnostics of the whole piece, with positions relative to their run."""
+        full_sequences = set((None if sequence.start_element is None else sequence.start_element.id, sequence.end_element.id, sequence.number_sb)
+                             for sequence in full_translation.semibreve_diagnostics)
+        for sequence in translation.semibreve_diagnostics:
+            self.assertIn((None if sequence.start_element is None else sequence.start_element.id, sequence.end_element.id, sequence.number_sb), full_sequences)
+            self.assertEqual(sequence.end - sequence.start - 1, sequence.number_sb)
+            self.assertGreaterEqual(sequence.start, -1)
+
+    def test_ars_antiqua_pairs(self):
+        self.check_edits(os.path.join('Fauv', 'adesto.mei'), 'ars_antiqua', [['3', 'p']] * 3)
+
+    def test_ars_antiqua_without_pairs(self):
+        self.check_edits(os.path.join('Fauv', 'adesto.mei'), 'ars_antiqua', [['2', 'i']] * 3)
+
+    def test_ars_antiqua_odd_semibreves(self):
+        self.check_edits(os.path.join('Fauv', 'qui_secuntur.mei'), 'ars_antiqua', [['3', 'p']] * 3, make_breve)
+
+    def test_ars_nova(self):
+        self.check_edits(os.path.join('IvTrem', 'bona.mei'), 'ars_nova', [['i', 'p', 'i', 'p'], ['i', 'p', 'i', 'p'], ['i', 'i', 'i', 'p']])
+
+    def test_white_mensural(self):
+        self.check_edits(os.path.join('IvTrem', 'zodiacum.mei'), 'white_mensural', [['p', 'i', 'p', 'i']] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
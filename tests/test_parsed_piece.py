@@ -0,0 +1,59 @@
+"""
+Check that the translations of a ParsedPiece (MEI_Translator module) are independent from each other and from the original document,
+and the same as translating the file directly.
+
+Run from the root of the repository:
+
+    python -m pytest tests
+"""
+import os
+import re
+import unittest
+
+from pymei import documentToText
+
+import archives
+from MEI_Translator import ParsedPiece, parse_piece, translate_text
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'TestFiles')
+
+BONA = os.path.join(TEST_FILES, 'IvTrem', 'bona.mei')
+MENSURATION = [['i', 'p', 'i', 'p'], ['i', 'p', 'i', 'p'], ['i', 'i', 'i', 'p']]
+OTHER_MENSURATION = [['p', 'i', 'p', 'i']] * 3
+
+
+def normalized(mensural_text):
+    """Return the text of a Mensural-MEI document without the ids generated by the translation (e.g., of the barlines), which are new in each translation."""
+    return re.sub(r'xml:id="gen-[^"]*"', 'xml:id="gen"', mensural_text)
+
+
+class ParsedPieceTest(unittest.TestCase):
+
+    def test_same_as_file(self):
+        piece = parse_piece(BONA)
+        direct = translate_text(archives.decode_mei(archives.read_bytes(BONA)), 'ars_nova', MENSURATION)
+        self.assertEqual(normalized(piece.translate_text('ars_nova', MENSURATION)), normalized(direct))
+
+    def test_independent_translations(self):
+        piece = parse_piece(BONA)
+        first = normalized(piece.translate_text('ars_nova', MENSURATION))
+        other = normalized(piece.translate_text('ars_nova', OTHER_MENSURATION))
+        self.assertNotEqual(first, other)
+        self.assertEqual(normalized(piece.translate_text('ars_nova', MENSURATION)), first)
+        self.assertEqual(piece.number_voices, 3)
+
+    def test_original_document(self):
+        cmn_meidoc = archives.read_document(BONA)
+        original = documentToText(cmn_meidoc)
+        piece = ParsedPiece(cmn_meidoc)
+        expected = normalized(piece.translate_text('ars_nova', MENSURATION))
+        # The translations don't change the original document
+        self.assertEqual(documentToText(cmn_meidoc), original)
+        # and the changes made to the original document afterwards don't change the translations
+        for note in cmn_meidoc.getElementsByName('note'):
+            note.addAttribute('dur', 'breve')
+        self.assertEqual(normalized(piece.translate_text('ars_nova', MENSURATION)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
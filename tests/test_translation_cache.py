@@ -0,0 +1,58 @@
+"""
+Check that the version of the rules of the translation cache (translation_cache.RULE_MODULES) covers all the modules of the repository on the translation path:
+the modules imported, directly or not, by the modules that translate the pieces of the batch mode.
+
+Run from the root of the repository:
+
+    python -m pytest tests
+"""
+import ast
+import os
+import unittest
+
+import translation_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def local_imports(name):
+    """Return the set of the modules of the repository imported by the module (at its top level)."""
+    with open(os.path.join(ROOT, name + '.py')) as source_file:
+        tree = ast.parse(source_file.read())
+    names = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module is not None:
+            names.add(node.module)
+    return set(name for name in names if os.path.exists(os.path.join(ROOT, name + '.py')))
+
+
+def translation_modules():
+    """Return the set of the modules of the repository imported, directly or not, by MEI_Translator and incremental (see batch.translate_piece)."""
+    modules = set()
+    pending = ['MEI_Translator', 'incremental']
+    while pending:
+        name = pending.pop()
+        if name not in modules:
+            modules.add(name)
+            pending.extend(local_imports(name))
+    # The cache itself only stores the entries
+    modules.discard('translation_cache')
+    return modules
+
+
+class RuleVersionTest(unittest.TestCase):
+
+    def test_rule_modules(self):
+        missing = translation_modules() - set(translation_cache.RULE_MODULES)
+        self.assertEqual(missing, set(), "Modules on the translation path missing from translation_cache.RULE_MODULES")
+
+    def test_rule_version(self):
+        version = translation_cache.rule_version()
+        self.assertEqual(len(version), 40)
+        self.assertEqual(version, translation_cache.rule_version())
+
+
+if __name__ == '__main__':
+    unittest.main()
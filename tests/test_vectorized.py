@@ -0,0 +1,86 @@
+"""
+Check that the vectorized classification of the notes (vectorized module, MensuralTranslation with vectorized_mode=True) gives exactly the same result
+as the reference implementation of the arsnova and white_notation modules: the same Mensural-MEI document and the same messages,
+for all the mensurations of the pieces of TestFiles, and for pieces with tied notes whose duration is out of range (which take the @dur of the previous note).
+
+Run from the root of the repository:
+
+    python -m pytest tests
+"""
+from contextlib import redirect_stdout
+from itertools import product
+import io
+import os
+import re
+import unittest
+
+from pymei import documentToText
+
+import archives
+import vectorized
+from MEI_Translator import MensuralTranslation
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'TestFiles')
+
+PIECES = [os.path.join(TEST_FILES, 'IvTrem', 'bona.mei'), os.path.join(TEST_FILES, 'IvTrem', 'zodiacum.mei')]
+
+# All the mensurations of a voice: modus maior, modus minor, tempus and prolatio, each perfect or imperfect
+MENSURATIONS = [list(values) for values in product('pi', repeat=4)]
+
+
+def stale_ties_document(path):
+    """Return the document of a piece in which the notes of every third tie last 1000000p, so that the duration of the tied notes is longer than a maxima (out of range).
+    The ties that start a voice are left as they are, as the first note of a voice has no previous note to take its @dur from.
+    """
+    meidoc = archives.read_document(path)
+    # The first note of each voice (<staff> @n)
+    first_notes = {}
+    for note in meidoc.getElementsByName('note'):
+        staff = note.getParent()
+        while staff.name != 'staff':
+            staff = staff.getParent()
+        first_notes.setdefault(staff.getAttribute('n').value, note.id)
+    for tie in meidoc.getElementsByName('tie')[::3]:
+        if tie.getAttribute('startid').value[1:] in first_notes.values():
+            continue
+        for reference in ('startid', 'endid'):
+            meidoc.getElementById(tie.getAttribute(reference).value[1:]).addAttribute('dur.ges', '1000000p')
+    return meidoc
+
+
+def translation_result(meidoc, style, mensuration, vectorized_mode):
+    """Translate the document, and return the text of the Mensural-MEI document (without the ids generated by the translation) and the messages."""
+    messages = io.StringIO()
+    with redirect_stdout(messages):
+        mensural_text = documentToText(MensuralTranslation(meidoc, style, mensuration, vectorized_mode))
+    return re.sub(r'xml:id="gen-[^"]*"', 'xml:id="gen"', mensural_text), messages.getvalue()
+
+
+@unittest.skipUnless(vectorized.available, "NumPy is not installed")
+class VectorizedClassificationTest(unittest.TestCase):
+
+    def check_style(self, style, read_document=archives.read_document):
+        for path in PIECES:
+            number_voices = len(read_document(path).getElementsByName('staffDef'))
+            for values in MENSURATIONS:
+                mensuration = [values] * number_voices
+                reference = translation_result(read_document(path), style, mensuration, False)
+                self.assertEqual(translation_result(read_document(path), style, mensuration, True), reference,
+                                 "%s (%s, %s): different result with the vectorized classification" % (path, style, ' '.join(values)))
+
+    def test_ars_nova(self):
+        self.check_style('ars_nova')
+
+    def test_white_mensural(self):
+        self.check_style('white_mensural')
+
+    def test_stale_ties(self):
+        # The tied notes out of range are left to the reference implementation, with the note that precedes them
+        reference = translation_result(stale_ties_document(PIECES[0]), 'ars_nova', [['i', 'p', 'i', 'p']] * 3, False)
+        self.assertIn("Weird", reference[1])
+        for style in ['ars_nova', 'white_mensural']:
+            self.check_style(style, stale_ties_document)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Check that classifying the voices in a pool of processes (see the voice_classification module) gives exactly the same result as classifying them one after the other:
+the same Mensural-MEI document, the same messages and the same diagnostics, on the pieces of TestFiles.
+
+Run from the root of the repository:
+
+    python -m pytest tests
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import io
+import os
+import unittest
+
+import archives
+import batch
+import voice_classification
+from MEI_Translator import MensuralTranslation
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'TestFiles')
+
+
+def translated_pieces():
+    """Return the list of (path, style, mensuration) of the pieces of the manifest of TestFiles, and of the same pieces with other mensurations and styles."""
+    pieces = [(piece['piece'], piece['style'], piece['mensuration']) for piece in batch.read_manifest(os.path.join(TEST_FILES, 'pieces.csv'))]
+    pieces.append((os.path.join(TEST_FILES, 'Fauv', 'adesto.mei'), 'ars_antiqua', [['3', 'p']] * 3))
+    pieces.append((os.path.join(TEST_FILES, 'Fauv', 'qui_secuntur.mei'), 'ars_antiqua', [['3', 'i']] * 3))
+    pieces.append((os.path.join(TEST_FILES, 'IvTrem', 'bona.mei'), 'white_mensural', [['i', 'p', 'i', 'p'], ['i', 'p', 'i', 'p'], ['i', 'i', 'i', 'p']]))
+    pieces.append((os.path.join(TEST_FILES, 'IvTrem', 'zodiacum.mei'), 'white_mensural', [['p', 'i', 'p', 'i']] * 3))
+    return pieces
+
+
+def odd_semibreves_document(path):
+    """Return the document of an Ars Antiqua piece in which every seventh semibreve is turned into a breve, so that there are sequences of semibreves that can't be paired."""
+    meidoc = archives.read_document(path)
+    semibreves = [note for note in meidoc.getElementsByName('note') if note.hasAttribute('dur') and note.getAttribute('dur').value == '1']
+    for note in semibreves[::7]:
+        note.addAttribute('dur', 'breve')
+        note.addAttribute('dur.ges', '2048p')
+    return meidoc
+
+
+def translation_result(path, style, mensuration, processes, read_document=archives.read_document):
+    """Translate the piece, and return the content of each voice (the name, id and attributes of each of its elements), the messages and the diagnostics."""
+    messages = io.StringIO()
+    with redirect_stdout(messages):
+        translation = MensuralTranslation(read_document(path), style, mensuration, processes=processes)
+    voices = []
+    for layer in translation.getElementsByName('layer'):
+        # The ids of the elements created by the translation (e.g., the barlines) are new in each translation
+        voices.append([(element.name, element.id if element.name in ('note', 'rest') else None,
+                        sorted((attribute.name, attribute.value) for attribute in element.getAttributes()))
+                       for element in layer.getChildren()])
+    diagnostics = [(sequence.start, sequence.end, sequence.number_sb,
+                    None if sequence.start_element is None else sequence.start_element.id, sequence.end_element.id)
+                   for sequence in translation.semibreve_diagnostics]
+    return voices, messages.getvalue(), diagnostics
+
+
+class ParallelClassificationTest(unittest.TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        voice_classification.close_pools()
+
+    def check_pieces(self, processes):
+        for path, style, mensuration in translated_pieces():
+            serial = translation_result(path, style, mensuration, None)
+            parallel = translation_result(path, style, mensuration, processes)
+            self.assertEqual(serial[0], parallel[0], "Different translation of " + path + " (" + style + ")")
+            self.assertEqual(serial[1], parallel[1], "Different messages for " + path + " (" + style + ")")
+            self.assertEqual(serial[2], parallel[2], "Different diagnostics for " + path + " (" + style + ")")
+        # Pieces with diagnostics (sequences of semibreves that can't be paired)
+        for name in ['adesto.mei', 'qui_secuntur.mei']:
+            path = os.path.join(TEST_FILES, 'Fauv', name)
+            serial = translation_result(path, 'ars_antiqua', [['3', 'p']] * 3, None, odd_semibreves_document)
+            parallel = translation_result(path, 'ars_antiqua', [['3', 'p']] * 3, processes, odd_semibreves_document)
+            self.assertTrue(serial[2])
+            self.assertEqual(serial, parallel, "Different result for " + path + " with odd sequences of semibreves")
+
+    def test_shared_pool(self):
+        self.check_pieces(2)
+        # The translations use the same pool
+        self.assertIs(voice_classification.shared_pool(2), voice_classification.shared_pool(2))
+
+    def test_executor(self):
+        with ProcessPoolExecutor(2) as executor:
+            self.check_pieces(executor)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Check the workers of WorkerPool.call (worker_pool module), used by the serve mode: they are replaced when they die, fail or overrun the timeout,
+so a worker that is lost doesn't make the next items fail.
+
+Run from the root of the repository:
+
+    python -m pytest tests
+"""
+import os
+import signal
+import time
+import unittest
+
+from worker_pool import WorkerError, WorkerPool
+
+
+def stubborn_sleep(seconds):
+    """Sleep, ignoring the TimeoutError of the worker (as a translation stuck in libmei would), so that the worker has to be killed."""
+    end = time.time() + seconds
+    while time.time() < end:
+        try:
+            time.sleep(end - time.time())
+        except (TimeoutError, ValueError):
+            pass
+    return seconds
+
+
+class WorkerPoolCallTest(unittest.TestCase):
+
+    def test_dead_idle_worker(self):
+        pool = WorkerPool(abs, 1)
+        pool.start()
+        try:
+            os.kill(pool.idle[0].process.pid, signal.SIGKILL)
+            pool.idle[0].process.join()
+            self.assertEqual([pool.call(-number) for number in range(3)], [0, 1, 2])
+        finally:
+            pool.close()
+
+    def test_failure(self):
+        pool = WorkerPool(abs, 1)
+        try:
+            with self.assertRaises(WorkerError) as context:
+                pool.call('not a number')
+            self.assertIn('TypeError', str(context.exception))
+            self.assertEqual(pool.call(-3), 3)
+        finally:
+            pool.close()
+
+    def test_timeout(self):
+        pool = WorkerPool(stubborn_sleep, 1, timeout=0.5, grace=0.5)
+        try:
+            start = time.time()
+            with self.assertRaises(TimeoutError):
+                pool.call(30)
+            self.assertLess(time.time() - start, 10)
+            # The killed worker was replaced
+            self.assertEqual(pool.call(0), 0)
+        finally:
+            pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+"""
+translation_cache module
+
+Contains a persistent, content-addressed cache of the translations, shared by the runs (and by the worker processes) of the batch mode:
+
+    python MEI_Translator.py batch manifest.csv --jobs 4 --cache ~/.cache/mei_translator --cache-size 1024
+
+The translation of a piece only depends on the content of its file, its style, its mensuration and the rules of the translator,
+so each translation is stored under the SHA-1 of these four things (see cache_key), with the Mensural-MEI document and the messages printed by the translation.
+When a corpus is translated again after a few pieces were edited, only these pieces are translated, and the outputs of the others come from the cache.
+
+The version of the rules is the SHA-1 of the source of the modules of the translator (see RULE_MODULES), so editing any of them invalidates the whole cache:
+the entries of each version are kept in their own subdirectory, and the entries of the old versions are the first ones removed by the eviction.
+The cache is bounded: when it grows beyond its maximum size, the entries that were used least recently (by modification time, which is updated on every hit) are removed.
+Several processes can use the same cache at the same time: the entries are written atomically (to a temporary file that is then renamed),
+an entry removed by another process is just a miss, and only one process evicts entries at a time.
+
+Functions:
+rule_version -- Return the version (SHA-1 of the source) of the rules of the translator
+cache_key -- Return the key of the translation of a piece in the cache
+open_cache -- Return the TranslationCache of a directory, shared by all the pieces translated in the process
+
+Classes:
+TranslationCache -- Directory with the translations of the pieces, by key, with a maximum size
+"""
+import hashlib
+import importlib
+import json
+import os
+
+import archives
+
+try:
+    import fcntl
+except ImportError:
+    # The eviction is not locked on this platform (e.g., Windows): concurrent evictions only remove a few more entries
+    fcntl = None
+
+# Modules whose source defines the rules of the translation, or is on the path from the CMN-MEI file to the cached entry:
+# the modules imported by MEI_Translator (including the decoding of the files), the incremental translation,
+# and the batch module, which translates the pieces and captures their messages
+RULE_MODULES = ('MEI_Translator', 'document_index', 'element_records', 'voice_classification', 'layer_builder', 'mensural_attributes',
+                'imperfection', 'white_notation', 'arsnova', 'arsantiqua', 'vectorized', 'incremental', 'archives', 'batch')
+
+# Default maximum size of the cache (bytes)
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# When the cache is too big, entries are removed until it is back to this fraction of its maximum size (so it isn't evicted again on every new entry)
+_EVICTION_TARGET = 0.9
+
+_rule_version = None
+_open_caches = {}
+
+
+def rule_version():
+    """Return the version of the rules of the translator: the SHA-1 (hexadecimal string) of the source files of the modules in RULE_MODULES."""
+    global _rule_version
+    if _rule_version is None:
+        sha1 = hashlib.sha1()
+        for name in RULE_MODULES:
+            path = importlib.import_module(name).__file__
+            if path.endswith('.pyc'):
+                path = path[:-1]
+            sha1.update(name.encode('utf-8') + b'\n')
+            with open(path, 'rb') as source_file:
+                sha1.update(source_file.read())
+        _rule_version = sha1.hexdigest()
+    return _rule_version
+
+
+def cache_key(input_data, style, mensuration, version=None):
+    """Return the key (hexadecimal string) of the translation of a piece: the SHA-1 of its content, its style, its mensuration and the version of the rules.
+
+    Arguments:
+    input_data -- content (bytes) of the CMN-MEI file of the piece
+    style -- 'ars_antiqua', 'ars_nova' or 'white_mensural'
+    mensuration -- list with the list of values of each voice (see batch.check_mensuration)
+    version -- version of the rules (default None: see rule_version)
+    """
+    description = hashlib.sha1(input_data).hexdigest() + '\n' + style + '\n' + json.dumps(mensuration) + '\n' + (version or rule_version())
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+
+class TranslationCache(object):
+    """Directory with the translations of the pieces (the Mensural-MEI document and the messages of each translation), by key (see cache_key), with a maximum size.
+
+    The entries are stored as <directory>/<version>/<first two characters of the key>/<key>.json, where the version is the beginning of the version of the rules.
+
+    Methods:
+    get -- Return the translation stored under a key, or None
+    put -- Store a translation under a key
+    evict -- Remove the entries of old versions of the rules, and the least recently used entries, until the cache fits in its maximum size
+
+    Attributes:
+    hits, misses -- number of calls to get that found (or didn't find) the translation in this process
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, version=None):
+        """
+        Arguments:
+        directory -- directory of the cache (created if it doesn't exist)
+        max_bytes -- maximum size of the entries of the cache, in bytes (default 1 GB)
+        version -- version of the rules (default None: see rule_version)
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.version = version or rule_version()
+        self.version_directory = os.path.join(self.directory, self.version[:16])
+        if not os.path.isdir(self.version_directory):
+            os.makedirs(self.version_directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        # Estimate of the size of the cache (the entries written by the other processes are only counted by the next eviction)
+        self.size = None
+
+    def _path(self, key):
+        return os.path.join(self.version_directory, key[:2], key + '.json')
+
+    def get(self, key):
+        """Return the tuple (Mensural-MEI text, messages) stored under the key, or None if the cache doesn't have it (marking the entry as recently used).
+
+        Arguments:
+        key -- key of the translation (see cache_key)
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as entry_file:
+                entry = json.load(entry_file)
+            os.utime(path)
+        except (IOError, OSError, ValueError):
+            # Missing (or removed by another process in the meantime), or written by an older version of this module
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['mei'], entry['messages']
+
+    def put(self, key, mensural_text, messages):
+        """Store a translation under the key, and evict entries if the cache is now bigger than its maximum size.
+
+        Arguments:
+        key -- key of the translation (see cache_key)
+        mensural_text -- text of the Mensural-MEI document
+        messages -- what the translation printed
+        """
+        data = json.dumps({'mei': mensural_text, 'messages': messages, 'rule_version': self.version}).encode('utf-8')
+        archives.write_bytes(data, self._path(key))
+        if self.size is None:
+            self.size = self._total_size()
+        else:
+            self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """Return the list of (modification time, size, path, current version) of the entries of the cache."""
+        entries = []
+        for directory, subdirectories, files in os.walk(self.directory):
+            current = directory == self.version_directory or os.path.dirname(directory) == self.version_directory
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    status = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((status.st_mtime, status.st_size, path, current))
+        return entries
+
+    def _total_size(self):
+        return sum(entry[1] for entry in self._entries())
+
+    def evict(self):
+        """Remove the entries of the old versions of the rules, and then the least recently used entries until the cache fits in its maximum size.
+        Return the number of entries removed (0 if another process is evicting entries at the same time).
+        """
+        lock_file = open(os.path.join(self.directory, '.lock'), 'a')
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except (IOError, OSError):
+                    # Another process is evicting entries
+                    return 0
+            entries = self._entries()
+            size = sum(entry[1] for entry in entries)
+            # The entries of the old versions go first, and then the least recently used ones
+            entries.sort(key=lambda entry: (entry[3], entry[0]))
+            removed = 0
+            for modified, entry_size, path, current in entries:
+                if current and size <= self.max_bytes * _EVICTION_TARGET:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                size -= entry_size
+                removed += 1
+            # The directories of the old versions that are now empty
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if path != self.version_directory and os.path.isdir(path):
+                    for directory, subdirectories, files in os.walk(path, topdown=False):
+                        try:
+                            os.rmdir(directory)
+                        except OSError:
+                            pass
+            self.size = size
+            return removed
+        finally:
+            lock_file.close()
+
+
+def open_cache(directory, max_bytes=None):
+    """Return the TranslationCache of the directory, created the first time and then shared by all the pieces translated in the process.
+
+    Arguments:
+    directory -- directory of the cache
+    max_bytes -- maximum size of the cache, in bytes (default None: DEFAULT_MAX_BYTES)
+    """
+    key = (os.path.abspath(directory), max_bytes)
+    if key not in _open_caches:
+        _open_caches[key] = TranslationCache(directory, max_bytes or DEFAULT_MAX_BYTES)
+    return _open_caches[key]
@@ -0,0 +1,204 @@
+"""
+vectorized module
+
+Contains an optional NumPy backend for the classification of the notes of the arsnova and white_notation modules, meant for the translation of large corpora.
+The @dur, @dur.ges and articulation of all the notes of a voice are packed into arrays, and the notes are classified with vectorized comparisons
+against the decision table (arsnova) or duration table (white_notation) of the mensuration of the voice. The results are scattered back to the notes at the end.
+
+The pure-Python noterest_to_mensural functions remain the reference implementation: the notes that the vectorized classification doesn't settle
+(tied notes out of range and the notes that precede them, notes with an inappropriate duration, and any other note that would produce a message)
+and all the rests are passed to them, so the result of the translation (and its messages) is the same with both backends.
+
+NumPy is an optional dependency: if it is not installed, 'available' is False and the functions of this module can't be used.
+
+Functions:
+arsnova_noterest_to_mensural -- Vectorized version of arsnova.noterest_to_mensural
+white_noterest_to_mensural -- Vectorized version of white_notation.noterest_to_mensural
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import arsnova
+import white_notation
+from mensural_attributes import NOTE_ATTRIBUTES, remove_non_mensural_attributes
+
+# True when NumPy is installed (and the vectorized backend can be used)
+available = numpy is not None
+
+
+def _pack(notes, codes):
+    """Pack the attributes of the notes of a voice into arrays and return them: (@dur codes, @dur.ges values, alteration flags).
+
+    The @dur values are encoded with the dictionary 'codes' (@dur -> integer), any other value gets the code -1.
+    The notes without a readable @dur.ges also get the code -1 (and the value 0), so they are left to the reference implementation.
+
+    Arguments:
+    notes -- list of the ElementRecords of the <note> elements of the voice
+    codes -- dictionary that maps the @dur values to integer codes
+    """
+    dur_codes = []
+    durges_values = []
+    stop_flags = []
+    for note in notes:
+        code = codes.get(note.get('dur'), -1)
+        durges = note.get('dur.ges')
+        try:
+            durges_num = int(durges[:-1])
+        except (TypeError, ValueError):
+            code, durges_num = -1, 0
+        dur_codes.append(code)
+        durges_values.append(durges_num)
+        stop_flags.append(note.get('artic') == 'stop')
+    return numpy.array(dur_codes, dtype=numpy.int64), numpy.array(durges_values, dtype=numpy.int64), numpy.array(stop_flags, dtype=bool)
+
+
+def _match(dur_codes, durges, stop, codes, table_notes):
+    """Return a list with the outcome (mensural @dur, @quality, @num, @numbase) of each note, or None for the notes that are not in the table.
+
+    Arguments:
+    dur_codes, durges, stop -- arrays with the @dur codes, @dur.ges values and alteration flags of the notes (see _pack)
+    codes -- dictionary that maps the @dur values to integer codes
+    table_notes -- dictionary that maps (CMN @dur, performed duration) to the pair of outcomes (plain, altered) of the note (see arsnova.DecisionTable)
+    """
+    outcomes = [None] * len(dur_codes)
+    for (dur, durges_num), (plain, altered) in table_notes.items():
+        matches = (dur_codes == codes[dur]) & (durges == durges_num)
+        if altered is plain:
+            for index in numpy.flatnonzero(matches):
+                outcomes[index] = plain
+        else:
+            altered_matches = matches & stop
+            for index in numpy.flatnonzero(matches & ~altered_matches):
+                outcomes[index] = plain
+            for index in numpy.flatnonzero(altered_matches):
+                outcomes[index] = altered
+    return outcomes
+
+
+def _fallback(outcomes, stale):
+    """Return a list of flags that tell which notes have to be classified by the reference implementation.
+
+    These are the notes without an outcome, and the note that precedes each 'stale' note:
+    a tied note whose duration is out of range keeps the mensural @dur given to the previous note by the reference implementation,
+    so the previous note has to be classified there too (right before it).
+
+    Arguments:
+    outcomes -- list with the outcome of each note, or None (see _match)
+    stale -- array of flags that indicate the tied notes whose duration is out of range
+    """
+    fallback = [outcome is None for outcome in outcomes]
+    for index in range(len(outcomes) - 1, 0, -1):
+        if fallback[index] and stale[index]:
+            fallback[index - 1] = True
+    return fallback
+
+
+def _scatter(note, outcome):
+    """Write the outcome (mensural @dur, @quality, @num, @numbase) of a note to its record."""
+    mens_dur, quality, num, numbase = outcome
+    if quality is not None:
+        note.set('quality', quality)
+    if num is not None:
+        note.set('num', num)
+        note.set('numbase', numbase)
+    note.set('dur', mens_dur)
+
+
+def arsnova_noterest_to_mensural(notes, rests, modusmaior, modusminor, tempus, prolatio, triplet_of_minims_flag):
+    """
+    Vectorized version of arsnova.noterest_to_mensural, with the same arguments and the same result.
+
+    Arguments:
+    notes -- list of the ElementRecords (see the element_records module) of all the <note> elements from a particular voice
+    rests -- list of the ElementRecords of all the <rest> elements from a particular voice
+    modusmaior, modusminor, tempus, prolatio -- integer values (3 or 2) that give the mensuration of the voice
+    triplet_of_minims -- boolean flag that indicates the presence of a 'triplet of minims' in the piece (all voices)
+    """
+    table = arsnova.decision_table(triplet_of_minims_flag, modusmaior, modusminor, tempus, prolatio)
+    durs = ['TiedNote!', 'maxima', 'long', 'breve', '1', '2']
+    codes = dict((dur, code) for code, dur in enumerate(durs))
+    dur_codes, durges, stop = _pack(notes, codes)
+
+    # Tied notes: find their right (contemporary) duration from the ranges of the decision table
+    tied = dur_codes == codes['TiedNote!']
+    if tied.any() and table.tied_lows:
+        tied_durs = numpy.array([codes[dur] for dur in table.tied_durs], dtype=numpy.int64)
+        position = numpy.searchsorted(numpy.array(table.tied_lows), durges, side='right') - 1
+        in_range = tied & (position >= 0)
+        in_range &= durges <= numpy.array(table.tied_highs)[numpy.clip(position, 0, None)]
+        dur_codes[in_range] = tied_durs[position[in_range]]
+    stale = dur_codes == codes['TiedNote!']
+
+    outcomes = _match(dur_codes, durges, stop, codes, table.notes)
+    # Minims (they are not in the decision table)
+    for index in numpy.flatnonzero(dur_codes == codes['2']):
+        outcomes[index] = ('minima', None, None, None)
+
+    # Scatter the results back to the notes, the rest of the notes are classified by the reference implementation
+    remaining = []
+    for note, outcome, fallback in zip(notes, outcomes, _fallback(outcomes, stale)):
+        if fallback:
+            remaining.append(note)
+        else:
+            _scatter(note, outcome)
+            remove_non_mensural_attributes(note, NOTE_ATTRIBUTES)
+    arsnova.noterest_to_mensural(remaining, rests, modusmaior, modusminor, tempus, prolatio, triplet_of_minims_flag)
+
+
+def white_noterest_to_mensural(notes, rests, modusmaior, modusminor, tempus, prolatio, triplet_of_minims_flag):
+    """
+    Vectorized version of white_notation.noterest_to_mensural, with the same arguments and the same result.
+
+    Arguments:
+    notes -- list of the ElementRecords (see the element_records module) of all the <note> elements from a particular voice
+    rests -- list of the ElementRecords of all the <rest> elements from a particular voice
+    modusmaior, modusminor, tempus, prolatio -- integer values (3 or 2) that give the mensuration of the voice
+    triplet_of_minims -- boolean flag that indicates the presence of a 'triplet of minims' in the piece (all voices)
+    """
+    table = white_notation.duration_table(triplet_of_minims_flag, modusmaior, modusminor, tempus, prolatio)
+    durs = ['TiedNote!', 'maxima', 'long', 'breve', '1'] + sorted(white_notation.SMALLER_NOTES)
+    codes = dict((dur, code) for code, dur in enumerate(durs))
+    dur_codes, durges, stop = _pack(notes, codes)
+    ticks = durges * white_notation.TICKS
+
+    # Tied notes: find their right (contemporary) duration from the ranges of the duration table
+    tied = dur_codes == codes['TiedNote!']
+    if tied.any():
+        tied_durs = numpy.array([codes[dur] for dur in table.tied_durs], dtype=numpy.int64)
+        position = numpy.searchsorted(numpy.array(table.tied_highs), ticks, side='left')
+        in_range = tied & (ticks >= table.tied_low) & (position < len(tied_durs))
+        dur_codes[in_range] = tied_durs[position[in_range]]
+    stale = dur_codes == codes['TiedNote!']
+
+    outcomes = _match(dur_codes, durges, stop, codes, table.notes)
+    colored = numpy.array([note.has('color') for note in notes], dtype=bool)
+    # Colored maximas, longas and breves (2/3 of their default value)
+    for (dur, durges_num), outcome in table.colored.items():
+        matches = (dur_codes == codes[dur]) & (durges == durges_num) & colored
+        for index in numpy.flatnonzero(matches):
+            if outcomes[index] is None:
+                outcomes[index] = outcome
+    # Notes smaller than the semibreve, which may be augmented
+    augmented = numpy.isin(ticks, numpy.array(sorted(table.augmented), dtype=numpy.int64))
+    for dur, mens_dur in white_notation.SMALLER_NOTES.items():
+        matches = dur_codes == codes[dur]
+        for index in numpy.flatnonzero(matches & ~augmented):
+            outcomes[index] = (mens_dur, None, None, None)
+        for index in numpy.flatnonzero(matches & augmented):
+            outcomes[index] = (mens_dur, 'p', '2', '3')
+
+    # Scatter the results back to the notes, the rest of the notes are classified by the reference implementation
+    remaining = []
+    for note, outcome, is_colored, fallback in zip(notes, outcomes, colored, _fallback(outcomes, stale)):
+        if fallback:
+            remaining.append(note)
+        else:
+            _scatter(note, outcome)
+            # And encode coloration if present in the note
+            if is_colored:
+                note.set('colored', 'true')
+                note.remove('color')
+            remove_non_mensural_attributes(note, NOTE_ATTRIBUTES)
+    white_notation.noterest_to_mensural(remaining, rests, modusmaior, modusminor, tempus, prolatio, triplet_of_minims_flag)
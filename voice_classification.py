@@ -0,0 +1,134 @@
+"""
+voice_classification module
+
+Contains the step of the translation that classifies the notes and rests of each voice (noterest_to_mensural, and sb_major_minor for Ars Antiqua),
+once the <section> of the Mensural-MEI document has been filled.
+This step only depends on the records of the voice (see the element_records module), on the mensuration of the voice and on the piece-level triplet-of-minims flag,
+so the voices can be classified one after the other, or concurrently in a pool of processes.
+Both ways give exactly the same result: the classified records, the messages (printed in the order of the voices) and the diagnostics.
+The pool is started once and shared by all the translations of the process (see shared_pool), or given by the caller (a multiprocessing.Pool or a concurrent.futures executor),
+so the translations don't pay for starting the processes.
+
+Functions:
+classify_voice -- Classify the notes and rests of one voice, and return its semibreve diagnostics
+classify_voices -- Classify the notes and rests of all the voices (serially, or in a pool of processes), and return their semibreve diagnostics
+shared_pool -- Return the pool of processes shared by the translations of the process
+close_pools -- Stop the shared pools of processes
+"""
+import io
+import sys
+import threading
+from contextlib import redirect_stdout
+from multiprocessing import Pool
+
+import white_notation
+import arsnova
+import arsantiqua
+import vectorized
+
+
+# Shared pools of processes, by number of processes (see shared_pool)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def shared_pool(processes):
+    """Return the multiprocessing.Pool of 'processes' processes shared by all the translations of the process (started the first time it is needed).
+
+    Arguments:
+    processes -- number of worker processes
+    """
+    with _pools_lock:
+        if processes not in _pools:
+            _pools[processes] = Pool(processes)
+        return _pools[processes]
+
+
+def close_pools():
+    """Stop the shared pools of processes (they are started again if another translation needs them)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+            pool.join()
+        _pools.clear()
+
+
+def classify_voice(ars_type, records, arguments, vectorized_mode=False):
+    """Classify the notes and rests of one voice, on its records, and return the list of sequences of semibreves that couldn't be paired (see arsantiqua.sb_major_minor).
+
+    Arguments:
+    ars_type -- string that indicates the style of the piece: 'ars_antiqua', 'ars_nova' or 'white_mensural'
+    records -- the VoiceRecords of the voice
+    arguments -- tuple with the arguments that give the mensuration of the voice.
+    For Ars Nova and White Mensural: (modusmaior, modusminor, tempus, prolatio, triplet_of_minims_flag).
+    For Ars Antiqua: (modusminor, pair_semibreves), where pair_semibreves is a boolean flag that indicates that the semibreves have to be grouped into minor-major pairs (tempus = 3).
+    vectorized_mode -- boolean flag to classify the notes of Ars Nova and White Mensural pieces with the vectorized module (default False)
+    """
+    if ars_type == "white_mensural":
+        if vectorized_mode:
+            vectorized.white_noterest_to_mensural(records.notes, records.rests, *arguments)
+        else:
+            white_notation.noterest_to_mensural(records.notes, records.rests, *arguments)
+    elif ars_type == "ars_nova":
+        if vectorized_mode:
+            vectorized.arsnova_noterest_to_mensural(records.notes, records.rests, *arguments)
+        else:
+            arsnova.noterest_to_mensural(records.notes, records.rests, *arguments)
+    else:
+        modusminor, pair_semibreves = arguments
+        arsantiqua.noterest_to_mensural(records.notes, records.rests, modusminor)
+        if pair_semibreves:
+            return arsantiqua.sb_major_minor(records.elements)
+    return []
+
+
+def _classify_detached(task):
+    """Classify a detached voice in a worker process.
+
+    Return the classified records, the messages printed during the classification, and the (start, end, number_sb) of each sequence of semibreves that couldn't be paired.
+
+    Arguments:
+    task -- tuple (ars_type, detached records, arguments, vectorized_mode), see classify_voice
+    """
+    ars_type, records, arguments, vectorized_mode = task
+    output = io.StringIO()
+    with redirect_stdout(output):
+        diagnostics = classify_voice(ars_type, records, arguments, vectorized_mode)
+    return records, output.getvalue(), [(sequence.start, sequence.end, sequence.number_sb) for sequence in diagnostics]
+
+
+def classify_voices(ars_type, voice_tasks, vectorized_mode=False, processes=None):
+    """Classify the notes and rests of all the voices, and return the list of sequences of semibreves that couldn't be paired (for all the voices, in order).
+
+    The changes are made on the records of the voices, and they still have to be written back to the document.
+    With 'processes' larger than 1 (or a pool), the voices are detached from the document (see element_records.VoiceRecords.detach) and classified concurrently in a pool of processes;
+    their records are then updated in the order of the voices, and the messages of each voice are printed in that order too, so the result is the same as classifying them one after the other.
+
+    Arguments:
+    ars_type -- string that indicates the style of the piece: 'ars_antiqua', 'ars_nova' or 'white_mensural'
+    voice_tasks -- list of tuples (records, arguments), one for each voice (see classify_voice)
+    vectorized_mode -- boolean flag to classify the notes of Ars Nova and White Mensural pieces with the vectorized module (default False)
+    processes -- number of worker processes of the shared pool (see shared_pool), or a pool given by the caller: a multiprocessing.Pool or a concurrent.futures executor
+    (default None: the voices are classified in this process, one after the other)
+    """
+    diagnostics = []
+    if isinstance(processes, int):
+        serial = processes < 2
+    else:
+        serial = processes is None
+    if serial or len(voice_tasks) < 2:
+        for records, arguments in voice_tasks:
+            diagnostics.extend(classify_voice(ars_type, records, arguments, vectorized_mode))
+        return diagnostics
+
+    tasks = [(ars_type, records.detach(), arguments, vectorized_mode) for records, arguments in voice_tasks]
+    pool = shared_pool(processes) if isinstance(processes, int) else processes
+    results = list(pool.map(_classify_detached, tasks))
+
+    for (records, arguments), (classified, output, sequences) in zip(voice_tasks, results):
+        records.update(classified)
+        sys.stdout.write(output)
+        for start, end, number_sb in sequences:
+            start_element = records.elements[start] if start >= 0 else None
+            diagnostics.append(arsantiqua.OddSemibreveSequence(start, end, start_element, records.elements[end], number_sb))
+    return diagnostics
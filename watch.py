@@ -0,0 +1,346 @@
+"""
+watch module
+
+Watch mode: keep the Mensural-MEI translations of a directory tree up to date while the pieces are edited (e.g., exported again from Sibelius):
+
+    python MEI_Translator.py watch TranscriptionsDir
+
+Each directory of the tree lists its pieces, with their style and mensuration, in a mensuration manifest ('mensuration.csv' by default,
+with the format of the CSV manifests of the batch mode, and the paths relative to the directory).
+When the watch mode starts, it translates the pieces whose translation is missing or out of date; afterwards, every time a piece (or a manifest) is saved,
+it waits until the writes stop for a moment (the debounce time), and translates again the pieces whose content (or mensuration) changed
+(with --incremental, only the measures of these pieces that changed are translated again, see the incremental module).
+The pieces that didn't change are not translated again: the translations are recorded in a journal (see the journal module) in the root of the tree.
+Each translation is printed and added to a status log ('translation-status.log' in the root of the tree, by default).
+The translations run in a worker process (see worker_pool.WorkerPool), under a timeout and a memory ceiling, so a malformed or hanging export only fails by itself,
+and the watch mode goes on with the other pieces.
+
+The changes are detected with inotify on Linux, and by polling the pieces and manifests (every 'interval' seconds) on other platforms, or with --poll.
+
+Functions:
+find_manifests -- Return the mensuration manifests of a directory tree
+main -- Command line interface of the watch mode
+
+Classes:
+InotifyEvents -- Changes of the files of a directory tree, from inotify
+PollingEvents -- Changes of the files of a directory tree, by polling them
+Watcher -- State of the watch mode: the manifests and pieces of the tree, and their translations
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import signal
+import struct
+import time
+
+import batch
+import journal
+import shards
+from worker_pool import WorkerError, WorkerPool
+
+# inotify events (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Returned by the events when all the files have to be checked again (e.g., when inotify lost events)
+RESCAN = object()
+
+
+def find_manifests(root, manifest_name):
+    """Return the list of paths of the mensuration manifests (files called 'manifest_name') in the directory tree.
+
+    Arguments:
+    root -- root directory of the tree
+    manifest_name -- name of the manifests (e.g., 'mensuration.csv')
+    """
+    manifests = []
+    for directory, subdirectories, files in os.walk(root):
+        if manifest_name in files:
+            manifests.append(os.path.join(directory, manifest_name))
+    return sorted(manifests)
+
+
+class InotifyEvents(object):
+    """Changes of the files of a directory tree, from inotify (Linux). Raise OSError if inotify is not available.
+
+    Methods:
+    wait -- Wait for changes, and return the set of paths that changed
+    """
+
+    def __init__(self, root):
+        """
+        Arguments:
+        root -- root directory of the tree
+        """
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        try:
+            self.add_watch = libc.inotify_add_watch
+            self.descriptor = libc.inotify_init1(0)
+        except AttributeError:
+            raise OSError("inotify is not available on this platform.")
+        if self.descriptor < 0:
+            raise OSError(ctypes.get_errno(), "inotify couldn't be started.")
+        self.directories = {}
+        for directory, subdirectories, files in os.walk(root):
+            self._watch(directory)
+
+    def _watch(self, directory):
+        watch = self.add_watch(self.descriptor, os.fsencode(directory), _WATCH_MASK)
+        if watch >= 0:
+            self.directories[watch] = directory
+
+    def wait(self, timeout):
+        """Wait at most 'timeout' seconds for changes, and return the set of paths that changed (it contains RESCAN if events were lost).
+
+        Arguments:
+        timeout -- maximum number of seconds to wait (None: wait until there is a change)
+        """
+        changed = set()
+        if not select.select([self.descriptor], [], [], timeout)[0]:
+            return changed
+        data = os.read(self.descriptor, 65536)
+        position = 0
+        while position + _EVENT_HEADER.size <= len(data):
+            watch, mask, cookie, length = _EVENT_HEADER.unpack_from(data, position)
+            position += _EVENT_HEADER.size
+            name = os.fsdecode(data[position:position + length].rstrip(b'\0'))
+            position += length
+            if mask & IN_Q_OVERFLOW:
+                changed.add(RESCAN)
+                continue
+            if watch not in self.directories:
+                continue
+            path = os.path.join(self.directories[watch], name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # A new directory: watch it too, and look for manifests in it
+                    for directory, subdirectories, files in os.walk(path):
+                        self._watch(directory)
+                    changed.add(RESCAN)
+                continue
+            changed.add(path)
+        return changed
+
+
+class PollingEvents(object):
+    """Changes of the files of a directory tree, found by comparing the modification time and size of the pieces and manifests every 'interval' seconds.
+
+    Methods:
+    wait -- Wait for changes, and return the set of paths that changed
+    """
+
+    def __init__(self, watcher, interval=0.5):
+        """
+        Arguments:
+        watcher -- the Watcher, which gives the paths to poll (see Watcher.watched_paths)
+        interval -- seconds between two polls (default 0.5)
+        """
+        self.watcher = watcher
+        self.interval = interval
+        self.signatures = self._poll()
+
+    def _poll(self):
+        signatures = {}
+        for path in self.watcher.watched_paths():
+            try:
+                status = os.stat(path)
+                signatures[path] = (status.st_mtime_ns, status.st_size)
+            except OSError:
+                signatures[path] = None
+        return signatures
+
+    def wait(self, timeout):
+        """Wait for the next poll (at most 'timeout' seconds) and return the set of paths that changed since the previous poll.
+
+        Arguments:
+        timeout -- maximum number of seconds to wait (None: wait for the next poll)
+        """
+        time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        signatures = self._poll()
+        changed = set(path for path in set(signatures) | set(self.signatures) if signatures.get(path) != self.signatures.get(path))
+        self.signatures = signatures
+        return changed
+
+
+class Watcher(object):
+    """State of the watch mode: the mensuration manifests and the pieces of the tree, and the journal of their translations.
+
+    Methods:
+    watched_paths -- Return the paths of the manifests and pieces (and the paths where new manifests could appear)
+    load -- Read all the manifests of the tree again
+    update -- Translate the pieces affected by the changes of some paths, if their content changed
+    close -- Close the journal and the status log, and stop the worker process
+    """
+
+    def __init__(self, root, manifest_name='mensuration.csv', journal_path=None, log_path=None, incremental=False, timeout=60.0, memory_limit=None):
+        """
+        Arguments:
+        root -- root directory of the tree
+        manifest_name -- name of the mensuration manifests (default 'mensuration.csv')
+        journal_path -- path of the journal of the translations (default: '.mensural-watch.journal' in the root)
+        log_path -- path of the status log (default: 'translation-status.log' in the root)
+        incremental -- translate again only the measures that changed since the previous translation of each piece (default False, see the incremental module)
+        timeout -- maximum number of seconds for the translation of a piece (default 60; None: no timeout)
+        memory_limit -- maximum memory, in bytes, of the worker process (default None: no limit)
+        """
+        self.root = os.path.abspath(root)
+        self.manifest_name = manifest_name
+        self.incremental = incremental
+        journal_path = journal_path or os.path.join(self.root, '.mensural-watch.journal')
+        self.entries = journal.read_journal(journal_path)
+        self.journal = journal.Journal(journal_path)
+        self.log = open(log_path or os.path.join(self.root, 'translation-status.log'), 'a')
+        self.pool = WorkerPool(batch.translate_piece, 1, timeout, memory_limit, recycle=100)
+        self.manifests = {}
+        self.load()
+
+    def load(self):
+        """Read all the manifests of the tree again (a manifest that can't be read is reported, and has no pieces)."""
+        self.manifests = {}
+        for manifest in find_manifests(self.root, self.manifest_name):
+            self._load_manifest(manifest)
+
+    def _load_manifest(self, manifest):
+        try:
+            self.manifests[manifest] = batch.read_manifest(manifest)
+        except Exception as error:
+            self.manifests[manifest] = []
+            self._report("ERROR  manifest " + manifest + ": " + str(error))
+
+    def watched_paths(self):
+        """Return the list of paths of the manifests and the pieces, and of the possible manifests of all the directories of the tree."""
+        paths = [os.path.join(directory, self.manifest_name) for directory, subdirectories, files in os.walk(self.root)]
+        for pieces in self.manifests.values():
+            paths.extend(piece['piece'] for piece in pieces)
+        return paths
+
+    def _report(self, line):
+        line = time.strftime("%Y-%m-%d %H:%M:%S") + "  " + line
+        print(line)
+        self.log.write(line + "\n")
+        self.log.flush()
+
+    def _translate(self, piece):
+        """Translate the piece if its content, style or mensuration changed since its last translation (or its output isn't intact)."""
+        piece = dict(piece)
+        piece['key'] = shards.piece_key(piece)
+        if journal.is_complete(piece, self.entries.get(piece['key'])):
+            return
+        if self.incremental:
+            piece['incremental'] = True
+        start = time.time()
+        try:
+            result = self.pool.call(piece)
+        except (TimeoutError, WorkerError) as error:
+            # The piece timed out, or the worker process crashed (it is replaced by a new one for the next pieces)
+            result = batch.failed_result(piece, str(error))
+            result['seconds'] = time.time() - start
+        self.journal.append(result)
+        self.entries[piece['key']] = {'status': result['status'], 'output': result['output'], 'output_sha1': result['output_sha1']}
+        line = "%-6s %7.2fs  %s" % (result['status'].upper(), result['seconds'], result['piece'])
+        if result['error'] is not None:
+            line += "\n       " + result['error'].strip().splitlines()[-1]
+        self._report(line)
+
+    def update(self, changed=RESCAN):
+        """Translate the pieces affected by the changes, if their content changed: the pieces that changed, and all the pieces of the manifests that changed.
+
+        Arguments:
+        changed -- set of paths that changed (default RESCAN: read all the manifests again, and check all the pieces)
+        """
+        if changed is RESCAN or RESCAN in changed:
+            self.load()
+            pieces = [piece for manifest in sorted(self.manifests) for piece in self.manifests[manifest]]
+        else:
+            pieces = []
+            for path in sorted(changed):
+                if os.path.basename(path) == self.manifest_name:
+                    if not os.path.exists(path):
+                        # The manifest (or its directory) was removed
+                        self.manifests.pop(path, None)
+                        continue
+                    self._load_manifest(path)
+                    pieces.extend(self.manifests[path])
+            for manifest in sorted(self.manifests):
+                pieces.extend(piece for piece in self.manifests[manifest] if piece['piece'] in changed)
+        for piece in pieces:
+            if os.path.exists(piece['piece']):
+                self._translate(piece)
+
+    def close(self):
+        """Close the journal and the status log, and stop the worker process."""
+        self.pool.close()
+        self.journal.close()
+        self.log.close()
+
+
+def _stop(signum, frame):
+    """Stop the watch mode on SIGTERM (as on Ctrl-C)."""
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt()
+
+
+def main(argv):
+    """Command line interface of the watch mode, return the exit status.
+
+    Arguments:
+    argv -- list of the command line arguments (after 'watch')
+    """
+    parser = argparse.ArgumentParser(prog='MEI_Translator.py watch', description="Watch a directory tree and translate again the pieces (listed in the mensuration manifest of each directory) whenever their content changes.")
+    parser.add_argument('directory', help="Root of the directory tree to watch.")
+    parser.add_argument('--manifest-name', default='mensuration.csv', help="Name of the mensuration manifest of each directory (default 'mensuration.csv'), a CSV file with the columns: piece, style, mensuration (see the batch module).")
+    parser.add_argument('--debounce', type=float, default=0.3, help="Seconds without changes to wait before translating a piece that was saved (default 0.3).")
+    parser.add_argument('--poll', action='store_true', help="Poll the files for changes instead of using inotify.")
+    parser.add_argument('--interval', type=float, default=0.5, help="Seconds between two polls (default 0.5).")
+    parser.add_argument('--log', help="Status log (default: translation-status.log in the watched directory).")
+    parser.add_argument('--incremental', action='store_true', help="Translate again only the measures that changed since the previous translation of each piece (see the incremental module).")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Maximum number of seconds for the translation of a piece (default 60, 0: no timeout).")
+    parser.add_argument('--memory', type=int, default=None, help="Maximum memory, in megabytes, of the worker process (default: no limit).")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.directory):
+        parser.error("The directory " + args.directory + " doesn't exist.")
+
+    watcher = Watcher(args.directory, args.manifest_name, log_path=args.log, incremental=args.incremental,
+                      timeout=args.timeout or None, memory_limit=None if args.memory is None else args.memory * 1024 * 1024)
+    events = None
+    if not args.poll:
+        try:
+            events = InotifyEvents(watcher.root)
+        except OSError as error:
+            print("inotify is not available (" + str(error) + "), polling the files instead.")
+    if events is None:
+        events = PollingEvents(watcher, args.interval)
+
+    print("Watching " + watcher.root + " (" + str(len(watcher.manifests)) + " manifests)")
+    watcher.update()
+    # Paths that changed, with the time of their last change
+    pending = {}
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, min(pending.values()) + args.debounce - time.time())
+            for path in events.wait(timeout):
+                pending[path] = time.time()
+            # The paths that haven't changed for the debounce time are ready
+            now = time.time()
+            ready = set(path for path, changed_at in pending.items() if now - changed_at >= args.debounce)
+            if ready:
+                for path in ready:
+                    del pending[path]
+                watcher.update(ready)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
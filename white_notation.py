@@ -6,17 +6,28 @@ Contains all the relevant functions for translating White Mensural Notation piec
 Functions:
 relative_vals -- Return a list of the default performed duration of the different notes
 imp_perf_vals -- Return a list of the default / imperfect / perfect performed duration of the different notes
-partial_imperfection -- Identify when a note experimented a partial imperfection and return True/False
+duration_table -- Return the (prebuilt) integer duration table that classifies the notes and rests for a particular mensuration
 noterest_to_mensural -- Perform the actual change, in notes and rests, from contemporary to mensural notation
 fill_section -- Fill the output <section> element with the appropriate musical content
+
+Classes:
+DurationTable -- Integer thresholds (from the semifusa to the maxima) for the notes and rests of a voice with a particular mensuration
+WhiteLayerBuilder -- Layer builder that keeps track of the tuplets of minims (and whose mRests last a breve)
 """
 # White mensural notation is essentially the same as the black notation from the Ars Nova.
 # The only difference is that it includes shorter note values (i.e., semiminim, fusa, and semifusa),
 # and the barring is generally done at the level of the breve (instead of the long).
+from bisect import bisect_left
 from fractions import *
+from itertools import product
+from types import MappingProxyType
 
 from pymei import *
 
+from layer_builder import LayerBuilder
+from imperfection import partial_imperfection_ratios
+from mensural_attributes import NOTE_ATTRIBUTES, REST_ATTRIBUTES, remove_non_mensural_attributes
+
 
 def relative_vals(triplet_of_minims, modusmaior, modusminor, tempus, prolatio):
     """
@@ -70,59 +81,136 @@ def imp_perf_vals(triplet_of_minims_flag, modusmaior, modusminor, tempus, prolat
     return [[semibrevis_default_val, semibrevis_imp, semibrevis_perf], [brevis_default_val, brevis_imp, brevis_perf], [longa_default_val, longa_imp, longa_perf], [maxima_default_val, maxima_imp, maxima_perf]]
 
 
-def partial_imperfection(note, ratio, modusminor, tempus, prolatio=None):
-    """Identify when a note experimented a partial imperfection and return True in that case, otherwise return False.
+# Number of ticks per unit of performed duration (@dur.ges = '1p').
+# The augmented semifusa is 3/32 of the imperfect semibreve, so with 32 ticks per unit all the thresholds are integers.
+TICKS = 32
 
-    When a note experimented a partial imperfection, besides returning True, this function adds the appropriate @quality, @num and @numbase attributes.
+# Notes smaller than the semibreve:
+# The dictionary's keys indicate the CMN notes (encoded in the @dur attribute), and the value for each key indicate the corresponding note in mensural notation
+SMALLER_NOTES = {'2': 'minima', '4': 'semiminima', '8': 'fusa', '16': 'semifusa'}
 
-    Arguments:
-    note -- A <note> element in a particular voice on the mei document
-    ratio -- The ratio between the actual performed duration of the <note> and its default performed duration
-    modusminor, tempus, prolatio -- Integer values (3 or 2) that give the mensuration of the voice. The last argument is optional (default None).
-    When the note is a 'longa' these exact arguments are used: modusminor, tempus and prolatio.
-    When the note is a 'maxima', these arguments stand for: modusmaior, modusminor and tempus, respectively.
-    When the note is a breve, these arguments stand for: tempus, prolatio and None (the last argument is left blank).
+
+class DurationTable(object):
+    """Integer duration engine that classifies the notes and rests of a voice with a particular mensuration (and triplet-of-minims flag).
+
+    All the thresholds (from the semifusa to the maxima, including their augmented and colored variants) are computed once per mensuration (see duration_table),
+    in ticks (TICKS per unit of performed duration), so classifying a note only takes integer comparisons and dictionary lookups.
+
+    Attributes:
+    values -- list of the default / imperfect / perfect performed duration of the semibrevis, brevis, longa and maxima (as returned by imp_perf_vals)
+    notes -- dictionary that maps (CMN @dur, performed duration) to a pair of outcomes: the outcome for the note, and the outcome for the same note with an alteration mark (@artic='stop').
+    Each outcome is a tuple (mensural @dur, @quality, @num, @numbase), with None for the attributes that are not added.
+    colored -- dictionary that maps (CMN @dur, performed duration) of the colored notes (2/3 of their default value, hemiola coloration) to their outcome
+    tied_low, tied_highs, tied_durs -- lowest performed duration (in ticks) of a tied note, sorted upper limits (in ticks) of the ranges of each note value, and the CMN @dur of each range
+    augmented -- set of the performed durations (in ticks) of the augmented minima, semiminima, fusa and semifusa
+    long_rests -- dictionary that maps the performed duration of a 'long' rest to its outcome (@EVENTUALDUR, @num, @numbase)
+    long_rest_default -- outcome of a 'long' rest without performed duration
     """
-    # From the beginning, we assume there is a partial imperfection.
-    # But if none of the 'partial imperfection' conditions are satisfied, the partial_imperf flag would change to False.
-    partial_imperf = True
-
-    # Immediate imperfection: tempus should be 3
-    if tempus == 3 and modusminor == 2 and (ratio == Fraction(5, 6) or ratio == Fraction(4, 6)):
-        note.addAttribute('quality', 'immediate_imp')
-    elif tempus == 3 and modusminor == 3 and (ratio == Fraction(5, 9)):    # Should I also include the case: or ratio == Fraction(4, 9)?
-        note.addAttribute('quality', 'imperfection + immediate_imp')
-    elif tempus == 3 and modusminor == 3 and (ratio == Fraction(8, 9) or ratio == Fraction(7, 9)):
-        note.addAttribute('quality', 'immediate_imp')
-
-    # Remote imperfection: there should be a prolatio value, and it should be 3
-    elif prolatio is not None:
-        if prolatio == 3 and tempus == 2 and modusminor == 2 and ratio == Fraction(11, 12):
-            note.addAttribute('quality', 'remote_imp')
-        elif prolatio == 3 and tempus == 2 and modusminor == 3 and ratio == Fraction(11, 18):
-            note.addAttribute('quality', 'imperfection + remote_imp')
-        elif prolatio == 3 and tempus == 2 and modusminor == 3 and ratio == Fraction(17, 18):
-            note.addAttribute('quality', 'remote_imp')
-        elif prolatio == 3 and tempus == 3 and modusminor == 2 and ratio == Fraction(17, 18):
-            note.addAttribute('quality', 'remote_imp')
-        elif prolatio == 3 and tempus == 3 and modusminor == 3 and ratio == Fraction(17, 27):
-            note.addAttribute('quality', 'imperfection + remote_imp')
-        elif prolatio == 3 and tempus == 3 and modusminor == 3 and ratio == Fraction(26, 27):
-            note.addAttribute('quality', 'remote_imp')
-        # It is not a 'remote partial imperfection' nor an 'immediate partial imperfection'
+
+    def __init__(self, triplet_of_minims_flag, modusmaior, modusminor, tempus, prolatio):
+        self.values = imp_perf_vals(triplet_of_minims_flag, modusmaior, modusminor, tempus, prolatio)
+        sb_values, b_values, l_values, max_values = self.values
+
+        # Note's Part:
+        # (CMN @dur, mensural @dur, mensural @dur when altered, performed durations, mensuration that rules the note, name of that mensuration, arguments for the partial imperfection)
+        note_types = [
+            ('maxima', 'maxima', 'longa', max_values, modusmaior, 'modusmaior', (modusmaior, modusminor, tempus)),
+            ('long', 'longa', 'brevis', l_values, modusminor, 'modusminor', (modusminor, tempus, prolatio)),
+            ('breve', 'brevis', 'semibrevis', b_values, tempus, 'tempus', (tempus, prolatio)),
+            ('1', 'semibrevis', 'minima', sb_values, prolatio, 'prolatio', None),   # There is no partial imperfection (nor coloration) for a semibreve
+        ]
+        self.notes = {}
+        self.colored = {}
+        for dur, mens_dur, altered_dur, (default_val, imp_val, perf_val), mensuration, mensuration_name, partial_args in note_types:
+            default = (mens_dur, None, None, None)
+            if mensuration not in [2, 3]:
+                print("MISTAKE IN MENSURATION: " + mensuration_name)
+            if partial_args is not None:
+                # Partial imperfections
+                for numerator, denominator, quality in partial_imperfection_ratios(*partial_args):
+                    if (default_val * numerator) % denominator == 0:
+                        outcome = (mens_dur, quality, str(denominator), str(numerator))
+                        self.notes[(dur, default_val * numerator // denominator)] = (outcome, outcome)
+                # Coloration: the colored note is worth 2/3 of its default value
+                if (default_val * 2) % 3 == 0:
+                    self.colored[(dur, default_val * 2 // 3)] = (mens_dur, None, '3', '2')
+            # Imperfection and alteration cases
+            if mensuration == 3:
+                self.notes[(dur, imp_val)] = ((mens_dur, 'i', '3', '2'), (altered_dur, 'a', '1', '2'))
+            else:
+                self.notes[(dur, imp_val)] = (default, default)
+            # Perfection case
+            if mensuration == 2:
+                self.notes[(dur, perf_val)] = ((mens_dur, 'p', '2', '3'), (mens_dur, 'p', '2', '3'))
+            else:
+                self.notes[(dur, perf_val)] = (default, default)
+
+        # The performed values of the notes smaller than the semibreve can only be 'imperfect', which is the default value (all the notes below the semibreve are imperfect),
+        # or they may be augmented (worth 1.5 times their original imperfect value) by means of a dot of augmentation.
+        # In ticks, the imperfect minima is TICKS * sb_imp / 2, and each smaller note is half of the previous one.
+        sb_imp = sb_values[1]
+        min_imp = TICKS * sb_imp // 2
+        smin_imp = min_imp // 2
+        fusa_imp = smin_imp // 2
+        sfusa_imp = fusa_imp // 2
+        min_aug, smin_aug, fusa_aug, sfusa_aug = [3 * imp // 2 for imp in [min_imp, smin_imp, fusa_imp, sfusa_imp]]
+        self.augmented = frozenset([min_aug, smin_aug, fusa_aug, sfusa_aug])
+
+        # Ranges for the tied notes, from the semifusa to the maxima: each note value covers the durations above the upper limit of the previous value, up to its own upper limit
+        self.tied_low = sfusa_imp
+        self.tied_highs = [sfusa_aug, fusa_aug, smin_aug, min_aug, TICKS * sb_values[2], TICKS * b_values[2], TICKS * l_values[2], TICKS * max_values[2]]
+        self.tied_durs = ['16', '8', '4', '2', '1', 'breve', 'long', 'maxima']
+
+        # Rest's Part: the 2-breve and 3-breve rests
+        l_imp, l_perf = l_values[1], l_values[2]
+        # 2-breve rest ('imperfected' when modusminor is 3)
+        self.long_rests = {l_imp: ('2B', '3', '2') if modusminor == 3 else ('2B', None, None)}
+        # 3-breve rest ('perfected' when modusminor is 2)
+        self.long_rests[l_perf] = ('3B', '2', '3') if modusminor == 2 else ('3B', None, None)
+        if modusminor == 3:
+            self.long_rest_default = ('3B', None, None)
+        elif modusminor == 2:
+            self.long_rest_default = ('2B', None, None)
         else:
-            partial_imperf = False
+            self.long_rest_default = None
 
-    # It is not an 'immediate partial imperfection' and there is no possibility of 'remote imperfection' as there is no 'prolatio'
-    else:
-        partial_imperf = False
+    def tied_dur(self, ticks):
+        """Return the CMN @dur of a tied note from its performed duration (in ticks), or None if the duration is not in the range of semifusa to maxima."""
+        if ticks < self.tied_low:
+            return None
+        position = bisect_left(self.tied_highs, ticks)
+        if position < len(self.tied_durs):
+            return self.tied_durs[position]
+        return None
 
-    # Add the @num and @numbase attributes in case of partial imperfection
-    if partial_imperf:
-        note.addAttribute('num', str(ratio.denominator))
-        note.addAttribute('numbase', str(ratio.numerator))
 
-    return partial_imperf
+def _build_tables():
+    """Return a read-only dictionary with the DurationTable of every mensuration (modusmaior, modusminor, tempus and prolatio equal to 3 or 2) and triplet-of-minims flag."""
+    tables = {}
+    for key in product([False, True], [3, 2], [3, 2], [3, 2], [3, 2]):
+        tables[key] = DurationTable(*key)
+    return MappingProxyType(tables)
+
+
+# Duration tables of all the mensurations, built once (when the module is imported) and never modified afterwards,
+# so that they can be shared by concurrent translations (e.g., in different threads)
+_duration_tables = _build_tables()
+
+
+def duration_table(triplet_of_minims_flag, modusmaior, modusminor, tempus, prolatio):
+    """Return the DurationTable for the given mensuration and triplet-of-minims flag.
+
+    The tables of all the valid mensurations are already built (see _duration_tables); for any other mensuration a new table is built (and not kept).
+
+    Arguments:
+    modusmaior, modusminor, tempus, prolatio -- integer values (3 or 2) that give the mensuration of the voice
+    triplet_of_minims_flag -- boolean flag that indicates the presence of a 'triplet of minims' in the piece (all voices)
+    """
+    key = (bool(triplet_of_minims_flag), modusmaior, modusminor, tempus, prolatio)
+    table = _duration_tables.get(key)
+    if table is None:
+        table = DurationTable(*key)
+    return table
 
 
 # Performs the actual change, in notes and rests, from contemporary to mensural notation.  This involves 2 steps:
@@ -132,332 +220,109 @@ def noterest_to_mensural(notes, rests, modusmaior, modusminor, tempus, prolatio,
     """
     Change the @dur attribute within the <note> and <rest> elements to a mensural-value; and add @num, @numbase and @quality attributes when appropriate.
 
+    The classification of each note uses the integer thresholds of the duration table of the mensuration (see DurationTable).
+
     Arguments:
-    notes -- list of all the <note> elements from a particular voice
-    rests -- list of all the <rest> elements from a particular voice
+    notes -- list of the ElementRecords (see the element_records module) of all the <note> elements from a particular voice
+    rests -- list of the ElementRecords of all the <rest> elements from a particular voice
     modusmaior, modusminor, tempus, prolatio -- integer values (3 or 2) that give the mensuration of the voice
     triplet_of_minims -- boolean flag that indicates the presence of a 'triplet of minims' in the piece (all voices)
     """
-    list_values = imp_perf_vals(triplet_of_minims_flag, modusmaior, modusminor, tempus, prolatio)
-    sb_def, sb_imp, sb_perf = list_values[0]
-    b_def, b_imp, b_perf = list_values[1]
-    l_def, l_imp, l_perf = list_values[2]
-    max_def, max_imp, max_perf = list_values[3]
-    # Smaller notes:
-    # The dictionary's keys indicate the CMN notes (encoded in the @dur attribute), and the value for each key indicate the corresponding note in mensural notation
-    smaller_notes = {'2': 'minima', '4': 'semiminima', '8': 'fusa', '16': 'semifusa'}
-    # The performed values of these notes can only be 'imperfect', which is the default value (all the notes below the semibreve are imperfect),
-    # or they may be augmented (worth 1.5 times their original imperfect value) by means of a dot of augmentation
-    # for the minim
-    min_imp = sb_imp / 2
-    min_aug = min_imp * Fraction(3, 2)
-    # for the semiminim
-    smin_imp = min_imp / 2
-    # smin_imp = sb_imp / 4
-    smin_aug = smin_imp * Fraction(3, 2)
-    # for the fusa
-    fusa_imp = smin_imp / 2
-    # fusa_imp = sb_imp / 8
-    fusa_aug = fusa_imp * Fraction(3, 2)
-    # for the semifusa
-    sfusa_imp = fusa_imp / 2
-    # sfusa_imp = sb_imp / 16
-    sfusa_aug = sfusa_imp * Fraction(3, 2)
+    table = duration_table(triplet_of_minims_flag, modusmaior, modusminor, tempus, prolatio)
+    sb_def = table.values[0][0]
+    b_def = table.values[1][0]
+    l_def, l_imp, l_perf = table.values[2]
+    max_def = table.values[3][0]
+    # For the messages about notes with an inappropriate duration: CMN @dur -> (mensural @dur, name of the note, default performed duration)
+    inappropriate_notes = {'maxima': ('maxima', 'MAXIMA', max_def), 'long': ('longa', 'LONG', l_def), 'breve': ('brevis', 'BREVE', b_def)}
 
     # Note's Part:
     for note in notes:
-        dur = note.getAttribute('dur').value
-        durges_num = int(note.getAttribute('dur.ges').value[:-1])
+        dur = note.get('dur')
+        durges_num = int(note.get('dur.ges')[:-1])
+        ticks = durges_num * TICKS
 
         # For the tied notes:
         # First find its right (contemporary) duration
         if dur == 'TiedNote!':
-            # Maximas
-            if l_perf < durges_num and durges_num <= max_perf:
-                dur = 'maxima'
-            # Longas
-            elif b_perf < durges_num and durges_num <= l_perf:
-                dur = 'long'
-            # Breves
-            elif sb_perf < durges_num and durges_num <= b_perf:
-                dur = 'breve'
-            # Semibreves
-            elif min_aug < durges_num and durges_num <= sb_perf:
-                dur = '1'
-            elif smin_aug < durges_num and durges_num <= min_aug:
-                dur = '2'
-            elif fusa_aug < durges_num and durges_num <= smin_aug:
-                dur = '4'
-            elif sfusa_aug < durges_num and durges_num <= fusa_aug:
-                dur = '8'
-            elif sfusa_imp <= durges_num and durges_num <= sfusa_aug:
-                dur = '16'
-            else:
+            tied_dur = table.tied_dur(ticks)
+            if tied_dur is None:
                 print("Weird\n The tied note doesn't seem to be any note (perfect, imperfect, or afected by patial imperfection) in the range of semibreve to maxima - " + str(note) + ", its duration is " + str(durges_num) + "p")
-            note.getAttribute('dur').setValue(dur)
+            else:
+                dur = tied_dur
 
         # Look for the corresponding mensural duration of the notes
-
-        # MAXIMA
-        if dur == 'maxima':
-            # Default @dur value of the note (Exception: Altered Longa)
-            mens_dur = 'maxima'
-
-            # Looking for 'perfections', 'imperfections' (including partial imperfection) and 'alterations'
-            if durges_num == max_perf:
-                # Perfection case
-                if modusmaior == 2:
-                    note.addAttribute('quality', 'p')
-                    note.addAttribute('num', '2')
-                    note.addAttribute('numbase', '3')
-                    # # And we add a dot of perfection
-                    # if not note.hasChildren('dot'):
-                    #     dot = MeiElement('dot')
-                    #     note.addChild('dot')
-                    # dot = note.getChildrenByName('dot')
-                    # dot.addAttribute('format', 'aug')
-                # Default case
-                elif modusmaior == 3:
-                    pass
-                # Mensuration MISTAKE: 'modusmaior'
-                else:
-                    print("MISTAKE IN MENSURATION: modusmaior")
-                    pass
-            elif durges_num == max_imp:
-                if modusmaior == 3:
-                    # Alteration case - here the @dur attribute changes
-                    if note.hasAttribute('artic') and note.getAttribute('artic').value == 'stop':
-                        mens_dur = 'longa'
-                        note.addAttribute('quality', 'a')
-                        note.addAttribute('num', '1')
-                        note.addAttribute('numbase', '2')
-                    # Imperfection case
-                    else:
-                        note.addAttribute('quality', 'i')
-                        note.addAttribute('num', '3')
-                        note.addAttribute('numbase', '2')
-                # Default case
-                elif modusmaior == 2:
-                    pass
-                # Mensuration MISTAKE: 'modusmaior'
-                else:
-                    print("MISTAKE IN MENSURATION: modusmaior")
-                    pass
+        outcomes = table.notes.get((dur, durges_num))
+        if outcomes is not None:
+            plain, altered = outcomes
+            # Alteration case - only read the articulation when it makes a difference
+            if altered is not plain and note.has('artic') and note.get('artic') == 'stop':
+                mens_dur, quality, num, numbase = altered
             else:
-                # Check for partial imperfection, coloration, or mistakes
-                ratio = Fraction(durges_num, max_def)
-                partial_imp = partial_imperfection(note, ratio, modusmaior, modusminor, tempus)
-                if partial_imp:
-                    pass
-                elif ratio == Fraction(2, 3) and note.hasAttribute('color'):
-                    note.addAttribute('num', '3')
-                    note.addAttribute('numbase', '2')
-                else:
-                    print("This MAXIMA " + str(note) + " has an inappropriate duration @dur.ges = " + str(durges_num) + "p, as it is " + str(ratio.numerator) + "/" + str(ratio.denominator) + " part of its normal value.")
-
-        # LONGA
-        elif dur == 'long':
-            # Default @dur value of the note (Exception: Altered Breve)
-            mens_dur = 'longa'
-
-            # Looking for 'perfections', 'imperfections' (including partial imperfection) and 'alterations'
-            if durges_num == l_perf:
-                # Perfection case
-                if modusminor == 2:
-                    note.addAttribute('quality', 'p')
-                    note.addAttribute('num', '2')
-                    note.addAttribute('numbase', '3')
-                    # # And we add a dot of perfection
-                    # if not note.hasChildren('dot'):
-                    #     dot = MeiElement('dot')
-                    #     note.addChild('dot')
-                    # dot = note.getChildrenByName('dot')
-                    # dot.addAttribute('format', 'aug')
-                # Default case
-                elif modusminor == 3:
-                    pass
-                # Mensuration MISTAKE: 'modusminor'
-                else:
-                    print("MISTAKE IN MENSURATION: modusminor")
-                    pass
-            elif durges_num == l_imp:
-                if modusminor == 3:
-                    # Alteration case - here the @dur attribute changes
-                    if note.hasAttribute('artic') and note.getAttribute('artic').value == 'stop':
-                        mens_dur = 'brevis'
-                        note.addAttribute('quality', 'a')
-                        note.addAttribute('num', '1')
-                        note.addAttribute('numbase', '2')
-                    # Imperfection case
-                    else:
-                        note.addAttribute('quality', 'i')
-                        note.addAttribute('num', '3')
-                        note.addAttribute('numbase', '2')
-                # Default case
-                elif modusminor == 2:
-                    pass
-                # Mensuration MISTAKE: 'modusminor'
-                else:
-                    print("MISTAKE IN MENSURATION: modusminor")
-                    pass
+                mens_dur, quality, num, numbase = plain
+            if quality is not None:
+                note.set('quality', quality)
+                note.set('num', num)
+                note.set('numbase', numbase)
+
+        # MAXIMA, LONGA and BREVIS: coloration, or mistakes
+        elif dur in inappropriate_notes:
+            colored = table.colored.get((dur, durges_num))
+            if colored is not None and note.has('color'):
+                mens_dur, quality, num, numbase = colored
+                note.set('num', num)
+                note.set('numbase', numbase)
             else:
-                # Check for partial imperfection, coloration, or mistakes
-                ratio = Fraction(durges_num, l_def)
-                partial_imp = partial_imperfection(note, ratio, modusminor, tempus, prolatio)
-                if partial_imp:
-                    pass
-                elif ratio == Fraction(2, 3) and note.hasAttribute('color'):
-                    note.addAttribute('num', '3')
-                    note.addAttribute('numbase', '2')
-                else:
-                    print("This LONG " + str(note) + " has an inappropriate duration @dur.ges = " + str(durges_num) + "p, as it is " + str(ratio.numerator) + "/" + str(ratio.denominator) + " part of its normal value.")
-
-        # BREVIS
-        elif dur == 'breve':
-            # Default @dur value of the note (Exception: Altered Semibreve)
-            mens_dur = 'brevis'
-
-            # Looking for 'perfections', 'imperfections' (including partial imperfection) and 'alterations'
-            if durges_num == b_perf:
-                # Perfection case
-                if tempus == 2:
-                    note.addAttribute('quality', 'p')
-                    note.addAttribute('num', '2')
-                    note.addAttribute('numbase', '3')
-                    # # And we add a dot of perfection
-                    # if not note.hasChildren('dot'):
-                    #     dot = MeiElement('dot')
-                    #     note.addChild('dot')
-                    # dot = note.getChildrenByName('dot')
-                    # dot.addAttribute('format', 'aug')
-                # Default case
-                elif tempus == 3:
-                    pass
-                # Mensuration MISTAKE: 'tempus'
-                else:
-                    print("MISTAKE IN MENSURATION: tempus")
-                    pass
-            elif durges_num == b_imp:
-                if tempus == 3:
-                    # Alteration case - here the @dur attribute changes
-                    if note.hasAttribute('artic') and note.getAttribute('artic').value == 'stop':
-                        mens_dur = 'semibrevis'
-                        note.addAttribute('quality', 'a')
-                        note.addAttribute('num', '1')
-                        note.addAttribute('numbase', '2')
-                    # Imperfection case
-                    else:
-                        note.addAttribute('quality', 'i')
-                        note.addAttribute('num', '3')
-                        note.addAttribute('numbase', '2')
-                # Default case
-                elif tempus == 2:
-                    pass
-                # Mensuration MISTAKE: 'tempus'
-                else:
-                    print("MISTAKE IN MENSURATION: tempus")
-                    pass
-            else:
-                # Check for partial imperfection, coloration, or mistakes
-                ratio = Fraction(durges_num, b_def)
-                partial_imp = partial_imperfection(note, ratio, tempus, prolatio)
-                if partial_imp:
-                    pass
-                elif ratio == Fraction(2, 3) and note.hasAttribute('color'):
-                    note.addAttribute('num', '3')
-                    note.addAttribute('numbase', '2')
-                else:
-                    print("This BREVE " + str(note) + " has an inappropriate duration @dur.ges = " + str(durges_num) + "p, as it is " + str(ratio.numerator) + "/" + str(ratio.denominator) + " part of its normal value.")
-
-        # SEMIBREVIS
+                mens_dur, note_name, default_val = inappropriate_notes[dur]
+                ratio = Fraction(durges_num, default_val)
+                print("This " + note_name + " " + str(note) + " has an inappropriate duration @dur.ges = " + str(durges_num) + "p, as it is " + str(ratio.numerator) + "/" + str(ratio.denominator) + " part of its normal value.")
+
+        # SEMIBREVIS with an inappropriate duration (there is no partial imperfection for a semibreve)
         elif dur == '1':
-            # Default @dur value of the note (Exception: Altered Minim)
             mens_dur = 'semibrevis'
-
-            # Looking for 'perfections', 'imperfections' (including partial imperfection) and 'alterations'
-            if durges_num == sb_perf:
-                # Perfection case
-                if prolatio == 2:
-                    note.addAttribute('quality', 'p')
-                    note.addAttribute('num', '2')
-                    note.addAttribute('numbase', '3')
-                    # # And we add a dot of perfection
-                    # if not note.hasChildren('dot'):
-                    #     dot = MeiElement('dot')
-                    #     note.addChild('dot')
-                    # dot = note.getChildrenByName('dot')
-                    # dot.addAttribute('format', 'aug')
-                # Default case
-                elif prolatio == 3:
-                    pass
-                # Mensuration MISTAKE: 'prolatio'
-                else:
-                    print("MISTAKE IN MENSURATION: prolatio")
-                    pass
-            elif durges_num == sb_imp:
-                if prolatio == 3:
-                    # Alteration case - here the @dur attribute changes
-                    if note.hasAttribute('artic') and note.getAttribute('artic').value == 'stop':
-                        mens_dur = 'minima'
-                        note.addAttribute('quality', 'a')
-                        note.addAttribute('num', '1')
-                        note.addAttribute('numbase', '2')
-                    # Imperfection case
-                    else:
-                        note.addAttribute('quality', 'i')
-                        note.addAttribute('num', '3')
-                        note.addAttribute('numbase', '2')
-                # Default case
-                elif prolatio == 2:
-                    pass
-                # Mensuration MISTAKE: 'prolatio'
-                else:
-                    print("MISTAKE IN MENSURATION: prolatio")
-                    pass
-            else:
-                # Check for mistakes (there is no partial imperfection for a semibreve)
-                print("This SEMIBREVE " + str(note) + " has an inappropriate duration @dur.ges = " + str(durges_num) + "p, as it is " + str(Fraction(durges_num, sb_def).numerator) + "/" + str(Fraction(durges_num, sb_def).denominator) + " part of its normal value.")
+            print("This SEMIBREVE " + str(note) + " has an inappropriate duration @dur.ges = " + str(durges_num) + "p, as it is " + str(Fraction(durges_num, sb_def).numerator) + "/" + str(Fraction(durges_num, sb_def).denominator) + " part of its normal value.")
 
         # SMALLER NOTES (OR MISTAKE)
         else:
             # Notes smaller than the semibreve (i.e., minima, semiminima, fusa, and semifusa)
-            try:
-                mens_dur = smaller_notes[dur]
+            if dur in SMALLER_NOTES:
+                mens_dur = SMALLER_NOTES[dur]
             # If this is not the case, we have an incorrect note value
-            except:
-                if dur != "TiedNote!":
-                    print("This note shouldn't be here, as it is larger than a maxima or shorter than a minima! " + str(note) + ", " + str(dur) + ", " + str(durges_num) + "p")
-                    mens_dur = dur
-                else:
-                    print("Still tied-note")
+            elif dur != "TiedNote!":
+                print("This note shouldn't be here, as it is larger than a maxima or shorter than a minima! " + str(note) + ", " + str(dur) + ", " + str(durges_num) + "p")
+                mens_dur = dur
+            else:
+                print("Still tied-note")
             # If the note has been augmented (i.e., its performed duration is equal to min_aug, smin_aug, fusa_aug, or sfusa_aug), its imperfect value has been increased
             # by a half and, thus, the note is now perfect and worths 3/2 its original value; this effect should be encoded as follows.
             # (The presence of @dots='1' cannot be used to determined augmentation, as some dotted notes may not be included completely in a single measure,
             # but divided across 2 measures and, in this case, it won't be dotted (e.g., instead of a dotted-half note, you have a half note tied up with a quarter note)
-            if int(note.getAttribute('dur.ges').value[:-1]) in [min_aug, smin_aug, fusa_aug, sfusa_aug]:
-                note.addAttribute('quality', 'p')
-                note.addAttribute('num', '2')
-                note.addAttribute('numbase', '3')
+            if ticks in table.augmented:
+                note.set('quality', 'p')
+                note.set('num', '2')
+                note.set('numbase', '3')
 
         # Change the @dur value to the corresponding mensural note value
-        note.getAttribute('dur').setValue(mens_dur)
+        note.set('dur', mens_dur)
         # And encode coloration if present in the note
-        if note.hasAttribute('color'):
-            note.addAttribute('colored', 'true')
-            note.removeAttribute('color')
+        if note.has('color'):
+            note.set('colored', 'true')
+            note.remove('color')
+        # Remove/Replace the attributes that are not part of the Mensural-MEI schema
+        remove_non_mensural_attributes(note, NOTE_ATTRIBUTES)
 
     # Rest's Part:
     # Rests can't be modified from its original value
     # Long-rests don't exist, there only is 1, 2 or 3 breve rests.
     for rest in rests:
         # Due to the mRest part of the code, all the rests have a @dur attribute.
-        dur = rest.getAttribute('dur').value
+        dur = rest.get('dur')
         # Semibreve rest
         if dur == "1":
             mens_dur = "semibrevis"
             # Check for mistakes in duration (@dur.ges attribute)
-            if rest.hasAttribute('dur.ges'):
-                durges_num = int(rest.getAttribute('dur.ges').value[:-1])
+            if rest.has('dur.ges'):
+                durges_num = int(rest.get('dur.ges')[:-1])
                 if durges_num != sb_def:
                     print("This SEMIBREVE rest " + str(rest) + ", doesn't have the appropriate @dur.ges value, as it is " + str(durges_num) + "p, instead of " + str(sb_def) + "p;")
                     print("i.e., instead of being " + str(prolatio) + " times a MINIM, it is " + str(float(durges_num * prolatio) / sb_def) + " times a MINIM")
@@ -466,8 +331,8 @@ def noterest_to_mensural(notes, rests, modusmaior, modusminor, tempus, prolatio,
         elif dur == "breve":
             mens_dur = "brevis"  # 1B rest??????????
             # Check for mistakes in duration (@dur.ges attribute)
-            if rest.hasAttribute('dur.ges'):
-                durges_num = int(rest.getAttribute('dur.ges').value[:-1])
+            if rest.has('dur.ges'):
+                durges_num = int(rest.get('dur.ges')[:-1])
                 if durges_num != b_def:
                     print("This BREVE rest " + str(rest) + ", doesn't have the appropriate @dur.ges value, as it is " + str(durges_num) + "p, instead of " + str(b_def) + "p;")
                     print("i.e., instead of being " + str(tempus) + " times a SEMIBREVE, it is " + str(float(durges_num * tempus) / b_def) + " times a SEMIBREVE")
@@ -477,139 +342,84 @@ def noterest_to_mensural(notes, rests, modusmaior, modusminor, tempus, prolatio,
             ##########################################################################################################
             mens_dur = "longa"  # THIS WONT BE HERE, INSTEAD WE WILL USE THE MENS_DUR SPECIFIED IN EACH CONDITION (IF)
             ##########################################################################################################
-            if rest.hasAttribute('dur.ges'):
-                durges_num = int(rest.getAttribute('dur.ges').value[:-1])
-                # 2-breve rest
-                if durges_num == l_imp:
-                    rest.addAttribute('EVENTUALDUR', '2B')  # It will be:   mens_dur = '2B'
-                    ###################################################################################################################
-                    ###### This will go away when the 3B and 2B rests (3-spaces and 2-spaces rests) are implemented in Verovio ########
-                    if modusminor == 3:  # 'imperfected'
-                        rest.addAttribute('num', '3')
-                        rest.addAttribute('numbase', '2')
-                    else:   # Default
-                        pass
-                    ###################################################################################################################
-                # 3-breve rest
-                elif durges_num == l_perf:
-                    rest.addAttribute('EVENTUALDUR', '3B')  # It will be:   mens_dur = '3B'
-                    ###################################################################################################################
-                    ###### This will go away when the 3B and 2B rests (3-spaces and 2-spaces rests) are implemented in Verovio ########
-                    if modusminor == 2:  # 'perfected'
-                        rest.addAttribute('num', '2')
-                        rest.addAttribute('numbase', '3')
-                    else:   # Default
-                        pass
-                    ###################################################################################################################
+            if rest.has('dur.ges'):
+                durges_num = int(rest.get('dur.ges')[:-1])
+                outcome = table.long_rests.get(durges_num)
                 # Check for mistakes in duration (@dur.ges attribute)
-                else:
+                if outcome is None:
                     print("This 'LONG' Rest " + str(rest) + ", doesn't have the appropriate @dur.ges value, as it is " + str(durges_num) + "p, instead of " + str(l_imp) + "p or " + str(l_perf) + "p")
                     print("i.e., it isn't a 2-breve or 3-breve rest, instead it is: " + str(Fraction(durges_num, b_def).numerator) + "/" + str(Fraction(durges_num, b_def).denominator) + " times a BREVE rest\n")
             else:
-                # 3-breve rest
-                if modusminor == 3:
-                    rest.addAttribute('EVENTUALDUR', '3B')
-                # 2-breve rest
-                elif modusminor == 2:
-                    rest.addAttribute('EVENTUALDUR', '2B')
+                outcome = table.long_rest_default
                 # Check for mistakes in duration (@dur.ges attribute)
-                else:
+                if outcome is None:
                     print("This 'LONG' Rest " + str(rest) + ", doesn't have the appropriate @dur.ges value")
+            if outcome is not None:
+                eventual_dur, num, numbase = outcome
+                rest.set('EVENTUALDUR', eventual_dur)  # It will be:   mens_dur = '2B' or '3B'
+                ###################################################################################################################
+                ###### This will go away when the 3B and 2B rests (3-spaces and 2-spaces rests) are implemented in Verovio ########
+                if num is not None:
+                    rest.set('num', num)
+                    rest.set('numbase', numbase)
+                ###################################################################################################################
+        # Notes smaller than the semibreve (i.e., minima, semiminima, fusa, and semifusa)
+        elif dur in SMALLER_NOTES:
+            mens_dur = SMALLER_NOTES[dur]
+        # Mistake in rest's duration (@dur attribute)
         else:
-            # Notes smaller than the semibreve (i.e., minima, semiminima, fusa, and semifusa)
-            try:
-                mens_dur = smaller_notes[dur]
-            # Mistake in rest's duration (@dur attribute)
-            except:
-                print("This kind of Rest shouldn't be in this repertory " + str(note) + ", it has a duration of  " + str(dur) + "\n")
-                mens_dur = dur
+            print("This kind of Rest shouldn't be in this repertory " + str(rest) + ", it has a duration of  " + str(dur) + "\n")
+            mens_dur = dur
 
         # Change the @dur value to the corresponding mensural note value
-        rest.getAttribute('dur').setValue(mens_dur)
+        rest.set('dur', mens_dur)
         # And encode coloration if present in the rest
-        if rest.hasAttribute('color'):
-            rest.addAttribute('colored', 'true')
-            rest.removeAttribute('color')
+        if rest.has('color'):
+            rest.set('colored', 'true')
+            rest.remove('color')
+        # Remove/Replace the attributes that are not part of the Mensural-MEI schema
+        remove_non_mensural_attributes(rest, REST_ATTRIBUTES)
+
+
+class WhiteLayerBuilder(LayerBuilder):
+    """Fill the <section> element of a White Mensural piece (see layer_builder.LayerBuilder), keeping track of the presence of tuplets of minims."""
+    # Pieces in white notation are barred by the breve, so an <mRest> without @dur has the duration of a breve
+    mRest_dur = 'breve'
+
+    def __init__(self, ids_removeSet, doc_index):
+        LayerBuilder.__init__(self, ids_removeSet, doc_index)
+        self.triplet_of_minims = False
+
+    def tuplet(self, tuplet, voice):
+        # Unlike modern transcriptions of Ars nova pieces, in a modern transcription of a white mensural piece probably there won't be any tuplets present.
+        # Since there are way smaller note values in white notation compared to Ars nova,
+        # it is better to represent a perfect semibreve as a dotted whole note that can be divided into three half notes,
+        # than to represent it as a whole note that can be divided into a triplet of half notes (like in Ars nova).
+        # To be safe, in the case tuplets are used, they are treated as in the arsnova module.
+        self.triplet_of_minims = True
+        LayerBuilder.tuplet(self, tuplet, voice)
 
+    # Beams: In white notation there are already fusas and semifusas, represented by eighth and sixteenth notes, respectively, which can be beamed together.
+    # The notes of the <beam> are added to the layer by the default hook.
 
-def fill_section(out_section, all_voices, ids_removeList, input_doc):
+
+def fill_section(out_section, all_voices, ids_removeSet, doc_index):
     """
     Fill the <section> element of the Mensural-MEI document with the appropriate musical content.
 
-    This function calls the noterest_to_mensural function to fill the <section> element with the right note (and rest) values.
-    The appropriate musical content for the <section> in a Mensural-MEI document includes <note> and <rest> elements, but not <tuplet> or <tie> elements.
+    The appropriate musical content for the <section> in a Mensural-MEI document includes <note> and <rest> elements, but not <tuplet>, <beam> or <tie> elements.
+    The <note> and <rest> elements of each voice are collected while filling the section, to be passed to the noterest_to_mensural function.
 
     Arguments:
     out_section -- the <section> element to be filled in
     all_voices -- list of lists, each sublist represents a particular voice in the CMN-MEI document and contains all the <staff> elements from that voice
-    ids_removeList -- list of <note> elements that shouldn't be included in the Mensural-MEI output document (generally notes that are part of a tie)
-    input_doc -- the pymei.MeiDocument that has all the CMN-MEI file information
+    ids_removeSet -- set of the ids of the <note> elements that shouldn't be included in the Mensural-MEI output document (generally notes that are part of a tie)
+    doc_index -- the DocumentIndex of the pymei.MeiDocument that has all the CMN-MEI file information
+
+    Return value:
+    Tuple with the list of the VoiceContent of each voice and the flag that indicates the presence of a 'triplet of minims' in the piece.
     """
-    flag_triplet_minims = False
-    for ind_voice in all_voices:
-        # Add a staff for each voice, with the id corresponding to the first <staff> element in the input_file for that exact voice
-        staff = MeiElement('staff')
-        old_staff = input_doc.getElementsByName('staff')[all_voices.index(ind_voice)]
-        staff.setId(old_staff.id)
-        staff.addAttribute(old_staff.getAttribute('n'))
-        out_section.addChild(staff)
-        # Add a layer inside the <staff> for each voice, with the id corresponding to the first <layer> element in the input_file for that exact voice
-        layer = MeiElement('layer')
-        old_layer = input_doc.getElementsByName('layer')[all_voices.index(ind_voice)]
-        layer.setId(old_layer.id)
-        layer.addAttribute(old_layer.getAttribute('n'))
-        staff.addChild(layer)
-        # Fill each voice (fill the <layer> of each <staff>) with musical information (notes/rests)
-        for i in range(0, len(ind_voice)):
-            musical_content = ind_voice[i].getChildrenByName('layer')[0].getChildren()
-            # Add the elements of each measure into the <layer> and a <barLine/> element after the measure-content
-            for element in musical_content:
-                # Tied notes
-                # If the element is a tied note (other than the first note of the tie: <note @dur = 'TiedNote!'/>), it is not included in the output file (as only the first tied note will be included with the right note shape and duration -@dur.ges-)
-                if element.id in ids_removeList:
-                    pass
-                # Tuplets
-                elif element.name == 'tuplet':
-                    # Unlike modern transcriptions of Ars nova pieces, in a modern transcription of a white mensural piece probably there won't be any tuplets present.
-                    # Since there are way smaller note values in white notation compared to Ars nova,
-                    # it is better to represent a perfect semibreve as a dotted whole note that can be divided into three half notes,
-                    # than to represent it as a whole note that can be divided into a triplet of half notes (like in Ars nova).
-                    # To be safe, in the case tuplets are used, the following code was copied from the arsnova module.
-                    flag_triplet_minims = True
-                    tuplet = element
-                    notes_grouped = tuplet.getChildren()
-                    for note in notes_grouped:
-                        layer.addChild(note)
-                        # Adding the <dot> element after a 'staccated' note or rest element
-                        if note.hasAttribute('artic') and note.getAttribute('artic').value == "stacc":
-                            layer.addChild(MeiElement('dot'))
-                # Beams: In white notation there are already fusas and semifusas, represented by eighth and sixteenth notes, respectively, which can be beamed together
-                elif element.name == 'beam':
-                    beam = element
-                    notes_grouped = beam.getChildren()
-                    for note in notes_grouped:
-                        layer.addChild(note)
-                        # Adding the <dot> element after a 'staccated' note or rest element
-                        if note.hasAttribute('artic') and note.getAttribute('artic').value == "stacc":
-                            layer.addChild(MeiElement('dot'))
-                # mRests
-                elif element.name == 'mRest':
-                    # Change into simple <rest> elements (as there are no measure-rests in mensural notation)
-                    rest = MeiElement('rest')
-                    rest.id = element.id
-                    rest.setAttributes(element.getAttributes())
-                    layer.addChild(rest)
-                    # If there is no duration encoded in the rest, this mRest has the duration of the measure (which, generally, is a breve)
-                    if rest.hasAttribute('dur') is False:
-                        rest.addAttribute('dur', 'breve')
-                # Notes and simple rests
-                else:
-                    layer.addChild(element)
-
-                # Adding the <dot> element after a 'staccated' note or rest element
-                if element.hasAttribute('artic') and element.getAttribute('artic').value == "stacc":
-                    layer.addChild(MeiElement('dot'))
-            # Add barline
-            layer.addChild(MeiElement('barLine'))
-
-    return flag_triplet_minims
+    builder = WhiteLayerBuilder(ids_removeSet, doc_index)
+    voices = builder.fill_section(out_section, all_voices)
+
+    return voices, builder.triplet_of_minims
@@ -0,0 +1,312 @@
+"""
+worker_pool module
+
+Contains a pool of worker processes that isolates the failures of the items it processes (e.g., the pieces of a batch translation):
+- each item runs under a wall-clock timeout: the worker gets a TimeoutError after 'timeout' seconds (so the failure comes with a traceback),
+  and if it is stuck (e.g., inside libmei) it is killed after a grace period and replaced by a new worker;
+- each worker runs under a memory ceiling (the size of its address space), so a runaway item gets a MemoryError instead of exhausting the machine;
+- a worker that crashes is replaced by a new one, and only the item it was processing fails;
+- the workers are recycled (replaced by new ones) after processing a given number of items, so the memory kept by libmei objects doesn't grow across items.
+
+The pool either processes a whole sequence of items (see WorkerPool.run, used by the batch mode),
+or it keeps its workers and processes the items one at a time as they come, from several threads (see WorkerPool.call, used by the serve mode).
+
+Classes:
+WorkerPool -- Pool of worker processes with per-item timeouts, a memory ceiling and worker recycling
+WorkerError -- An item failed in its worker process
+"""
+import signal
+import threading
+import time
+import traceback
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:
+    # The memory ceiling is not available on this platform (e.g., Windows)
+    resource = None
+
+
+class WorkerError(Exception):
+    """An item failed in its worker process: the function raised an exception (the message is its traceback), or the worker crashed."""
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("The item took longer than the timeout of the worker pool.")
+
+
+def _worker(function, connection, timeout, memory_limit, recycle):
+    """Main loop of a worker process: receive (index, item) messages, and send back (index, succeeded, value) messages.
+
+    The value is the return value of function(item), or the traceback of the exception it raised.
+    The worker exits when it receives None, or after processing 'recycle' items.
+    """
+    # The worker is stopped by SIGTERM (see WorkerPool), whatever the handler of the process that started it
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    soft_timeout = timeout is not None and hasattr(signal, 'setitimer')
+    if soft_timeout:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+
+    processed = 0
+    while recycle is None or processed < recycle:
+        message = connection.recv()
+        if message is None:
+            break
+        index, item = message
+        try:
+            if soft_timeout:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            reply = (index, True, function(item))
+            if soft_timeout:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        except BaseException:
+            if soft_timeout:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+            reply = (index, False, traceback.format_exc())
+        connection.send(reply)
+        processed += 1
+    connection.close()
+
+
+class _WorkerProcess(object):
+    """A worker process of the pool, with the connection to it and the item it is processing."""
+
+    def __init__(self, pool):
+        self.connection, child_connection = Pipe()
+        self.process = Process(target=_worker, args=(pool.function, child_connection, pool.timeout, pool.memory_limit, pool.recycle))
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+        self.processed = 0
+        # (index, item) being processed, and the time at which the worker has to be killed
+        self.task = None
+        self.deadline = None
+
+
+class WorkerPool(object):
+    """Pool of worker processes that applies a function to a sequence of items, isolating the failures of each item.
+
+    Methods:
+    run -- Apply the function to all the items, and yield the result of each item as soon as it is available
+    start -- Start the workers used by call
+    call -- Apply the function to one item in one of the workers (waiting for a free worker), and return its value
+    close -- Stop the workers used by call
+    """
+
+    def __init__(self, function, jobs=1, timeout=None, memory_limit=None, recycle=None, grace=5.0):
+        """
+        Arguments:
+        function -- function of one argument applied to each item (it has to be defined at the top level of a module)
+        jobs -- number of worker processes (default 1)
+        timeout -- maximum number of seconds for each item (default None: no timeout)
+        memory_limit -- maximum size, in bytes, of the address space of each worker process (default None: no limit)
+        recycle -- number of items after which a worker process is replaced by a new one (default None: the workers are never replaced)
+        grace -- seconds after the timeout before a worker that doesn't respond is killed (default 5)
+        """
+        if memory_limit is not None and resource is None:
+            raise ValueError("The memory ceiling of the worker processes is not supported on this platform.")
+        self.function = function
+        self.jobs = max(1, jobs)
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.recycle = recycle
+        self.grace = grace
+        # Workers of call: the free ones, and the number of workers started (free or busy)
+        self.idle = []
+        self.started = 0
+        self.condition = threading.Condition()
+
+    def run(self, items):
+        """Apply the function to all the items, and yield a tuple (index, succeeded, value) for each item as soon as it is available (not necessarily in order).
+
+        The value is the return value of the function, or the description of the failure (a traceback, a timeout or the crash of the worker).
+
+        Arguments:
+        items -- sequence (or iterator) of items (they are sent to the worker processes, so they have to be picklable)
+        """
+        # The items are taken from the sequence only when a worker is free to process them (so it can be an iterator that produces them on the fly)
+        pending = enumerate(items)
+        exhausted = False
+        workers = []
+        try:
+            while True:
+                # Give work to the free workers, and start new workers (replacing the recycled, crashed or killed ones) while there is more work
+                while not exhausted:
+                    free = [worker for worker in workers if worker.task is None]
+                    if not free and len(workers) >= self.jobs:
+                        break
+                    try:
+                        task = next(pending)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if free:
+                        worker = free[0]
+                    else:
+                        worker = _WorkerProcess(self)
+                        workers.append(worker)
+                    worker.task = task
+                    worker.connection.send(task)
+                    if self.timeout is not None:
+                        worker.deadline = time.time() + self.timeout + self.grace
+                if not any(worker.task is not None for worker in workers):
+                    break
+
+                # Wait for the first result (or the first deadline)
+                busy = [worker for worker in workers if worker.task is not None]
+                deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+                wait_time = max(0, min(deadlines) - time.time()) if deadlines else None
+                ready = wait([worker.connection for worker in busy], wait_time)
+
+                for worker in busy:
+                    index = worker.task[0]
+                    if worker.connection in ready:
+                        try:
+                            reply = worker.connection.recv()
+                        except (EOFError, OSError):
+                            # The worker crashed while processing the item
+                            worker.process.join()
+                            self._discard(workers, worker)
+                            yield index, False, "The worker process died (exit code " + str(worker.process.exitcode) + ") while processing this item."
+                            continue
+                        worker.task = None
+                        worker.deadline = None
+                        worker.processed += 1
+                        if self.recycle is not None and worker.processed >= self.recycle:
+                            # The worker exits by itself after 'recycle' items
+                            worker.process.join()
+                            self._discard(workers, worker)
+                        yield reply
+                    elif worker.deadline is not None and time.time() >= worker.deadline:
+                        # The worker didn't respond to the timeout: kill it
+                        worker.process.terminate()
+                        worker.process.join()
+                        self._discard(workers, worker)
+                        yield index, False, "Timeout: the item took longer than " + str(self.timeout) + " seconds, and its worker process was killed."
+        finally:
+            for worker in workers:
+                if worker.process.is_alive():
+                    try:
+                        worker.connection.send(None)
+                    except (OSError, ValueError):
+                        pass
+                    worker.process.join(1)
+                    if worker.process.is_alive():
+                        worker.process.terminate()
+                worker.connection.close()
+
+    def start(self):
+        """Start the 'jobs' workers used by call (otherwise they are started when they are first needed)."""
+        with self.condition:
+            while self.started < self.jobs:
+                self.idle.append(_WorkerProcess(self))
+                self.started += 1
+
+    def _acquire(self):
+        """Return a free worker for call, starting one if there are less than 'jobs', or waiting for one otherwise.
+        The free workers that died while waiting (e.g., killed by the OOM killer) are dropped, and new ones are started instead.
+        """
+        with self.condition:
+            while True:
+                while not self.idle and self.started >= self.jobs:
+                    self.condition.wait()
+                if not self.idle:
+                    break
+                worker = self.idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.process.join()
+                worker.connection.close()
+                self.started -= 1
+            self.started += 1
+        try:
+            return _WorkerProcess(self)
+        except BaseException:
+            self._release(None)
+            raise
+
+    def _release(self, worker):
+        """Give back a worker after call (None if it exited, or was killed, so that a new one can be started)."""
+        with self.condition:
+            if worker is None:
+                self.started -= 1
+            else:
+                self.idle.append(worker)
+            self.condition.notify()
+
+    def call(self, item):
+        """Apply the function to the item in one of the workers, and return its value.
+        It can be called from several threads at the same time: at most 'jobs' items are processed at the same time, and the other calls wait for a free worker.
+        Raise TimeoutError if the item takes longer than the timeout (if the worker doesn't respond to the timeout, it is killed and replaced by a new one),
+        and WorkerError if the function raised an exception or the worker crashed.
+
+        Arguments:
+        item -- argument of the function (it is sent to the worker process, so it has to be picklable)
+        """
+        worker = self._acquire()
+        start = time.time()
+        try:
+            try:
+                worker.connection.send((0, item))
+            except (OSError, EOFError):
+                # The worker died before it got the item
+                worker.process.join()
+                worker.connection.close()
+                exitcode = worker.process.exitcode
+                worker = None
+                raise WorkerError("The worker process died (exit code " + str(exitcode) + ") before processing this item.")
+            if not worker.connection.poll(None if self.timeout is None else self.timeout + self.grace):
+                # The worker didn't respond to the timeout: kill it
+                worker.process.terminate()
+                worker.process.join()
+                worker.connection.close()
+                worker = None
+                raise TimeoutError("The item took longer than " + str(self.timeout) + " seconds, and its worker process was killed.")
+            try:
+                index, succeeded, value = worker.connection.recv()
+            except (EOFError, OSError):
+                # The worker crashed while processing the item
+                worker.process.join()
+                worker.connection.close()
+                exitcode = worker.process.exitcode
+                worker = None
+                raise WorkerError("The worker process died (exit code " + str(exitcode) + ") while processing this item.")
+            worker.processed += 1
+            if self.recycle is not None and worker.processed >= self.recycle:
+                # The worker exits by itself after 'recycle' items
+                worker.process.join()
+                worker.connection.close()
+                worker = None
+        finally:
+            self._release(worker)
+        if not succeeded:
+            if self.timeout is not None and time.time() - start >= self.timeout:
+                # The worker got the TimeoutError of its timeout
+                raise TimeoutError(value)
+            raise WorkerError(value)
+        return value
+
+    def close(self):
+        """Stop the free workers used by call."""
+        with self.condition:
+            workers = self.idle
+            self.idle = []
+            self.started -= len(workers)
+        for worker in workers:
+            try:
+                worker.connection.send(None)
+            except (OSError, ValueError):
+                pass
+            worker.process.join(1)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.connection.close()
+
+    def _discard(self, workers, worker):
+        """Remove a worker (that has already exited) from the pool."""
+        worker.connection.close()
+        workers.remove(worker)